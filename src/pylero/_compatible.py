@@ -40,6 +40,22 @@ try:
 except ImportError:
     basestring = (str, bytes)
 
+try:
+    from abc import ABC
+except ImportError:
+    from abc import ABCMeta
+    ABC = ABCMeta(str("ABC"), (object,), {})
+
+try:
+    from collections.abc import MutableSequence
+except ImportError:
+    from collections import MutableSequence
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
 try:
     from urlparse import urlparse
 except ImportError:
@@ -1,10 +1,50 @@
 # -*- coding: utf8 -*-
 from __future__ import absolute_import, division, print_function
 from __future__ import unicode_literals
+import os
 from pylero.base_polarion import BasePolarion
+from pylero.session_pool import SessionPool
 from pylero.user import User
 
 
+def download_attachments(attachments, dest_dir, concurrency=4):
+    """Downloads attachments to a directory, concurrency at a time. An
+    attachment whose file already exists in the directory with the
+    attachment length is not downloaded again, so running it again after a
+    failure only downloads what is missing.
+
+    Args:
+        attachments: list of attachment objects (Attachment,
+                     TestRunAttachment or WikiPageAttachment)
+        dest_dir: the directory to save the files in. It is created if it
+                  does not exist
+        concurrency (int): the number of downloads at a time, default: 4
+
+    Returns:
+        list of the paths of the files, in the order of the attachments
+    """
+    if not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+    paths = []
+    for idx, attachment in enumerate(attachments):
+        file_name = getattr(attachment, "file_name", None) or \
+            attachment.filename
+        path = os.path.join(dest_dir, file_name)
+        # attachments with the same file name get a prefix
+        if path in paths:
+            path = os.path.join(dest_dir, "%s_%s" % (idx, file_name))
+        paths.append(path)
+
+    def download(attachment_path):
+        attachment, path = attachment_path
+        if os.path.exists(path) and \
+                os.path.getsize(path) == int(attachment.length):
+            return path
+        return attachment.download(path)
+    return SessionPool(concurrency).map(download,
+                                        list(zip(attachments, paths)))
+
+
 class Attachment(BasePolarion):
     """Object to handle the Polarion WSDL tns5:Attachment class
 
@@ -31,6 +71,20 @@ class Attachment(BasePolarion):
     _obj_client = "builder_client"
     _obj_struct = "tns5:Attachment"
 
+    def download(self, path):
+        """Downloads the attachment. see Session.download
+
+        Args:
+            path: the path to save the file to. If it is a directory, the
+                  file is saved in it with the file name of the attachment
+
+        Returns:
+            the path of the file
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, self.file_name)
+        return self.session.download(self.url, path, self.length)
+
 
 class ArrayOfAttachment(BasePolarion):
     _obj_client = "builder_client"
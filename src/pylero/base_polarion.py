@@ -5,9 +5,13 @@ from pylero._compatible import SafeConfigParser, basestring, classmethod
 import os
 import base64
 import copy
+import importlib
 import re
 import suds
+import threading
 from pylero.exceptions import PyleroLibException
+from pylero.repo_file_cache import RepoFileCache
+from pylero.revision_cache import RevisionCache
 from pylero.server import Server
 from functools import wraps
 from getpass import getpass
@@ -78,6 +82,12 @@ class Configuration(object):
                         config.get(self.CONFIG_SECTION, "cert_path")
         except:
             self.cert_path = None
+        # the on disk cache is only used when a directory is configured
+        try:
+            self.cache_dir = os.environ.get("POLARION_CACHE_DIR") or \
+                config.get(self.CONFIG_SECTION, "cache_dir")
+        except:
+            self.cache_dir = None
 
         if not (self.server_url and self.login and self.proj):
             raise PyleroLibException("The config files must contain "
@@ -98,6 +108,7 @@ class Connection(object):
     POLARION_PASSWORD
     POLARION_TIMEOUT
     POLARION_PROJECT
+    POLARION_CACHE_DIR
     """
     connected = False
     session = None
@@ -140,6 +151,10 @@ class Connection(object):
             cls.session.user_id = cfg.login
             cls.session.password = cfg.pwd
             cls.session.repo = cfg.repo
+            cls.session.cache_dir = cfg.cache_dir
+            cls.session.revision_cache = RevisionCache(cfg.cache_dir) \
+                if cfg.cache_dir else None
+            cls.session.repo_file_cache = RepoFileCache(cfg.cache_dir or None)
             # must use try/except instead of or because the config file
             # may return a non empty value, such as " "
         return cls.session
@@ -170,6 +185,23 @@ def tx_wrapper(func):
     return inner
 
 
+def lazy_import(name):
+    """Imports a Pylero module when it is used, instead of when the module
+    that uses it is imported. The work_item module (and the modules that
+    import it, like test_run and test_record) connect to the server when
+    they are imported, to create a class for each work item type, so the
+    modules that don't need the server until they are used import them with
+    this function.
+
+    Args:
+        name (str): the name of the module, for example "pylero.test_run"
+
+    Returns:
+        the module
+    """
+    return importlib.import_module(name)
+
+
 class BasePolarion(object):
     """BasePolarion is the parent class for all the WSDL Polarion objects that
     are published. Using the _cls_suds_map, the class creates a property for
@@ -198,17 +230,31 @@ class BasePolarion(object):
                            objects are instantiated.
         default_project (str): The user's default project, to be used when
                           project_id is needed and there is none given
+        _loaded_fields (set): the fields that were populated in a partially
+                              populated object (for example, by a query).
+                              None means that the object is fully populated.
     """
     _cls_suds_map = {}
     _id_field = None
+    _loaded_fields = None
+    # the properties of the fields are created by the class for all its
+    # objects (see _add_properties), instead of in every constructor.
+    _shared_properties = False
+    # describes the WSDL search functions of the class, see _search_call
+    _search_spec = None
+    DEFAULT_SEARCH_PARMS = ["query", "sort", "baseline_revision", "fields",
+                            "limit"]
     _obj_client = None
     _obj_struct = None
     _session = None
+    _thread_sessions = threading.local()
     _default_project = None
     _cache = {
         "enums": {},
         "custom_field_types": {},
-        "projects": {}
+        "projects": {},
+        "tests_configuration": {},
+        "suds_templates": {}
     }
     REGEX_PROJ = "/default/(.*)\$"
     # The id in the uri is always after the last }, at times there are multiple
@@ -226,6 +272,12 @@ class BasePolarion(object):
     def session(cls):
         # Uses a class property for the session, so that the library doesn't
         # connect to the server until the library is actually used.
+        # a session bound to the current thread (see SessionPool) is used
+        # instead of the global session.
+        thread_session = getattr(BasePolarion._thread_sessions, "session",
+                                 None)
+        if thread_session:
+            return thread_session
         if BasePolarion._session:
             return BasePolarion._session
         else:
@@ -249,7 +301,7 @@ class BasePolarion(object):
         return BasePolarion._default_project
 
     @classmethod
-    def _convert_obj_fields_to_polarion(cls, fields=[]):
+    def _convert_obj_fields_to_polarion(cls, fields=[], suds_map=None):
         """All child methods that take a fields parameter should pass the field
         array and it converts it to the Polarion attribute name using the
         _cls_suds_map. It uses the python map function over the fields list to
@@ -260,24 +312,259 @@ class BasePolarion(object):
         Args:
             fields - list of fields to convert. If it is not a list, it
             converts it to one first. default: []
+            suds_map - the _cls_suds_map that has the fields, for example the
+            map of an object or of a schema. default: the class _cls_suds_map
         """
         p_fields = []
+        suds_map = suds_map or cls._cls_suds_map
         if fields:
             if not isinstance(fields, list):
                 fields = [fields]
             # convert given fields to Polarion fields
             p_fields = ["%s%s" % (
                     "customFields."
-                    if isinstance(cls._cls_suds_map[x], dict) and
-                    cls._cls_suds_map[x].get("is_custom", False)
+                    if isinstance(suds_map[x], dict) and
+                    suds_map[x].get("is_custom", False)
                     else "",
-                    cls._cls_suds_map[x]
-                    if not isinstance(cls._cls_suds_map[x], dict)
-                    else cls._cls_suds_map[x]["field_name"]) for x in fields]
+                    suds_map[x]
+                    if not isinstance(suds_map[x], dict)
+                    else suds_map[x]["field_name"]) for x in fields]
             # Omit 'URI' from URIFields
             p_fields = [(x.replace("URI", "")) for x in p_fields]
         return p_fields
 
+    @staticmethod
+    def _is_cacheable(result):
+        # a result that is empty or has an object that could not be resolved
+        # (for example, a revision that doesn't exist yet) may change, so it
+        # is not kept in the revision cache.
+        if result is None:
+            return False
+        items = result if isinstance(result, list) else [result]
+        return not any(getattr(item, "_unresolvable", False) in
+                       (True, "true") for item in items)
+
+    @classmethod
+    def _pinned_call(cls, function_name, parms, client="tracker_client"):
+        """Calls a WSDL function whose result is pinned to a revision or a
+        baseline and therefore can never change. The raw response, as it was
+        received from the server, is kept in the permanent revision cache, so
+        each historical revision is only downloaded once. When it is already
+        cached, suds parses the cached response instead of sending the
+        request to the server. Only successful responses of objects that were
+        resolved are cached.
+
+        Args:
+            function_name: the name of the WSDL function to call
+            parms (list): the parameters of the WSDL function
+            client: the name of the session client the function belongs to
+                    default: tracker_client
+
+        Returns:
+            the result of the WSDL function
+        """
+        suds_client = getattr(cls.session, client)
+        func = getattr(suds_client.service, function_name)
+        cache = getattr(cls.session, "revision_cache", None)
+        if not cache:
+            return func(*parms)
+        key = cache.key(cls.session._server.url, cls.session.user_id,
+                        function_name, parms)
+        reply = cache.get(key)
+        if reply is not None:
+            # __inject makes suds parse the given reply instead of sending
+            # the request.
+            return func(*parms, **{"__inject": {"reply": reply}})
+        res = func(*parms)
+        reply = suds_client.last_reply
+        if reply is not None and cls._is_cacheable(res):
+            cache.put(key, reply)
+        return res
+
+    @classmethod
+    def _search_call(cls, query, is_sql=False, fields=None, sort=None,
+                     limit=-1, baseline_revision=None, query_uris=False,
+                     search_templates=False, suds_map=None):
+        """Calls the WSDL search function described by the _search_spec of
+        the class. The function name and the parameter list are built based
+        on the parameters passed in.
+
+        The _search_spec dict contains:
+            client: the session client of the search functions
+            function: the name of the function returning objects
+            uris_function: the name of the function returning URIs
+            templates_function: the name of the function searching templates
+            baseline: suffix of the functions that search in a baseline
+            sql: suffix of the functions that accept an SQL query
+            fields: "always" if the fields parameter is always passed, else
+                    the suffix of the function that accepts fields
+            limit: "always" if the limit parameter is always passed (except
+                   for SQL queries), else the suffix of the function that
+                   accepts a limit. None if there is no limit parameter.
+            parms: the order of the parameters (query, sort,
+                   baseline_revision, fields, limit).
+                   default: DEFAULT_SEARCH_PARMS
+            uris_parms: parameters added to the uris_function parameters
+            sort_attrs: True if the sort is given as an object attribute,
+                        else it is passed as a Lucene sort string
+            key: the field that is used for paging (see _search). Its values
+                 must be unique in the results of a query and it must be
+                 sorted lexicographically. Types without a key can't be
+                 paged.
+
+        Args:
+            see _search
+
+        Returns:
+            list of the WSDL objects or URIs that were found
+        """
+        spec = cls._search_spec
+        if search_templates:
+            function_name = spec["templates_function"]
+        elif query_uris:
+            function_name = spec["uris_function"]
+        else:
+            function_name = spec["function"]
+        values = {"query": query}
+        if not is_sql:
+            csm = (suds_map or cls._cls_suds_map).get(sort) \
+                if spec.get("sort_attrs") else None
+            values["sort"] = csm["field_name"] if isinstance(csm, dict) \
+                else csm or sort
+        if baseline_revision:
+            values["baseline_revision"] = baseline_revision
+            function_name += spec["baseline"]
+        if is_sql:
+            function_name += spec["sql"]
+        if not query_uris and spec.get("fields"):
+            p_fields = cls._convert_obj_fields_to_polarion(fields, suds_map)
+            if spec["fields"] == "always":
+                values["fields"] = p_fields
+            elif p_fields:
+                values["fields"] = p_fields
+                function_name += spec["fields"]
+        if spec.get("limit") == "always":
+            if not is_sql:
+                values["limit"] = limit
+        elif spec.get("limit") and not is_sql and limit != -1:
+            # You can't have both SQL and limited.
+            values["limit"] = limit
+            function_name += spec["limit"]
+        parms = [values[parm] for parm in
+                 spec.get("parms", cls.DEFAULT_SEARCH_PARMS)
+                 if parm in values]
+        if query_uris:
+            parms += spec.get("uris_parms", [])
+        if baseline_revision:
+            # the content of a baseline can never change, so it is cached
+            results = cls._pinned_call(function_name, parms, spec["client"])
+        else:
+            results = getattr(getattr(cls.session, spec["client"]).service,
+                              function_name)(*parms)
+        return results or []
+
+    @classmethod
+    def _search(cls, query, is_sql=False, fields=None, sort=None, limit=-1,
+                baseline_revision=None, query_uris=False,
+                search_templates=False, page_size=None, wrap_page=None,
+                suds_map=None):
+        """The search core used by the query and search functions of all the
+        object types. It dispatches to the WSDL function described by the
+        _search_spec of the class (see _search_call) and converts the results
+        to objects of the class.
+
+        When page_size is given, the results are fetched page by page, using
+        the key field of the _search_spec: the results are sorted by the key
+        and every page queries only the keys after the last key of the
+        previous page (keyset paging). A generator is returned, so that only
+        one page is kept in memory at a time. Keyset paging is only correct
+        when the key is unique and the server sorts it the way the Lucene
+        range compares it, so types without a key (for example work items,
+        whose ids are sorted naturally and not lexicographically), types
+        whose functions have no limit parameter and SQL queries can't be
+        paged, and a page_size raises an exception for them.
+
+        Args:
+            query: the query, Lucene or SQL
+            is_sql (bool): the query is SQL. default: False
+            fields: list of the object fields to fill in the results
+            sort: the sort field, an object attribute for the types with
+                  sort_attrs, else a Lucene sort string. Ignored when the
+                  results are fetched with keyset paging.
+            limit: how many results to return (-1 means everything)
+            baseline_revision: if given, the query is done in the baseline
+            query_uris (bool): return URIs instead of objects
+            search_templates (bool): search the templates of the type
+            page_size (int): if given, returns a generator fetching
+                             page_size results at a time. Only the types
+                             with a key can be paged. default: None
+            wrap_page: function that converts a list of WSDL objects to the
+                       list of objects to return.
+                       default: calls the class with suds_object
+            suds_map (dict): the _cls_suds_map that converts the fields and
+                             the sort, for types whose fields depend on the
+                             project (see TestRun and _SpecificWorkItem).
+                             default: the class _cls_suds_map
+
+        Returns:
+            list (or generator when page_size is given) of objects or URIs
+        """
+        if not wrap_page:
+            wrap_page = (lambda results:
+                         [cls(suds_object=suds_obj) for suds_obj in results])
+        spec = cls._search_spec
+        if page_size and (is_sql or not spec.get("limit") or
+                          not spec.get("key")):
+            raise PyleroLibException(
+                "{0} results can't be fetched page by page{1}".format(
+                    cls.__name__, " by an SQL query" if is_sql else ""))
+        if not page_size:
+            results = cls._search_call(query, is_sql, fields, sort, limit,
+                                       baseline_revision, query_uris,
+                                       search_templates, suds_map)
+            return results if query_uris else wrap_page(results)
+        return cls._search_pages(query, fields, limit, baseline_revision,
+                                 query_uris, search_templates, page_size,
+                                 wrap_page, suds_map)
+
+    @classmethod
+    def _search_pages(cls, query, fields, limit, baseline_revision,
+                      query_uris, search_templates, page_size, wrap_page,
+                      suds_map):
+        """generator that does the keyset paging of _search"""
+        key = cls._search_spec["key"]
+        p_key = cls._convert_obj_fields_to_polarion(key, suds_map)[0]
+        # the key is needed in every result to query the next page, for
+        # URIs the objects are queried with the key only.
+        fields = [key] if query_uris else list(fields or [])
+        if fields and key not in fields:
+            fields.append(key)
+        last_key = None
+        remaining = limit
+        while remaining:
+            page_query = query
+            if last_key is not None:
+                page_query = '%s%s:{"%s" TO *}' % (
+                    "(%s) AND " % query if query else "", p_key, last_key)
+            count = page_size if remaining == -1 else \
+                min(page_size, remaining)
+            results = cls._search_call(page_query, False, fields, p_key, count,
+                                       baseline_revision, False,
+                                       search_templates, suds_map)
+            if not results:
+                return
+            if query_uris:
+                for suds_obj in results:
+                    yield suds_obj._uri
+            else:
+                for obj in wrap_page(results):
+                    yield obj
+            if len(results) < count:
+                return
+            if remaining != -1:
+                remaining -= len(results)
+            last_key = getattr(results[-1], p_key)
+
     @classmethod
     def get_global_roles(cls):
         """Returns all global roles.
@@ -315,8 +602,11 @@ class BasePolarion(object):
         # cls_suds_map must be available for some parameters on the class
         # level, but gets changed on the instance level and those changes
         # should not be accessible to other instances. This is the reason
-        # for overwriting it as an instance attribute.
-        self._cls_suds_map = copy.deepcopy(self._cls_suds_map)
+        # for overwriting it as an instance attribute. A child class that
+        # already set an instance map, which it doesn't share with the class
+        # (see TestRun), keeps it.
+        if "_cls_suds_map" not in self.__dict__:
+            self._cls_suds_map = copy.deepcopy(self._cls_suds_map)
         # _fix_circular_refs is a function that allows objects to contain
         # circular references by applying the reference only after the class
         # has been instantiated. Some objects contain references to themselves,
@@ -333,13 +623,30 @@ class BasePolarion(object):
             self._suds_object = suds_object
         else:
             self._get_suds_object()
-        # initialize all instance attributes as properties
+        # initialize all instance attributes as properties, unless the class
+        # already created them for all its objects (see TestRun).
+        if not self._shared_properties:
+            self._add_properties(self._cls_suds_map)
+# after all properties are defined set the id field to the value passed in.
+        if obj_id is not None:
+            setattr(self, self._id_field, obj_id)
+
+    @classmethod
+    def _add_properties(cls, suds_map):
+        """Creates the properties of the fields of the suds_map on the class.
+
+        Args:
+            suds_map (dict): a _cls_suds_map of the class
+
+        Returns:
+            None
+        """
         # check if the property already exists. If so, use existing.
-        for key in list(self._cls_suds_map.keys()):
-            if not hasattr(self.__class__, key):
+        for key in list(suds_map.keys()):
+            if not hasattr(cls, key):
                 # require default values for lambda or it evaluates all
                 # variables
-                # at the end of function (self._cls_suds_map[key] was evaluated
+                # at the end of function (suds_map[key] was evaluated
                 # as the last key value in the for loop for all defined lambdas
                 # Property Builder, parses _cls_suds_map to build properties:
                 # custom fields:
@@ -362,36 +669,31 @@ class BasePolarion(object):
                 #        field_name
                 # regular fields;
                 #    use getattr and setattr
-                if isinstance(self._cls_suds_map[key], dict):
-                    if "is_custom" in self._cls_suds_map[key]:
-                        setattr(self.__class__, key, property(
+                if isinstance(suds_map[key], dict):
+                    if "is_custom" in suds_map[key]:
+                        setattr(cls, key, property(
                             lambda self, field_name=key:
                                 self._custom_getter(field_name),
                             lambda self, val, field_name=key:
                                 self._custom_setter(val, field_name)))
-                    elif "is_array" in self._cls_suds_map[key]:
-                        setattr(self.__class__, key, property(
+                    elif "is_array" in suds_map[key]:
+                        setattr(cls, key, property(
                             lambda self, field_name=key:
                                 self._arr_obj_getter(field_name),
                             lambda self, val, field_name=key:
                                 self._arr_obj_setter(val, field_name)))
                     else:
-                        setattr(self.__class__, key, property(
+                        setattr(cls, key, property(
                             lambda self, field_name=key:
                                 self._obj_getter(field_name),
                             lambda self, val, field_name=key:
                                 self._obj_setter(val, field_name)))
                 else:
-                    setattr(self.__class__, key, property(
-                        # if the attribute doesn't exist in the current object
-                        # return None
-                        lambda self, suds_key=self._cls_suds_map[key]:
-                            getattr(self._suds_object, suds_key, None),
-                        lambda self, value, suds_key=self._cls_suds_map[key]:
+                    setattr(cls, key, property(
+                        lambda self, field_name=key:
+                            self._regular_getter(field_name),
+                        lambda self, value, suds_key=suds_map[key]:
                             self._regular_setter(value, suds_key)))
-# after all properties are defined set the id field to the value passed in.
-        if obj_id is not None:
-            setattr(self, self._id_field, obj_id)
 
     def _get_suds_object(self):
         """Returns the WSDL object as created by the Polarion WSDL factory"""
@@ -401,6 +703,33 @@ class BasePolarion(object):
         else:
             self._suds_object = None
 
+    @classmethod
+    def _suds_template(cls):
+        """Returns an empty WSDL object of the class, as set by
+        _get_suds_object. It is created once per class and cached, so that
+        type checks and empty values don't need to instantiate the class.
+        The template must not be changed, see _new_suds_object.
+        """
+        templates = cls._cache["suds_templates"]
+        if cls not in templates:
+            # only the WSDL object is needed, not the whole instance
+            obj = cls.__new__(cls)
+            obj._get_suds_object()
+            templates[cls] = obj._suds_object
+        return templates[cls]
+
+    @classmethod
+    def _suds_class(cls):
+        """Returns the class of the WSDL objects of the class, to check if a
+        value is a WSDL object of the class."""
+        return cls._suds_template().__class__
+
+    @classmethod
+    def _new_suds_object(cls):
+        """Returns a new empty WSDL object of the class (a copy of the
+        template)."""
+        return copy.deepcopy(cls._suds_template())
+
     def _obj_getter(self, field_name):
         """get function for attributes that reference an object.
         Returns the referenced object. If the WSDL attribute contains a value
@@ -411,6 +740,7 @@ class BasePolarion(object):
         Args:
             field_name: the field name of the Polarion object to get
         """
+        self._fault_in(field_name)
         csm = self._cls_suds_map[field_name]
         named_arg = csm.get("named_arg", "suds_object")
         suds_field_val = getattr(
@@ -426,6 +756,9 @@ class BasePolarion(object):
                 args = {}
                 args[named_arg] = suds_field_val
                 obj = cls_obj(**args)
+        elif cls_obj._id_field:
+            # the id of an empty object is None, the object isn't needed
+            return None
         else:
             obj = cls_obj()
         if cls_obj._id_field:
@@ -466,10 +799,9 @@ class BasePolarion(object):
         elif isinstance(val, obj_cls):
             setattr(self._suds_object, suds_field_name,
                     getattr(val, sync_field))
-        elif isinstance(val, obj_cls()._suds_object.__class__):
-            obj = obj_cls()
-            if sync_field in obj._cls_suds_map:
-                suds_sync_field = obj._cls_suds_map[sync_field]
+        elif isinstance(val, obj_cls._suds_class()):
+            if sync_field in obj_cls._cls_suds_map:
+                suds_sync_field = obj_cls._cls_suds_map[sync_field]
                 # if sync_field is given, the attribute will be simple
                 val = getattr(val, suds_sync_field)
             setattr(self._suds_object, suds_field_name, val)
@@ -486,6 +818,7 @@ class BasePolarion(object):
         Args:
             field_name: the field name of the Polarion object to get
         """
+        self._fault_in(field_name)
         csm = self._cls_suds_map[field_name]
         if getattr(self._suds_object, csm["field_name"], None):
             obj_lst = []
@@ -509,21 +842,19 @@ class BasePolarion(object):
         """
         # TODO: Still needs to be fully tested. Looks like there are some bugs.
         csm = self._cls_suds_map[field_name]
-        arr_inst = csm.get("arr_cls")()
-        obj_inst = csm.get("cls")()
-        # obj_attach =
-        if not isinstance(val,
-                          (list, arr_inst.__class__,
-                           arr_inst._suds_object.__class__)):
+        arr_cls = csm.get("arr_cls")
+        obj_cls = csm.get("cls")
+        if not isinstance(val, (list, arr_cls, arr_cls._suds_class())):
             raise PyleroLibException(
-                "{0}s must be a list of {1}").format(
-                    csm["field_name"], obj_inst.__class__.__name__)
+                "{0}s must be a list of {1}".format(
+                    csm["field_name"], obj_cls.__name__))
         elif not val:
             setattr(
-                self._suds_object, csm["field_name"], arr_inst._suds_object)
-        elif isinstance(val, arr_inst._suds_object.__class__):
+                self._suds_object, csm["field_name"],
+                arr_cls._new_suds_object())
+        elif isinstance(val, arr_cls._suds_class()):
             setattr(self._suds_object, csm["field_name"], val)
-        elif isinstance(val, arr_inst.__class__):
+        elif isinstance(val, arr_cls):
             setattr(self._suds_object, csm["field_name"], val._suds_object)
         else:
             if isinstance(val, list):
@@ -533,12 +864,12 @@ class BasePolarion(object):
                     val[0] = self._check_encode(val[0])
                     val = [csm["cls"](item) for item in val]
 
-                if isinstance(val[0], obj_inst._suds_object.__class__):
+                if isinstance(val[0], obj_cls._suds_class()):
                     setattr(getattr(self._suds_object, csm["field_name"]),
                             csm["inner_field_name"], val)
                 else:
                     setattr(self._suds_object, csm["field_name"],
-                            arr_inst._suds_object)
+                            arr_cls._new_suds_object())
                     for item in val:
                         getattr(getattr(self._suds_object, csm["field_name"]),
                                 csm["inner_field_name"]).append(
@@ -565,10 +896,17 @@ class BasePolarion(object):
         test_steps do not work like all other custom fields, and therefore
         require specific code. Its values are not saved in the local object.
 
+        The property of a custom field is defined on the class, so objects
+        of a project that doesn't have the field (see TestRun and
+        _SpecificWorkItem) have it too. It returns None for them.
+
         Args:
             field_name: the field name of the Polarion object to get
         """
-        csm = self._cls_suds_map[field_name]
+        csm = self._cls_suds_map.get(field_name)
+        if csm is None:
+            return None
+        self._fault_in(field_name)
         if field_name == "test_steps":
             if self._changed_fields.get("testSteps"):
                 return csm["cls"](
@@ -587,7 +925,9 @@ class BasePolarion(object):
                 match = [x for x in cf if x.key == csm["field_name"]]
                 if match:
                     custom_fld = match[0]
-            if not custom_fld and self.uri:
+            # objects that know which fields were loaded don't have to check
+            # the server, a loaded field without a value is empty.
+            if not custom_fld and self.uri and self._loaded_fields is None:
                 custom_fld = self.get_custom_field(
                     csm["field_name"])._suds_object
             if custom_fld:
@@ -622,13 +962,17 @@ class BasePolarion(object):
             val: the value that the property is being set to
             field_name: the field name of the Polarion object to set
         """
-        csm = self._cls_suds_map[field_name]
+        csm = self._cls_suds_map.get(field_name)
+        if csm is None:
+            raise PyleroLibException(
+                "{0} is not a field of the project of this object".format(
+                    field_name))
         if field_name == "test_steps":
             if not val:
                 self._changed_fields[csm["field_name"]] = None
             elif isinstance(val, csm["cls"]):
                 self._changed_fields[csm["field_name"]] = val._suds_object
-            elif isinstance(val, csm["cls"]()._suds_object.__class__):
+            elif isinstance(val, csm["cls"]._suds_class()):
                 self._changed_fields[csm["field_name"]] = val
             else:
                 raise PyleroLibException(
@@ -661,7 +1005,7 @@ class BasePolarion(object):
                 if not isinstance(val, list):
                     raise PyleroLibException("value must be a list")
                 if csm.get("enum_id"):
-                    cust.value = csm["cls"]()._suds_object
+                    cust.value = csm["cls"]._new_suds_object()
                     for i in val:
                         if i not in csm.get("enum_override", []):
                             # uses deepcopy, to not affect other instances
@@ -677,7 +1021,7 @@ class BasePolarion(object):
 
             elif isinstance(val, csm["cls"]):
                 cust.value = val._suds_object
-            elif isinstance(val, csm["cls"]()._suds_object.__class__):
+            elif isinstance(val, csm["cls"]._suds_class()):
                 cust.value = val
             else:
                 raise PyleroLibException(
@@ -697,6 +1041,28 @@ class BasePolarion(object):
             else:
                 self._custom_fields = [cust]
 
+    def _regular_getter(self, field_name):
+        """get function for attributes that are not Polarion object data
+        types. If the attribute doesn't exist in the current object it returns
+        None
+
+        Args:
+            field_name: the field name of the Polarion object to get
+        """
+        self._fault_in(field_name)
+        return getattr(self._suds_object, self._cls_suds_map[field_name],
+                       None)
+
+    def _fault_in(self, field_name):
+        """Called by the getters before the value of a field is returned.
+        Objects that can be partially populated (see _loaded_fields) override
+        it to load the field from the server when it was not populated.
+
+        Args:
+            field_name: the field name of the Pylero object that is gotten
+        """
+        pass
+
     def _regular_setter(self, value, field_name):
         """This setter is used for any attributes that are not Polarion object
         data types. If the attribute type is a string, then it validates it
@@ -733,7 +1099,9 @@ class BasePolarion(object):
 
     def _get_file_data(self, path):
         """Method for getting attachment data that can be passed to the soap
-        library. Is used by a number of child classes.
+        library. The attachment functions of the child classes stream the file
+        instead (see _SudsClientWrapper.call_with_file), this keeps the whole
+        file in memory.
 
         Args:
             path: the file path
@@ -927,12 +1295,15 @@ class BasePolarion(object):
         References:
             Tracker.getEnumOptionsForId
         """
-        project_id = getattr(self, "project_id", None) or self.default_project
         enum_base = self._cache["enums"].get(enum_id)
         enums = None
         if enum_base:
             enums = enum_base.get(control)
         if not enums:
+            # the default project is only needed to get the options from
+            # the server, so cached options don't need a session.
+            project_id = getattr(self, "project_id", None) or \
+                self.default_project
             enums = self.session.tracker_client.service. \
                 getEnumOptionsForIdWithControl(project_id, enum_id, control)
             self._cache["enums"][enum_id]={}
@@ -31,6 +31,8 @@ class Baseline(BasePolarion):
                      "_unresolved": "_unresolved"}
     _obj_client = "tracker_client"
     _obj_struct = "tns3:Baseline"
+    _search_spec = {"client": "tracker_client",
+                    "function": "queryBaselines"}
 
     @classmethod
     def create(cls, project_id, name, description, revision):
@@ -67,8 +69,4 @@ class Baseline(BasePolarion):
         References:
             Tracker.queryBaselines
         """
-        baselines = []
-        for suds_base in cls.session.tracker_client.service.queryBaselines(
-                query, sort):
-            baselines.append(Baseline(suds_object=suds_base))
-        return baselines
+        return cls._search(query, sort=sort)
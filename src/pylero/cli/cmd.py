@@ -9,6 +9,8 @@ from pylero.work_item import TestCase
 from pylero.work_item import Requirement
 from pylero.test_run import TestRun
 from pylero.plan import Plan
+from pylero.result_publisher import ResultPublisher
+from pylero.session_pool import SessionPool
 
 
 class CmdList(object):
@@ -224,11 +226,62 @@ class CmdUpdate(object):
                                             rec)
         print('Done!')
 
-    def update_all_case_results_for_runs(self, runs, result, user, comment):
+    def update_all_case_results_for_runs(self, runs, result, user, comment,
+                                         workers=8):
         if runs.find(','):
-            for run in runs.split(','):
-                self.update_all_case_results_for_run(run, result,
-                                                     user, comment)
+            run_ids = [run.strip() for run in runs.split(',')]
+            if not comment:
+                comment = ''
+            if user == 'None':
+                user = TestRun.logged_in_user_id
+            executed = datetime.datetime.now()
+
+            # the test cases of the runs are read and the runs are published
+            # concurrently. The existing records are updated, so only the
+            # result, the comment and the execution fields are changed.
+            def case_ids(run):
+                tr = TestRun(run, None, TestRun.default_project)
+                return [rec.test_case_id for rec in tr.records]
+            with SessionPool(workers) as pool:
+                loaded = dict(zip(run_ids, pool.map(
+                    case_ids, run_ids, return_exceptions=True)))
+            run_cases = dict((run, cases) for run, cases in loaded.items()
+                             if not isinstance(cases, Exception))
+            results = dict(
+                (run, [{'test_case_id': case_id,
+                        'result': result,
+                        'comment': comment,
+                        'executed_by': user,
+                        'executed': executed} for case_id in cases])
+                for run, cases in run_cases.items())
+            publisher = ResultPublisher(workers=workers,
+                                        project_id=TestRun.default_project)
+            summary = publisher.publish(results)
+
+            executed_str = str(executed).split('.')[0]
+            for run in run_ids:
+                print('\nUpdate %s:' % run)
+                if run not in run_cases:
+                    print('Failed: %s' % loaded[run])
+                    continue
+                stats = summary['runs'][run]
+                published = set(stats['published'])
+                print('Total records: %d' % len(run_cases[run]))
+                print('Updated Date Time    Result  CaseID')
+                print('-------------------  ------  -----------')
+                for case_id in run_cases[run]:
+                    if case_id in published:
+                        print('%-20s %-7s %s' % (executed_str, result,
+                                                 case_id))
+                    else:
+                        print('%-20s %-7s %s' % ('Not updated', '',
+                                                 case_id))
+                if stats['error']:
+                    print('Failed: %s' % stats['error'])
+                else:
+                    print('Done!')
+            print('\nUpdated %d records of %d runs in %.1f seconds' %
+                  (summary['records'], len(run_cases), summary['seconds']))
         else:
             print("Please use comma ',' to seperate your runs!")
 
@@ -319,7 +372,11 @@ class CmdUpdate(object):
                    assignee=None,
                    status=None,
                    description=None,
-                   is_template=False):
+                   is_template=False,
+                   output=None):
+        # the messages are added to output if it is given, instead of being
+        # printed
+        out = output.append if output is not None else print
 
         run = run.strip()
         query_ful = 'project.id:%s AND id:%s' % (TestRun.default_project,
@@ -341,7 +398,7 @@ class CmdUpdate(object):
 
         # Update run if exists, otherwise create it.
         if st:
-            print('Update the existing run: %s' % run)
+            out('Update the existing run: %s' % run)
             tr = TestRun(run,
                          None,
                          TestRun.default_project)
@@ -349,16 +406,16 @@ class CmdUpdate(object):
             # set fields
             if assignee != 'None':
                 tr.assignee = assignee
-                print('%4sSet Assignee to %s' % ('', assignee))
+                out('%4sSet Assignee to %s' % ('', assignee))
             if plannedin is not None:
                 tr.plannedin = plannedin
-                print('%4sSet Plannedin to %s' % ('', plannedin))
+                out('%4sSet Plannedin to %s' % ('', plannedin))
             if status is not None:
                 tr.status = status
-                print('%4sSet Status to %s' % ('', status))
+                out('%4sSet Status to %s' % ('', status))
             if description is not None:
                 tr.description = description
-                print('%4sSet Description to %s' % ('', description))
+                out('%4sSet Description to %s' % ('', description))
             tr.update()
 
         else:
@@ -371,14 +428,14 @@ class CmdUpdate(object):
                                 description=description)
             # display fields
             if assignee != 'None':
-                print('%4sSet Assignee to %s' % ('', assignee))
+                out('%4sSet Assignee to %s' % ('', assignee))
             if plannedin is not None:
-                print('%4sSet Plannedin to %s' % ('', plannedin))
+                out('%4sSet Plannedin to %s' % ('', plannedin))
             if status is not None:
-                print('%4sSet Status to %s' % ('', status))
+                out('%4sSet Status to %s' % ('', status))
             if description is not None:
-                print('%4sSet Description to %s' % ('', description))
-            print('Created %s:' % run)
+                out('%4sSet Description to %s' % ('', description))
+            out('Created %s:' % run)
 
     def update_runs(self,
                     runs,
@@ -386,16 +443,33 @@ class CmdUpdate(object):
                     plannedin=None,
                     assignee=None,
                     status=None,
-                    description=None):
+                    description=None,
+                    workers=8):
 
         if runs.find(','):
-            for run in runs.split(','):
-                self.update_run(run,
-                                template,
-                                plannedin,
-                                assignee,
-                                status,
-                                description)
+            # the runs are updated concurrently, by sessions that log in
+            # separately so that each run is updated in its own transaction.
+            # The messages of each run are printed together, in the order of
+            # the runs.
+            def update(run):
+                output = []
+                try:
+                    self.update_run(run,
+                                    template,
+                                    plannedin,
+                                    assignee,
+                                    status,
+                                    description,
+                                    output=output)
+                except Exception as e:
+                    output.append('Failed to update %s: %s' % (run.strip(),
+                                                               e))
+                return output
+            with SessionPool(workers, share_login=False) as pool:
+                outputs = pool.map(update, runs.split(','))
+            for output in outputs:
+                for line in output:
+                    print(line)
             print('Done!')
         else:
             print("Please use comma ',' to seperate your runs!")
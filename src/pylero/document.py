@@ -131,6 +131,13 @@ class Document(BasePolarion):
         "_unresolvable": "_unresolvable"}
     _obj_client = "test_management_client"
     _obj_struct = "tns4:Module"
+    _search_spec = {"client": "tracker_client",
+                    "function": "queryModules",
+                    "uris_function": "queryModuleUris",
+                    "baseline": "InBaseline",
+                    "sql": "BySQL",
+                    "fields": "always",
+                    "limit": "always"}
     # The uri struct of a module is different then others because of extra
     # moduleFolder element. Also requires a substitution from # to / and back
     URI_STRUCT = "subterra:data-service:objects:/default/" \
@@ -272,33 +279,8 @@ class Document(BasePolarion):
             queryModulesInBaseline
             queryModulesInBaselineBySQL
         """
-        parms = [query]
-        # The parameters have to be listed in the specific order, based on the
-        # specific function called. That's why there are 2 if not is_sql
-        # conditions.
-        if not is_sql:
-            parms.append(sort)
-        if baseline_revision:
-            parms.append(baseline_revision)
-        if not query_uris:
-            p_fields = cls._convert_obj_fields_to_polarion(fields)
-            parms.append(p_fields)
-        if not is_sql:
-            parms.append(limit)
-        if not query_uris:
-            base_name = "queryModules"
-        else:
-            base_name = "queryModuleUris"
-        if baseline_revision:
-            base_name += "InBaseline"
-        if is_sql:
-            base_name += "BySQL"
-        docs = getattr(cls.session.tracker_client.service, base_name)(*parms)
-        if query_uris:
-            return docs
-        else:
-            lst_doc = [Document(suds_object=doc) for doc in docs]
-            return lst_doc
+        return cls._search(query, is_sql, fields, sort, limit,
+                           baseline_revision, query_uris)
 
     def __init__(self, project_id=None, doc_with_space=None, fields=None,
                  uri=None, suds_object=None):
@@ -0,0 +1,294 @@
+# -*- coding: utf8 -*-
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+from pylero._compatible import basestring, object
+import datetime
+import json
+import os
+import re
+import tempfile
+from xml.etree import ElementTree
+from pylero.base_polarion import lazy_import
+from pylero.exceptions import PyleroLibException
+
+
+def property_rule(property_name="polarion-testcase-id"):
+    """Returns a mapping rule that takes the test case id from a property of
+    the testcase element, as in:
+        <testcase name="test_x" classname="tests.a">
+          <properties>
+            <property name="polarion-testcase-id" value="PROJ-1234"/>
+          </properties>
+        </testcase>
+
+    Args:
+        property_name: the name of the property, default: polarion-testcase-id
+
+    Returns:
+        function(testcase element) -> test case id or None
+    """
+    def rule(testcase):
+        for prop in testcase.iter("property"):
+            if prop.get("name") == property_name:
+                return prop.get("value")
+        return None
+    return rule
+
+
+def regex_rule(pattern):
+    """Returns a mapping rule that takes the test case id from the
+    "classname.name" of the testcase element. If the pattern has a group, the
+    first group is the test case id, else the whole match.
+
+    Args:
+        pattern: regular expression, for example: r"PROJ-\\d+"
+
+    Returns:
+        function(testcase element) -> test case id or None
+    """
+    regex = re.compile(pattern)
+
+    def rule(testcase):
+        full_name = "%s.%s" % (testcase.get("classname", ""),
+                               testcase.get("name", ""))
+        match = regex.search(full_name)
+        if not match:
+            return None
+        return match.group(1) if regex.groups else match.group(0)
+    return rule
+
+
+class JUnitImporter(object):
+    """Imports the results of a JUnit/xUnit XML file into a TestRun.
+
+    The file is parsed as a stream (iterparse) and every testcase element is
+    removed from the tree after it is read, so memory is bounded by the batch
+    size and not by the size of the file. The records are published in
+    batches: new records with TestRun.add_test_records and records of test
+    cases that are already in the run with
+    TestRun.update_test_record_by_object. The test run status is changed once
+    at the end of the import (see TestRun.defer_status_change).
+
+    Results:
+        failure or error element: failed
+        skipped element: blocked
+        otherwise: passed
+    A test case that appears more than once in a batch gets the worst result.
+
+    Checkpoint:
+        If a checkpoint file is given, the number of testcase elements that
+        were published is saved in it after every batch. Running the import
+        again with the same checkpoint skips the published testcases, so an
+        import that failed continues where it stopped. The incident reports
+        of the failed records of a batch are created before the batch is
+        published and their ids are saved in the checkpoint, so that a batch
+        that is published again does not create them again. The checkpoint
+        is removed when the import completes.
+
+    Example:
+        tr = TestRun(project_id="proj1", test_run_id="run1")
+        importer = JUnitImporter(tr, regex_rule(r"PROJ-\\d+"),
+                                 checkpoint_path="/tmp/run1.checkpoint")
+        stats = importer.run("results.xml")
+
+    Attributes:
+        test_run (TestRun): the test run the results are added to
+        rule: function(testcase element) -> test case id or None
+        batch_size (int): the number of records published at a time
+        checkpoint_path (str): the checkpoint file or None
+        executed_by (str): the user id of the records
+        concurrency (int): see TestRun.add_test_records
+    """
+    RESULT_ORDER = ["passed", "blocked", "failed"]
+    # comments are truncated to this length
+    MAX_COMMENT = 4000
+
+    def __init__(self, test_run, rule=None, batch_size=500,
+                 checkpoint_path=None, executed_by=None, concurrency=4):
+        """JUnitImporter constructor
+
+        Args:
+            test_run (TestRun): the test run to import into
+            rule: function(testcase element) -> test case id or None, or a
+                  regular expression string (see regex_rule).
+                  default: property_rule()
+            batch_size (int): records per batch, default: 500
+            checkpoint_path (str): checkpoint file, default: None
+            executed_by (str): user id, default: the logged in user
+            concurrency (int): see TestRun.add_test_records, default: 4
+        """
+        if rule is None:
+            rule = property_rule()
+        elif isinstance(rule, basestring):
+            rule = regex_rule(rule)
+        self.test_run = test_run
+        self.rule = rule
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.executed_by = executed_by or test_run.logged_in_user_id
+        self.concurrency = concurrency
+        # test case id -> the id of the incident report that was created for
+        # the record of the batch that is being published
+        self._incidents = {}
+
+    def _read_checkpoint(self, path):
+        if not self.checkpoint_path or \
+                not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint["test_run"] != self.test_run.uri or \
+                checkpoint["file"] != os.path.abspath(path):
+            raise PyleroLibException(
+                "The checkpoint {0} is of another import"
+                .format(self.checkpoint_path))
+        self._incidents = checkpoint.get("incidents", {})
+        return checkpoint["processed"]
+
+    def _write_checkpoint(self, path, processed):
+        if not self.checkpoint_path:
+            return
+        # write to a temp file and rename it, so that a failure while writing
+        # does not corrupt the checkpoint.
+        dir_name = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=dir_name)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"test_run": self.test_run.uri,
+                       "file": os.path.abspath(path),
+                       "processed": processed,
+                       "incidents": self._incidents}, f)
+        os.rename(tmp_path, self.checkpoint_path)
+
+    def _result(self, testcase):
+        # returns the result and the comment of the testcase element
+        for tag, result in [("failure", "failed"), ("error", "failed"),
+                            ("skipped", "blocked")]:
+            elem = testcase.find(tag)
+            if elem is not None:
+                comment = elem.get("message") or elem.text or ""
+                return result, comment[:self.MAX_COMMENT]
+        return "passed", ""
+
+    def _build_record(self, test_case_id, testcase):
+        result, comment = self._result(testcase)
+        TestRecord = lazy_import("pylero.test_record").TestRecord
+        rec = TestRecord(self.test_run.project_id, test_case_id)
+        rec.result = result
+        rec.comment = comment
+        rec.duration = testcase.get("time") or "0"
+        rec.executed_by = self.executed_by
+        rec.executed = datetime.datetime.now()
+        return rec
+
+    def _merge(self, rec, new_rec):
+        # keeps the worst result of a test case that appears more than once
+        if self.RESULT_ORDER.index(new_rec.result) > \
+                self.RESULT_ORDER.index(rec.result):
+            return new_rec
+        return rec
+
+    def _create_incident_reports(self, path, processed, batch):
+        # the incident reports that were created when the batch was
+        # published before are reused.
+        for rec in batch:
+            if rec.result == "failed" and not rec.defect_case_id and \
+                    rec.test_case_id in self._incidents:
+                rec.defect_case_id = self._incidents[rec.test_case_id]
+        try:
+            self.test_run.create_incident_reports(batch, self.concurrency)
+        finally:
+            # saved even if some of the reports failed, so the ones that were
+            # created are not created again when the import is resumed.
+            self._incidents = dict(
+                (rec.test_case_id, rec.defect_case_id) for rec in batch
+                if rec.result == "failed" and rec.defect_case_id)
+            if self._incidents:
+                self._write_checkpoint(path, processed)
+
+    def _publish(self, path, processed, batch, stats):
+        # processed is the number of testcases published before the batch
+        self._create_incident_reports(path, processed, batch)
+        # the index includes the records added by the previous batches (see
+        # TestRun.add_test_records), so the run is not reloaded.
+        positions = self.test_run._get_record_index()["positions"]
+        new_recs = [rec for rec in batch if rec.test_case_id not in positions]
+        existing_recs = [rec for rec in batch if rec.test_case_id in positions]
+        if new_recs:
+            self.test_run.add_test_records(new_recs, self.concurrency)
+            stats["added"] += len(new_recs)
+        for rec in existing_recs:
+            self.test_run.update_test_record_by_object(rec.test_case_id, rec)
+            stats["updated"] += 1
+
+    def _testcases(self, path):
+        # generator of the testcase elements of the file. Every element is
+        # removed from its parent once it was handled, so the tree doesn't
+        # grow.
+        stack = []
+        for event, elem in ElementTree.iterparse(path,
+                                                 events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag == "testcase":
+                yield elem
+            if stack and stack[-1].tag in ["testsuite", "testsuites"]:
+                stack[-1].remove(elem)
+
+    def _import(self, path, resume_from, stats):
+        processed = 0
+        published = resume_from
+        batch = {}
+        for testcase in self._testcases(path):
+            processed += 1
+            if processed <= resume_from:
+                continue
+            test_case_id = self.rule(testcase)
+            if not test_case_id:
+                stats["unmapped"] += 1
+            else:
+                rec = self._build_record(test_case_id, testcase)
+                if test_case_id in batch:
+                    rec = self._merge(batch[test_case_id], rec)
+                batch[test_case_id] = rec
+            if len(batch) >= self.batch_size:
+                self._publish(path, published, list(batch.values()), stats)
+                batch = {}
+                published = processed
+                self._incidents = {}
+                self._write_checkpoint(path, processed)
+        if batch:
+            self._publish(path, published, list(batch.values()), stats)
+
+    def run(self, path):
+        """Imports the file.
+
+        Args:
+            path: the JUnit XML file
+
+        Returns:
+            dict with the number of testcases that were "added", "updated",
+            "unmapped" (no test case id) and "resumed" (skipped because
+            they were published before, see checkpoint)
+        """
+        self.test_run._verify_obj()
+        resume_from = self._read_checkpoint(path)
+        stats = {"added": 0, "updated": 0, "unmapped": 0,
+                 "resumed": resume_from}
+        # the status is changed once at the end, unless the caller already
+        # deferred it.
+        own_deferral = self.test_run._deferred_status is None
+        if own_deferral:
+            self.test_run.defer_status_change()
+        try:
+            self._import(path, resume_from, stats)
+        finally:
+            if own_deferral:
+                try:
+                    self.test_run.flush_status_change()
+                finally:
+                    self.test_run._deferred_status = None
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return stats
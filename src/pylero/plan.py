@@ -121,6 +121,13 @@ class Plan(BasePolarion):
         "_unresolved": "_unresolved"}
     _obj_client = "builder_client"
     _obj_struct = "tns6:Plan"
+    _search_spec = {"client": "planning_client",
+                    "function": "searchPlans",
+                    "templates_function": "searchPlanTemplates",
+                    "fields": "WithFields",
+                    "limit": "always",
+                    "parms": ["query", "sort", "limit", "fields"],
+                    "sort_attrs": True}
     _id_field = "plan_id"
 
     @classmethod
@@ -196,6 +203,7 @@ class Plan(BasePolarion):
             limit: the maximum number of records to be returned,
                    -1 for no limit.
             fields: list of the fields requested.
+            search_templates (bool): search plan templates instead of plans
 
         Returns:
             list of Plan objects
@@ -206,25 +214,8 @@ class Plan(BasePolarion):
             Planning.searchPlans
             Planning.searchPlansWithFields
         """
-        # function names and parameter lists generated dynamically based on
-        # parameters passed in.
-        if search_templates:
-            function_name = "searchPlanTemplates"
-        else:
-            function_name = "searchPlans"
-        if fields:
-            function_name += "WithFields"
-        p_sort = cls._cls_suds_map[sort] if not isinstance(
-            cls._cls_suds_map[sort], dict) else \
-            cls._cls_suds_map[sort]["field_name"]
-        parms = [query, p_sort, limit] + \
-            ([cls._convert_obj_fields_to_polarion(fields)]
-             if fields else [])
-        plans = []
-        for sud_plan in getattr(cls.session.planning_client.service,
-                                function_name)(*parms):
-            plans.append(Plan(suds_object=sud_plan))
-        return plans
+        return cls._search(query, fields=fields, sort=sort, limit=limit,
+                           search_templates=search_templates)
 
     def __init__(self, plan_id=None, project_id=None, uri=None,
                  suds_object=None):
@@ -263,7 +263,8 @@ class Project(BasePolarion):
 
     def get_tests_configuration(self):
         """method get_tests_configuration retrieves the test management
-        configuration for the project
+        configuration for the project. The configuration is cached per
+        project, so it is only retrieved from the server once.
 
         Args:
             None
@@ -275,8 +276,16 @@ class Project(BasePolarion):
             TestManagement.getTestsConfiguration
         """
         self._verify_obj()
-        tests_config = self.session.test_management_client.service. \
-            getTestsConfiguration(self.project_id)
+        # if the configuration is already cached, make a deep copy and use it.
+        # If not, get it and add it to the cache.
+        tests_config = self._cache["tests_configuration"].get(self.project_id)
+        if tests_config:
+            tests_config = copy.deepcopy(tests_config)
+        else:
+            tests_config = self.session.test_management_client.service. \
+                getTestsConfiguration(self.project_id)
+            self._cache["tests_configuration"][self.project_id] = \
+                copy.deepcopy(tests_config)
         return TestsConfiguration(suds_object=tests_config)
 
     def get_wiki_spaces(self):
@@ -0,0 +1,138 @@
+# -*- coding: utf8 -*-
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+from pylero._compatible import object
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import requests
+
+
+class RepoFileCache(object):
+    """On disk cache of files that are read from the SVN repository of the
+    server (for example the test run custom fields definitions), which are
+    not available through the API.
+
+    The files are downloaded through a single requests session, so the
+    connection to the repository is reused. Every file is saved in parsed
+    form, together with the ETag and Last-Modified headers of the response.
+    A file that was validated less than max_age seconds ago is returned
+    without contacting the server. Otherwise the server is asked for it with
+    If-None-Match/If-Modified-Since, and the saved file is returned if the
+    server answers 304 Not Modified.
+
+    Attributes:
+        cache_dir (str): the root directory of the store. If None, the files
+                         are only kept in memory
+        max_age (int): seconds a file is used without revalidation
+    """
+    FILES_DIR = "repo_files"
+
+    def __init__(self, cache_dir=None, max_age=300):
+        """RepoFileCache constructor.
+
+        Args:
+            cache_dir: the directory the store is kept in. It is created on
+                       the first write if it does not exist. default: None
+            max_age (int): seconds a file is used without revalidation,
+                           default: 300
+        """
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.max_age = max_age
+        self._entries = {}
+        self._http_session = None
+        self._lock = threading.Lock()
+
+    @property
+    def http_session(self):
+        """The requests session the files are downloaded with"""
+        with self._lock:
+            if self._http_session is None:
+                self._http_session = requests.Session()
+            return self._http_session
+
+    def _path(self, digest):
+        # 2 character fan out, so that no directory gets too big
+        return os.path.join(self.cache_dir, self.FILES_DIR, digest[:2],
+                            digest[2:])
+
+    def _load(self, digest):
+        if digest in self._entries:
+            return self._entries[digest]
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(digest)) as f:
+                entry = json.load(f)
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        except ValueError:
+            # a corrupt entry is downloaded again
+            return None
+        self._entries[digest] = entry
+        return entry
+
+    def _save(self, digest, entry):
+        self._entries[digest] = entry
+        if not self.cache_dir:
+            return
+        path = self._path(digest)
+        dir_name = os.path.dirname(path)
+        try:
+            os.makedirs(dir_name)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        # write to a temp file and rename it, so that concurrent readers never
+        # see a partially written file.
+        fd, tmp_path = tempfile.mkstemp(dir=dir_name)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def get(self, url, parse, auth=None, verify=True):
+        """Returns the parsed content of the file at the url.
+
+        Args:
+            url: the url of the file in the repository
+            parse: function(content bytes) -> json serializable value. It
+                   is only called when the file was changed
+            auth: the requests auth of the repository, default: None
+            verify: the requests verify parameter (bool or CA bundle path),
+                    default: True
+
+        Returns:
+            the value returned by parse
+        """
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        entry = self._load(digest)
+        if entry and time.time() - entry["validated"] < self.max_age:
+            return entry["data"]
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        response = self.http_session.get(url, auth=auth, verify=verify,
+                                         headers=headers)
+        if entry and response.status_code == 304:
+            entry["validated"] = time.time()
+        else:
+            response.raise_for_status()
+            entry = {"url": url,
+                     "etag": response.headers.get("ETag"),
+                     "last_modified": response.headers.get("Last-Modified"),
+                     "validated": time.time(),
+                     "data": parse(response.content)}
+        self._save(digest, entry)
+        return entry["data"]
@@ -0,0 +1,193 @@
+# -*- coding: utf8 -*-
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+from pylero._compatible import object
+import copy
+import datetime
+import time
+from pylero.base_polarion import BasePolarion, lazy_import
+from pylero.session_pool import SessionPool
+
+
+class ResultPublisher(object):
+    """Publishes test results to many test runs concurrently.
+
+    The runs are processed by a SessionPool, where every worker has its own
+    login, so that each run is published in its own transaction. The
+    sessions are logged out when publish ends. All the results of a run are
+    published by a single worker, in the order they are given: if a test case
+    has more than one result in a run, the last one is the one that is kept.
+    The status of each run is changed once, after all its results were
+    published (see TestRun.defer_status_change).
+
+    A result of a test case that already has a record in the run updates
+    that record: the fields that the result doesn't give (for example the
+    duration, the test step results and the attachments) keep their values.
+
+    A run that fails is published again, up to retries times, with the same
+    records: the records that were added by the failed attempt are updated
+    and their incident reports are not created again. A run that still fails
+    doesn't stop the other runs, it is reported in the summary returned by
+    publish.
+
+    Example:
+        publisher = ResultPublisher(workers=8)
+        summary = publisher.publish({
+            "run1": [{"test_case_id": "PROJ-1", "result": "passed"}],
+            "run2": [{"test_case_id": "PROJ-2", "result": "failed",
+                      "comment": "timeout"}]})
+        print(summary["failed_runs"])
+
+    Attributes:
+        workers (int): the number of runs published at a time
+        record_concurrency (int): the number of incident reports of a run
+                                  created at a time (see
+                                  TestRun.add_test_records)
+        project_id (str): the project of the runs
+        retries (int): the number of times a failed run is published again
+    """
+    # seconds to wait before the first retry of a failed run. It is doubled
+    # for every retry.
+    RETRY_DELAY = 1
+
+    def __init__(self, workers=8, record_concurrency=1, project_id=None,
+                 retries=1):
+        """ResultPublisher constructor
+
+        Args:
+            workers (int): the number of runs published at a time, default: 8
+            record_concurrency (int): see TestRun.add_test_records. default: 1
+            project_id (str): the project of the runs, default: the default
+                              project
+            retries (int): the number of times a failed run is published
+                           again, default: 1
+        """
+        self.workers = workers
+        self.record_concurrency = record_concurrency
+        self.project_id = project_id or BasePolarion.default_project
+        self.retries = retries
+
+    def _load_run(self, run_id):
+        return lazy_import("pylero.test_run").TestRun(
+            run_id, project_id=self.project_id)
+
+    def _build_record(self, test_run, result):
+        # results can be given as TestRecord objects or as dicts of the
+        # TestRecord fields
+        TestRecord = lazy_import("pylero.test_record").TestRecord
+        if isinstance(result, TestRecord):
+            return result
+        test_case_id = result["test_case_id"]
+        positions = test_run._get_record_index()["positions"]
+        if test_case_id in positions:
+            # a copy of the existing record, so that only the given fields
+            # are changed by the update
+            rec = TestRecord(suds_object=copy.deepcopy(
+                test_run._suds_object.records[0][positions[test_case_id]]))
+        else:
+            rec = TestRecord(test_run.project_id, test_case_id)
+            rec.duration = 0
+        rec.result = result["result"]
+        for field in ["comment", "duration", "defect_case_id"]:
+            if result.get(field) is not None:
+                setattr(rec, field, result[field])
+        rec.executed_by = result.get("executed_by",
+                                     test_run.logged_in_user_id)
+        rec.executed = result.get("executed", datetime.datetime.now())
+        return rec
+
+    def _group(self, test_run, results):
+        # one record per test case, the last result of a test case wins
+        records = {}
+        order = []
+        for result in results:
+            rec = self._build_record(test_run, result)
+            if rec.test_case_id in records:
+                order.remove(rec.test_case_id)
+            records[rec.test_case_id] = rec
+            order.append(rec.test_case_id)
+        return [records[case_id] for case_id in order]
+
+    def _publish_records(self, test_run, records, stats):
+        stats["added"] = 0
+        stats["updated"] = 0
+        stats["published"] = []
+        with test_run:
+            positions = test_run._get_record_index()["positions"]
+            new_recs = [rec for rec in records
+                        if rec.test_case_id not in positions]
+            existing_recs = [rec for rec in records
+                             if rec.test_case_id in positions]
+            if new_recs:
+                test_run.add_test_records(new_recs, self.record_concurrency)
+                stats["added"] = len(new_recs)
+                stats["published"] += [rec.test_case_id for rec in new_recs]
+            test_run.create_incident_reports(existing_recs,
+                                             self.record_concurrency)
+            for rec in existing_recs:
+                test_run.update_test_record_by_object(rec.test_case_id, rec)
+                stats["updated"] += 1
+                stats["published"].append(rec.test_case_id)
+
+    def _publish_run(self, run_results):
+        run_id, results = run_results
+        start = time.time()
+        stats = {"records": len(results), "added": 0, "updated": 0,
+                 "published": [], "attempts": 0, "seconds": 0,
+                 "error": None}
+        # the records are built once, so that a retry publishes the same
+        # records, with the incident reports that were already created.
+        records = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.RETRY_DELAY * 2 ** (attempt - 1))
+            stats["attempts"] = attempt + 1
+            try:
+                # the run is loaded again, with the records that were added
+                # by a failed attempt.
+                test_run = self._load_run(run_id)
+                if records is None:
+                    records = self._group(test_run, results)
+                self._publish_records(test_run, records, stats)
+                stats["error"] = None
+                break
+            except Exception as e:
+                stats["error"] = "%s: %s" % (e.__class__.__name__, e)
+        stats["seconds"] = time.time() - start
+        return run_id, stats
+
+    def publish(self, results_by_run):
+        """Publishes the results.
+
+        Args:
+            results_by_run (dict): run id -> list of results. A result is a
+                                   TestRecord or a dict with the keys
+                                   test_case_id, result and optionally
+                                   comment, duration, executed_by, executed
+                                   and defect_case_id
+
+        Returns:
+            dict with the keys:
+                runs: run id -> dict with the number of "records", "added"
+                      and "updated", the test case ids of the records that
+                      were "published", the number of "attempts", the
+                      "seconds" it took and the "error" (None if the run was
+                      published)
+                failed_runs: list of the run ids that failed
+                records: the number of records that were published
+                seconds: the total time
+                records_per_second: the throughput
+        """
+        start = time.time()
+        with SessionPool(self.workers, share_login=False) as pool:
+            runs = dict(pool.map(self._publish_run,
+                                 list(results_by_run.items())))
+        seconds = time.time() - start
+        records = sum(stats["added"] + stats["updated"]
+                      for stats in runs.values())
+        return {"runs": runs,
+                "failed_runs": sorted(run_id for run_id, stats in runs.items()
+                                      if stats["error"]),
+                "records": records,
+                "seconds": seconds,
+                "records_per_second": records / seconds if seconds else 0}
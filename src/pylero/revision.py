@@ -34,6 +34,11 @@ class Revision(BasePolarion):
                      "_unresolved": "_unresolved"}
     _obj_client = "builder_client"
     _obj_struct = "tns4:Revision"
+    _search_spec = {"client": "tracker_client",
+                    "function": "queryRevisions",
+                    "uris_function": "queryRevisionUris",
+                    "fields": "always",
+                    "uris_parms": [False]}
 
     @classmethod
     def query(cls, query, sort="name", fields=["name"], query_uris=False):
@@ -60,14 +65,8 @@ class Revision(BasePolarion):
         References:
             Tracker.queryRevisions
         """
-        if query_uris:
-            return cls.session.tracker_client.service.queryRevisionUris(
-                query, sort, False)
-        else:
-            revs = cls.session.tracker_client.service.queryRevisions(
-                query, sort, fields)
-            lst_rev = [Revision(suds_object=rev) for rev in revs]
-            return lst_rev
+        return cls._search(query, fields=fields, sort=sort,
+                           query_uris=query_uris)
 
 
 class ArrayOfRevision(BasePolarion):
@@ -0,0 +1,115 @@
+# -*- coding: utf8 -*-
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+from pylero._compatible import object
+import errno
+import hashlib
+import json
+import os
+import tempfile
+
+
+class RevisionCache(object):
+    """Permanent on disk store for server responses that can never change,
+    such as work items requested in a specific revision or queries run in a
+    baseline. Because the data of a past revision is immutable, there is no
+    expiry and no invalidation.
+
+    The store is content addressed. Each response is saved once under the
+    sha256 of its content in the objects directory and each request is saved
+    in the refs directory as a pointer to the content of its response. This
+    way identical responses (for example, an item that did not change between
+    two baselines) are only stored once.
+
+    Attributes:
+        cache_dir (str): the root directory of the store
+    """
+    OBJECTS_DIR = "objects"
+    REFS_DIR = "refs"
+
+    def __init__(self, cache_dir):
+        """RevisionCache constructor.
+
+        Args:
+            cache_dir: the directory the store is kept in. It is created on
+                       the first write if it does not exist.
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+
+    @staticmethod
+    def key(*parts):
+        """Builds the key of a request out of everything that identifies it
+        (server, user, function name, parameters, ...)
+
+        Args:
+            parts: json serializable values that identify the request
+
+        Returns:
+            str - hex digest of the request
+        """
+        data = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _path(self, sub_dir, digest):
+        # 2 character fan out, so that no directory gets too big
+        return os.path.join(self.cache_dir, sub_dir, digest[:2], digest[2:])
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+    def _write(self, path, data):
+        # write to a temp file and rename it, so that concurrent readers never
+        # see a partially written file.
+        dir_name = os.path.dirname(path)
+        try:
+            os.makedirs(dir_name)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, tmp_path = tempfile.mkstemp(dir=dir_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def get(self, key):
+        """Returns the cached response of the request or None if the request
+        was never stored.
+
+        Args:
+            key: the request key, as returned by the key function
+
+        Returns:
+            bytes or None
+        """
+        ref = self._read(self._path(self.REFS_DIR, key))
+        if ref is None:
+            return None
+        return self._read(self._path(self.OBJECTS_DIR, ref.decode("ascii")))
+
+    def put(self, key, content):
+        """Stores the response of a request.
+
+        Args:
+            key: the request key, as returned by the key function
+            content (bytes or str): the response. str is stored utf-8 encoded
+
+        Returns:
+            None
+        """
+        if not isinstance(content, bytes):
+            content = content.encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        obj_path = self._path(self.OBJECTS_DIR, digest)
+        if not os.path.exists(obj_path):
+            self._write(obj_path, content)
+        self._write(self._path(self.REFS_DIR, key), digest.encode("ascii"))
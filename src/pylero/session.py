@@ -2,12 +2,20 @@
 from __future__ import absolute_import, division, print_function
 from __future__ import unicode_literals
 from pylero._compatible import builtins,object,urlparse
+import base64
+import io
 import logging
+import os
 import time
+import uuid
+import requests
+import suds.client
 import suds.sax.element
 import ssl
-from suds.plugin import MessagePlugin
+from suds.plugin import MessagePlugin, PluginContainer
 from suds.sax.attribute import Attribute
+from suds.transport import TransportError
+from pylero.exceptions import PyleroLibException
 
 
 logger = logging.getLogger(__name__)
@@ -46,7 +54,88 @@ class SoapNull(MessagePlugin):
             element.attributes.append(Attribute('xsi:nil', 'true'))
 
 
+class _ReplyRecorder(MessagePlugin):
+    """suds plugin that keeps the raw reply of the last successful call, as it
+    was received from the server, before it is parsed or changed by other
+    plugins. It is used to cache replies that can never change (see
+    BasePolarion._pinned_call). A call that fails leaves it None.
+    """
+    def __init__(self):
+        self.reply = None
+
+    def sending(self, context):
+        self.reply = None
+
+    def received(self, context):
+        self.reply = context.reply
+
+
+class _Base64Envelope(object):
+    """File like object of a SOAP envelope that contains the content of a file
+    as base64Binary. The file is read and encoded a chunk at a time while the
+    envelope is read, so only a chunk of the file is in memory at a time.
+    The length of the envelope is known in advance (len), so it can be sent
+    with a Content-Length header.
+    """
+    # bytes of the file that are encoded at a time. Must be a multiple of 3,
+    # so that the encoded chunks can be concatenated.
+    CHUNK_SIZE = 3 * 64 * 1024
+
+    def __init__(self, prefix, path, suffix):
+        """_Base64Envelope constructor
+
+        Args:
+            prefix (bytes): the envelope before the file content
+            path: the path of the file
+            suffix (bytes): the envelope after the file content
+        """
+        self._prefix = prefix
+        self._path = path
+        self._suffix = suffix
+        self._chunks = self._iter_chunks()
+        self._buf = b""
+        self._pos = 0
+        self.len = len(prefix) + \
+            4 * ((os.path.getsize(path) + 2) // 3) + len(suffix)
+
+    def __len__(self):
+        return self.len
+
+    def _iter_chunks(self):
+        yield self._prefix
+        with open(self._path, "rb") as f:
+            while True:
+                data = f.read(self.CHUNK_SIZE)
+                if not data:
+                    break
+                yield base64.b64encode(data)
+        yield self._suffix
+
+    def read(self, size=-1):
+        parts = []
+        while size < 0 or size > 0:
+            if self._pos >= len(self._buf):
+                self._buf = next(self._chunks, None)
+                self._pos = 0
+                if self._buf is None:
+                    self._buf = b""
+                    break
+            end = len(self._buf) if size < 0 else self._pos + size
+            part = self._buf[self._pos:end]
+            self._pos += len(part)
+            if size > 0:
+                size -= len(part)
+            parts.append(part)
+        return b"".join(parts)
+
+
 class Session(object):
+    # attributes set by the Connection that are copied to cloned sessions
+    CLONED_ATTRS = ["default_project", "user_id", "password", "repo",
+                    "cache_dir", "revision_cache", "repo_file_cache"]
+
+    # bytes that are written at a time by download
+    DOWNLOAD_CHUNK = 64 * 1024
 
     def _url_for_name(self, service_name):
         """generate the full URL for the WSDL client services"""
@@ -65,6 +154,7 @@ class Session(object):
         self._last_request_at = None
         self._session_id_header = None
         self._cookies = None
+        self._http_session = None
         self._session_client = _SudsClientWrapper(
             self._url_for_name('Session'), None, timeout)
         self.builder_client = _SudsClientWrapper(
@@ -86,6 +176,62 @@ class Session(object):
             CERT_PATH = self._server.cert_path
             ssl._create_default_https_context = create_ssl_context
 
+    @property
+    def http_session(self):
+        """requests session to the server, used for the requests that are
+        not sent by suds (for example streamed uploads). It keeps its
+        connections open, so they are reused by the following requests."""
+        if self._http_session is None:
+            self._http_session = requests.Session()
+            self._http_session.verify = self._server.cert_path or True
+        return self._http_session
+
+    def download(self, url, path, length=None):
+        """Downloads a file of the server (for example the url of an
+        attachment) with the user of the session. The file is streamed to
+        path.part a chunk at a time and is renamed to path when it is
+        complete. If a path.part file exists, from a download that was
+        interrupted, the download continues from its end (Range request).
+
+        Args:
+            url: the url of the file
+            path: the path to save the file to
+            length (int): the expected size of the file. If given, the size
+                          of the downloaded file is verified. default: None
+
+        Returns:
+            the path of the file
+        """
+        part_path = path + ".part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) \
+            else 0
+        headers = {"Range": "bytes=%d-" % offset} if offset else {}
+        response = self.http_session.get(
+            url, headers=headers, stream=True,
+            auth=(self.user_id, self.password), timeout=self._server.timeout)
+        try:
+            # 416 means that the part file is already complete
+            if not (offset and response.status_code == 416):
+                response.raise_for_status()
+                # a server that doesn't support Range sends the whole file
+                mode = "ab" if response.status_code == 206 else "wb"
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(self.DOWNLOAD_CHUNK):
+                        f.write(chunk)
+        finally:
+            response.close()
+        size = os.path.getsize(part_path)
+        if length is not None and size != int(length):
+            if size > int(length):
+                os.remove(part_path)
+            raise PyleroLibException(
+                "The download of {0} has {1} bytes instead of {2}"
+                .format(url, size, length))
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(part_path, path)
+        return path
+
     def _login(self):
         """login to the Polarion API"""
         sc = self._session_client
@@ -100,6 +246,36 @@ class Session(object):
         sc.set_options(soapheaders=self._session_id_header)
         self._last_request_at = time.time()
 
+    def clone(self, share_login=True):
+        """Creates a new session to the same server with its own WSDL
+        clients. A suds client can't be used by more than one thread at a
+        time, so every thread that works concurrently needs its own session.
+
+        Args:
+            share_login (bool): if True, the new session uses the login of
+                                this session, so on the server it is the same
+                                session (including its transaction). If False
+                                it logs in separately and should be logged
+                                out with _logout when it is no longer needed
+                                (see SessionPool.close). default: True
+
+        Returns:
+            Session
+        """
+        session = Session(self._server, self._server.timeout)
+        for attr in self.CLONED_ATTRS:
+            if hasattr(self, attr):
+                setattr(session, attr, getattr(self, attr))
+        if share_login and self._session_id_header is not None:
+            session._session_id_header = self._session_id_header
+            session._cookies = self._cookies
+            session._last_request_at = self._last_request_at
+            session._session_client.set_options(
+                soapheaders=self._session_id_header)
+        else:
+            session._login()
+        return session
+
     def _logout(self):
         """logout from Polarion server"""
         self._session_client.service.endSession()
@@ -157,12 +333,21 @@ class _SudsClientWrapper(object):
             timeout (int): The HTTP timeout of the connection
         """
         plugin = SoapNull()
+        # the recorder is the first plugin, so it gets the reply before any
+        # other plugin changes it.
+        self._reply_recorder = _ReplyRecorder()
         self._suds_client = suds.client.Client(
             url,
-            plugins=[plugin],
+            plugins=[self._reply_recorder, plugin],
             timeout=timeout)
         self._enclosing_session = enclosing_session
 
+    @property
+    def last_reply(self):
+        """The raw reply (bytes) of the last call of the client that
+        succeeded, None if the last call failed"""
+        return self._reply_recorder.reply
+
     def __getattr__(self, attr):
         # every time a client function is called, this verifies that there is
         # still an active connection and if not, it reconnects.
@@ -186,3 +371,78 @@ class _SudsClientWrapper(object):
                 self._suds_client.options.headers["Cookie"] = \
                     "ROUTEID=%s" % route.value
         return getattr(self._suds_client, attr)
+
+    def call_with_file(self, function, path, *args):
+        """Calls the WSDL function with the content of the file as its last
+        (base64Binary) parameter. suds builds the whole SOAP envelope as a
+        string, which keeps the file in memory more than once, so the
+        envelope is built with a placeholder instead of the file content and
+        it is sent by the session http_session, with the file encoded a chunk
+        at a time in the place of the placeholder (see _Base64Envelope). The
+        memory used doesn't depend on the size of the file.
+
+        Args:
+            function: the name of the WSDL function
+            path: the path of the file
+            args: the parameters of the function before the file content
+
+        Returns:
+            the result of the WSDL function
+        """
+        # accessing service verifies the login and sets the headers
+        method = getattr(self.service, function).method
+        client = self._suds_client
+        placeholder = "pylero-file-%s" % uuid.uuid4().hex
+        binding = method.binding.input
+        soapenv = binding.get_message(method, list(args) + [placeholder], {})
+        PluginContainer(client.options.plugins).message.marshalled(
+            envelope=soapenv.root())
+        prefix, suffix = soapenv.plain().encode("utf-8").split(
+            placeholder.encode("utf-8"))
+        location = getattr(client.options, "location", None) or \
+            method.location
+        action = method.soap.action
+        if isinstance(location, bytes):
+            location = location.decode("utf-8")
+        if isinstance(action, bytes):
+            action = action.decode("utf-8")
+        headers = {"Content-Type": "text/xml; charset=utf-8",
+                   "SOAPAction": action}
+        headers.update(client.options.headers)
+        response = self._enclosing_session.http_session.post(
+            location, data=_Base64Envelope(prefix, path, suffix),
+            headers=headers, timeout=self._enclosing_session._server.timeout)
+        if response.status_code in (202, 204):
+            return None
+        # a reply with the status 500 is the SOAP fault of the server
+        if response.status_code != 500 or not response.content:
+            response.raise_for_status()
+        return self._process_reply(method, response)
+
+    def _process_reply(self, method, response):
+        """Processes the reply of a request that was not sent by suds, the
+        way suds processes the replies it receives: the plugins get the
+        reply, a SOAP fault is raised as a WebFault and the result is
+        unmarshalled. suds-py3 and suds 1.x process them with different
+        classes.
+
+        Args:
+            method: the suds method that was called
+            response: the requests response of the server
+
+        Returns:
+            the result of the WSDL function
+        """
+        client = self._suds_client
+        if hasattr(suds.client, "_SoapClient"):
+            # suds 1.x
+            return suds.client._SoapClient(client, method).process_reply(
+                response.content, response.status_code, response.reason)
+        soap_client = suds.client.SoapClient(client, method)
+        binding = method.binding.output
+        ctx = PluginContainer(client.options.plugins).message.received(
+            reply=response.content)
+        if response.status_code == 500:
+            return soap_client.failed(binding, TransportError(
+                response.reason, response.status_code, io.BytesIO(ctx.reply)))
+        return soap_client.succeeded(binding, ctx.reply)
@@ -0,0 +1,129 @@
+# -*- coding: utf8 -*-
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+from pylero._compatible import object, queue
+import logging
+from multiprocessing.pool import ThreadPool
+from pylero.base_polarion import BasePolarion
+
+logger = logging.getLogger(__name__)
+
+
+class SessionPool(object):
+    """Runs Pylero calls concurrently. A suds client can't be used by more
+    than one thread at a time, so each worker thread gets its own session
+    (cloned from the session of the thread that calls map) and binds it to
+    the thread while it runs, so that all the Pylero objects used in the
+    thread use it.
+
+    The sessions are created the first time they are needed and are reused
+    by every map call of the pool. Sessions that logged in separately
+    (share_login=False) are logged out by close, which is called when the
+    pool is used as a context manager.
+
+    Example:
+        with SessionPool(4) as pool:
+            test_cases = pool.map(lambda wi_id: TestCase(work_item_id=wi_id),
+                                  ["PROJ-1", "PROJ-2", "PROJ-3"])
+
+    Attributes:
+        size (int): the number of worker threads
+        share_login (bool): the sessions use the login of the global session
+                            (and therefore its transaction). see
+                            Session.clone
+    """
+
+    def __init__(self, size, share_login=True):
+        """SessionPool constructor
+
+        Args:
+            size (int): the number of worker threads. With size 1 the calls
+                        run in the current thread with the current session.
+            share_login (bool): see Session.clone, default: True
+        """
+        self.size = size
+        self.share_login = share_login
+        self._sessions = queue.Queue()
+
+    def _run(self, func, item, return_exceptions, parent):
+        try:
+            session = self._sessions.get_nowait()
+        except queue.Empty:
+            session = parent.clone(self.share_login)
+        thread_sessions = BasePolarion._thread_sessions
+        prev_session = getattr(thread_sessions, "session", None)
+        thread_sessions.session = session
+        try:
+            return func(item)
+        except Exception as e:
+            if return_exceptions:
+                return e
+            raise
+        finally:
+            thread_sessions.session = prev_session
+            self._sessions.put(session)
+
+    def map(self, func, items, return_exceptions=False):
+        """Calls func for each item, at most size calls at a time.
+
+        Args:
+            func: function that receives one item
+            items: iterable of the items
+            return_exceptions (bool): if True, an exception raised by func is
+                                      returned as the result of its item
+                                      instead of being raised. default: False
+
+        Returns:
+            list of the results of func, in the order of the items
+        """
+        items = list(items)
+        if self.size <= 1 or len(items) <= 1:
+            results = []
+            for item in items:
+                try:
+                    results.append(func(item))
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results.append(e)
+            return results
+        # the session of the calling thread, which can itself be a pool
+        # session (the worker threads have no session of their own).
+        parent = BasePolarion.session
+        pool = ThreadPool(min(self.size, len(items)))
+        try:
+            return pool.map(
+                lambda item: self._run(func, item, return_exceptions, parent),
+                items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def close(self):
+        """Releases the sessions of the pool. The sessions that logged in
+        separately are logged out. The pool can be used again after it is
+        closed, with new sessions.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        while True:
+            try:
+                session = self._sessions.get_nowait()
+            except queue.Empty:
+                return
+            if not self.share_login:
+                try:
+                    session._logout()
+                except Exception as e:
+                    # the server ends the session when it times out anyway
+                    logger.debug("Failed to log out a pool session: %s", e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -2,14 +2,20 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 from pylero._compatible import classmethod,object,range, basestring
+from pylero._compatible import MutableSequence
+import copy
+import logging
 import os
+import re
+import time
 import suds
 import datetime
-from xml.dom import minidom
+from xml.etree import ElementTree
 from pylero.exceptions import PyleroLibException
 from pylero.base_polarion import BasePolarion
 from pylero.test_run_attachment import TestRunAttachment
 from pylero.test_run_attachment import ArrayOfTestRunAttachment
+from pylero.attachment import download_attachments
 from pylero.enum_option_id import EnumOptionId
 from pylero.enum_option_id import ArrayOfEnumOptionId
 from pylero.test_record import TestRecord
@@ -24,6 +30,8 @@ from pylero.text import Text
 # Plan is used in custom fields.
 from pylero.plan import Plan  # NOQA
 from pylero.base_polarion import tx_wrapper
+from pylero.session_pool import SessionPool
+from pylero.repo_file_cache import RepoFileCache
 import requests
 from requests.auth import HTTPBasicAuth
 
@@ -32,96 +40,155 @@ from requests.packages.urllib3.exceptions import InsecureRequestWarning
 # This is to disable the InsecureRequestWarning
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
-
-def generate_description(test_run, test_case, test_record):
-    tr_html = "<b>Test Run:</b> <span id=\"link\" class=    " \
-              "\"polarion-rte-link\" data-type=\"testRun\" " \
-              "data-item-id=\"{0}\" data-option-id=\"long\">" \
-              "</span><br/>".format(test_run.test_run_id)
-    tc_html = "<b>Test Case:</b> <span id=\"link\" class=" \
-              "\"polarion-rte-link\" data-type=\"workItem\" " \
-              "data-item-id=\"{0}\" data-option-id=\"long\"></span>" \
-              "<br/>".format(test_case.work_item_id)
-    table_cell_style = "style=\"text-align: left; padding: 10px; " \
-                       "vertical-align: top; background-color: #ffffff;\""
-    table_row_style = "style=\"border-bottom: 1px solid #f0f0f0;\""
-    columns = ["", "#", "<span title=\"Step\">Step</span>",
-               "<span title=\"Expected Result\">Expected Result</span>",
-               "Actual Result"]
-    test_step_results = {"passed": "<span title=\"Results met expected results"
-                                   "\"><span style=\"white-space:nowrap;\"><im"
-                                   "g src=\"/polarion/icons/default/enums/test"
-                                   "run_status_passed.png\" style=\"vertical-a"
-                                   "lign:text-bottom;border:0px;margin-right:2"
-                                   "px;\" class=\"polarion-no-style-cleanup\"/"
-                                   "></span></span>",
-                         "failed": "<span title=\"Results did not meet expecte"
-                                   "d results\"><span style=\"white-space:nowr"
-                                   "ap;\"><img src=\"/polarion/icons/default/e"
-                                   "nums/testrun_status_failed.png\" style=\"v"
-                                   "ertical-align:text-bottom;border:0px;margi"
-                                   "n-right:2px;\" class=\"polarion-no-style-c"
-                                   "leanup\"/></span></span>",
-                         "blocked": "<span title=\"Errors in the product preve"
-                                    "nted test from being executed\"><span sty"
-                                    "le=\"white-space:nowrap;\"><img src=\"/po"
-                                    "larion/icons/default/enums/testrun_status"
-                                    "_blocked.png\" style=\"vertical-align:tex"
-                                    "t-bottom;border:0px;margin-right:2px;\" c"
-                                    "lass=\"polarion-no-style-cleanup\"/>"
-                                    "</span></span>"}
-    table_header = "<table class=\"polarion-no-style-cleanup\" style=\"border"\
-                   "-collapse: collapse;\"><tr style=\"text-align: left; " \
-                   "white-space: nowrap; color: #757575; border-bottom: 1px " \
-                   "solid #d2d7da; background-color: #ffffff;\">{0}</tr>" \
-        .format("".join(["<th {0}>{1}</th>".format(table_cell_style, column)
-                         for column in columns]))
-    verdict = "</table><table style=\"margin-bottom: 15px; ;border-collapse: "\
-              "collapse; width:100%; ;margin-top: 13px;\" class=\"polarion-no"\
-              "-style-cleanup\"><tr><th style=\"width: 80%; text-align: left;"\
-              " background-color: #ffffff;\">Test Case Verdict:</th></tr><tr>"\
-              "<td style=\"vertical-align: top;\"><span style=\"font-weight: "\
-              "bold;\"><span style=\"color: #C30000;\"><span title=\"Results "\
-              "did not meet expected results\"><span style=\"white-space:" \
-              "nowrap;\"><img src=\"/polarion/icons/default/enums/testrun_" \
-              "status_failed.png\" style=\"vertical-align:text-bottom;border:"\
-              "0px;margin-right:2px;\" class=\"polarion-no-style-cleanup\"/>" \
-              "</span>Failed</span></span></span><span> {0}</span></td></tr>" \
-              "</table>" \
-        .format(test_record.comment)
-    table_rows = ""
-    for step in range(len(test_record.test_step_results)):
-        table_rows += "<tr {0}>" \
-                      "<td {1}>{2}</td>" \
-                      "<td {1}>{3}</td>" \
-                      "<td {1}>{4}</td>" \
-                      "<td {1}>{5}</td>" \
-                      "<td {1}>{6}</td>" \
-                      "</tr>".format(table_row_style,
-                                     table_cell_style,
-                                     test_step_results.
-                                     get(test_record.test_step_results[step]
-                                         .result),
-                                     step + 1,
-                                     test_case.test_steps.steps[step].values[0]
-                                     .content,
-                                     test_case.test_steps.steps[step].values[1]
-                                     .content,
-                                     test_record.test_step_results[step]
-                                     .comment)
-    content = tr_html + tc_html + table_header + table_rows + verdict
-
-    return content
-
-
-def create_incident_report(test_run, test_record, test_case):
+logger = logging.getLogger(__name__)
+
+
+_DESCRIPTION_CELL_STYLE = "style=\"text-align: left; padding: 10px; " \
+                          "vertical-align: top; background-color: #ffffff;\""
+_DESCRIPTION_ROW_STYLE = "style=\"border-bottom: 1px solid #f0f0f0;\""
+_DESCRIPTION_COLUMNS = ["", "#", "<span title=\"Step\">Step</span>",
+                        "<span title=\"Expected Result\">Expected Result"
+                        "</span>",
+                        "Actual Result"]
+_DESCRIPTION_STEP_RESULTS = {
+    "passed": "<span title=\"Results met expected results\"><span style=\""
+              "white-space:nowrap;\"><img src=\"/polarion/icons/default/enu"
+              "ms/testrun_status_passed.png\" style=\"vertical-align:text-b"
+              "ottom;border:0px;margin-right:2px;\" class=\"polarion-no-sty"
+              "le-cleanup\"/></span></span>",
+    "failed": "<span title=\"Results did not meet expected results\"><span"
+              " style=\"white-space:nowrap;\"><img src=\"/polarion/icons/de"
+              "fault/enums/testrun_status_failed.png\" style=\"vertical-ali"
+              "gn:text-bottom;border:0px;margin-right:2px;\" class=\"polari"
+              "on-no-style-cleanup\"/></span></span>",
+    "blocked": "<span title=\"Errors in the product prevented test from bein"
+               "g executed\"><span style=\"white-space:nowrap;\"><img src="
+               "\"/polarion/icons/default/enums/testrun_status_blocked.png\""
+               " style=\"vertical-align:text-bottom;border:0px;margin-right:"
+               "2px;\" class=\"polarion-no-style-cleanup\"/></span></span>"}
+# the templates of the incident report description are built once, when the
+# module is loaded. {0} is the test run id and {1} the test case id.
+_DESCRIPTION_HEADER = \
+    "<b>Test Run:</b> <span id=\"link\" class=    \"polarion-rte-link\" " \
+    "data-type=\"testRun\" data-item-id=\"{0}\" data-option-id=\"long\">" \
+    "</span><br/>" \
+    "<b>Test Case:</b> <span id=\"link\" class=\"polarion-rte-link\" " \
+    "data-type=\"workItem\" data-item-id=\"{1}\" data-option-id=\"long\">" \
+    "</span><br/>" \
+    "<table class=\"polarion-no-style-cleanup\" style=\"border-collapse: " \
+    "collapse;\"><tr style=\"text-align: left; white-space: nowrap; color: " \
+    "#757575; border-bottom: 1px solid #d2d7da; background-color: " \
+    "#ffffff;\">" + \
+    "".join(["<th %s>%s</th>" % (_DESCRIPTION_CELL_STYLE, column)
+             for column in _DESCRIPTION_COLUMNS]).replace(
+        "{", "{{").replace("}", "}}") + \
+    "</tr>"
+# {0} step result icon, {1} step number, {2} step, {3} expected result,
+# {4} actual result
+_DESCRIPTION_ROW = "<tr %s>" % _DESCRIPTION_ROW_STYLE + \
+    "".join(["<td %s>{%d}</td>" % (_DESCRIPTION_CELL_STYLE, idx)
+             for idx in range(5)]) + \
+    "</tr>"
+# {0} test record comment
+_DESCRIPTION_VERDICT = \
+    "</table><table style=\"margin-bottom: 15px; ;border-collapse: " \
+    "collapse; width:100%; ;margin-top: 13px;\" class=\"polarion-no" \
+    "-style-cleanup\"><tr><th style=\"width: 80%; text-align: left;" \
+    " background-color: #ffffff;\">Test Case Verdict:</th></tr><tr>" \
+    "<td style=\"vertical-align: top;\"><span style=\"font-weight: " \
+    "bold;\"><span style=\"color: #C30000;\"><span title=\"Results " \
+    "did not meet expected results\"><span style=\"white-space:" \
+    "nowrap;\"><img src=\"/polarion/icons/default/enums/testrun_" \
+    "status_failed.png\" style=\"vertical-align:text-bottom;border:" \
+    "0px;margin-right:2px;\" class=\"polarion-no-style-cleanup\"/>" \
+    "</span>Failed</span></span></span><span> {0}</span></td></tr>" \
+    "</table>"
+
+
+def get_step_values(test_case):
+    """Returns the step and expected result of every test step of the test
+    case.
+
+    Args:
+        test_case: TestCase object
+
+    Returns:
+        list of [step, expected result] lists
+    """
+    test_steps = test_case.test_steps
+    if not test_steps:
+        return []
+    return [[value.content for value in step.values]
+            for step in test_steps.steps]
+
+
+def generate_description(test_run, test_case, test_record, step_values=None):
+    """Returns the HTML description of the incident report of a failed test
+    record.
+
+    Args:
+        test_run: TestRun object
+        test_case: TestCase object of the test record
+        test_record: TestRecord object
+        step_values: the step values of the test case, as returned by
+                     get_step_values. If None, they are retrieved from the
+                     test case. default: None
+
+    Returns:
+        str
+    """
+    if step_values is None:
+        step_values = get_step_values(test_case)
+    parts = [_DESCRIPTION_HEADER.format(test_run.test_run_id,
+                                        test_case.work_item_id)]
+    for step, step_result in enumerate(test_record.test_step_results):
+        values = step_values[step] if step < len(step_values) else []
+        values = values + [""] * (2 - len(values))
+        parts.append(_DESCRIPTION_ROW.format(
+            _DESCRIPTION_STEP_RESULTS.get(step_result.result),
+            step + 1, values[0], values[1], step_result.comment))
+    parts.append(_DESCRIPTION_VERDICT.format(test_record.comment))
+    return "".join(parts)
+
+
+def generate_descriptions(test_run, failures, concurrency=4):
+    """Returns the HTML descriptions of the incident reports of many failed
+    test records. The test steps of all the test cases are retrieved first,
+    concurrently (see _WorkItem.get_test_steps_many), and once per test case,
+    even if it has more than one record.
+
+    Args:
+        test_run: TestRun object
+        failures: list of (test_case, test_record) tuples
+        concurrency (int): the number of test steps requests sent at a
+                           time, default: 4
+
+    Returns:
+        list of str, in the order of the failures
+    """
+    step_values = {}
+    descriptions = []
+    _WorkItem.get_test_steps_many([test_case for test_case, test_record
+                                   in failures], concurrency)
+    for test_case, test_record in failures:
+        if test_case.work_item_id not in step_values:
+            step_values[test_case.work_item_id] = get_step_values(test_case)
+        descriptions.append(generate_description(
+            test_run, test_case, test_record,
+            step_values[test_case.work_item_id]))
+    return descriptions
+
+
+def create_incident_report(test_run, test_record, test_case,
+                           description=None):
     project_id = test_run.project_id
     status = 'open'
     project = Project(project_id)
     tconf = project.get_tests_configuration()
     defectWorkItemType = tconf.defect_work_item_type
     title = 'Failed: ' + test_case.title
-    description = generate_description(test_run, test_case, test_record)
+    if description is None:
+        description = generate_description(test_run, test_case, test_record)
     kwarg_dict = {}
 
     for prop in tconf.fields_to_copy_from_test_case_to_defect.property:
@@ -135,6 +202,147 @@ def create_incident_report(test_run, test_record, test_case):
     return incident_report.work_item_id
 
 
+class LazyTestRecords(MutableSequence):
+    """List of the test records of a dynamic test run. The TestRecord
+    objects are only created when they are accessed, so that counting the
+    records or accessing only some of them doesn't create an object for every
+    test case in the run. It supports the operations of a list (indexing,
+    slicing, index, count, +, == ...), the operations that need all the
+    records create all of them.
+    """
+
+    def __init__(self, project_id, items):
+        """LazyTestRecords constructor
+
+        Args:
+            project_id: the project of the test run
+            items: list of Polarion TestRecords (executed records) and test
+                   case ids (unexecuted records)
+        """
+        self._project_id = project_id
+        # the items are replaced by their TestRecord when it is created
+        self._items = items
+
+    def __len__(self):
+        return len(self._items)
+
+    def _get(self, idx):
+        item = self._items[idx]
+        if not isinstance(item, TestRecord):
+            if isinstance(item, basestring):
+                item = TestRecord(self._project_id, item)
+            else:
+                item = TestRecord(suds_object=item)
+            self._items[idx] = item
+        return item
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._get(i) for i in range(*idx.indices(len(self)))]
+        return self._get(idx)
+
+    def __setitem__(self, idx, val):
+        self._items[idx] = val
+
+    def __delitem__(self, idx):
+        del self._items[idx]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._get(idx)
+
+    def insert(self, idx, test_record):
+        self._items.insert(idx, test_record)
+
+    def sort(self, key=None, reverse=False):
+        self._items[:] = sorted(self, key=key, reverse=reverse)
+
+    def copy(self):
+        return list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, LazyTestRecords)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __add__(self, other):
+        if isinstance(other, (list, LazyTestRecords)):
+            return list(self) + list(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return other + list(self)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class TestRunSchema(object):
+    """The fields of the test runs of a project. Test runs have custom fields
+    that are defined per project (see TestRun._cache_custom_fields), so the
+    _cls_suds_map of a TestRun depends on its project. The schema is built
+    once per project (see TestRun.get_schema) and its suds_map is shared by
+    all the TestRun objects of the project, so creating a TestRun does no
+    work for its custom fields.
+
+    Attributes:
+        project_id (str): the project of the schema
+        custom_fields (dict): field name -> _cls_suds_map entry of the custom
+                              fields of the project
+        required_fields (list): the names of the required custom fields
+        suds_map (dict): the _cls_suds_map of the test runs of the project.
+                         It must not be changed.
+    """
+
+    def __init__(self, project_id, base_suds_map, custom_fields,
+                 test_run_cls):
+        """TestRunSchema constructor
+
+        Args:
+            project_id: the project of the schema
+            base_suds_map (dict): the _cls_suds_map of the fields that all
+                                  test runs have
+            custom_fields (dict): field name -> dict of the "type",
+                                  "required" and "multi" of the custom field
+                                  (see TestRun._cache_custom_fields)
+            test_run_cls: the TestRun class of the schema
+        """
+        self.project_id = project_id
+        self.custom_fields = {}
+        self.required_fields = []
+        for field, definition in custom_fields.items():
+            if definition["required"]:
+                self.required_fields.append(field)
+            csm = {"field_name": field, "is_custom": True}
+            f_type = definition["type"]
+            if f_type == Text:
+                csm["cls"] = Text
+            elif f_type:
+                if definition["multi"]:
+                    csm["cls"] = ArrayOfEnumOptionId
+                    csm["is_array"] = True
+                else:
+                    csm["cls"] = EnumOptionId
+                csm["enum_id"] = f_type
+                if isinstance(f_type, type) and "project_id" in \
+                        f_type.__init__.__code__.co_varnames[
+                        :f_type.__init__.__code__.co_argcount]:
+                    csm["additional_parms"] = {"project_id": project_id}
+            self.custom_fields[field] = csm
+        self.suds_map = copy.deepcopy(base_suds_map)
+        self.suds_map.update(copy.deepcopy(self.custom_fields))
+        # the template of a test run is a test run
+        self.suds_map["template"]["cls"] = test_run_cls
+
+
 class TestRun(BasePolarion):
     """Object to manage the Polarion Test Management WS tns3:TestRun
 
@@ -237,46 +445,105 @@ class TestRun(BasePolarion):
              "inner_field_name": "Custom"},
         "uri": "_uri",
         "_unresolvable": "_unresolvable"}
+    # the fields that all test runs have. The custom fields are in the
+    # suds_map of the schema of each project (see get_schema)
+    _base_suds_map = copy.deepcopy(_cls_suds_map)
     _id_field = "test_run_id"
     _obj_client = "test_management_client"
     _obj_struct = "tns3:TestRun"
+    # The Polarion functions with limited seem to be the same as without
+    # limited when -1 is passed in as limit. Because of this, the wrapper will
+    # not implement the functions without limited.
+    _search_spec = {"client": "test_management_client",
+                    "function": "searchTestRuns",
+                    "templates_function": "searchTestRunTemplates",
+                    "fields": "WithFieldsLimited",
+                    "limit": "always",
+                    "parms": ["query", "sort", "fields", "limit"],
+                    "sort_attrs": True,
+                    "key": "test_run_id"}
     CUSTOM_FIELDS_FILE = \
         ".polarion/testing/configuration/testrun-custom-fields.xml"
     _custom_field_cache = {}
+    # project id -> TestRunSchema, see get_schema
+    _schemas = {}
+    # the schemas whose properties were created, see _register_schema
+    _registered_schemas = set()
+    # the properties of the fields are created once per schema
+    _shared_properties = True
+    # local record counters when the status change is deferred, see
+    # defer_status_change
+    _deferred_status = None
+    # index of the records by test case id, see _get_record_index
+    _record_index = None
+    # seconds the test cases of dynamic test runs are cached
+    DYNAMIC_CASES_TTL = 300
+    # (time, test case ids) of a dynamic test run, see _get_dynamic_case_ids
+    _dynamic_cases = None
+    # seconds to wait before the first retry of a failed upload in
+    # add_attachments. It is doubled for every retry.
+    ATTACHMENT_RETRY_DELAY = 1
 
     @property
     def records(self):
         """ function to return all the test records of a TestRun.
         The records array for dynamic queries/documents only includes executed
         records. This returns the unexecuted ones as well.
+        The test cases of dynamic runs are cached for DYNAMIC_CASES_TTL
+        seconds (see refresh_records) and the TestRecord objects are only
+        created when they are accessed.
 
         Args:
             None
 
         Returns:
-            list of TestRecords
+            list of TestRecords (LazyTestRecords for dynamic runs)
         """
         self._verify_obj()
         # if the type is not dynamic then all the cases are in the _records
         # attribute. If they are dynamic, they have to be gotten
         if "dynamic" not in self.select_test_cases_by:
             return self._records
-        if "Doc" in self.select_test_cases_by:
-            cases = self.document.get_work_items(None, True)
-        elif "Query" in self.select_test_cases_by:
-            cases = _WorkItem.query(
-                self.query + " AND project.id:" + self.project_id)
-        else:
-            raise PyleroLibException("Only Test Runs based on Docs or"
-                                       " Queries can be dynamic")
-        executed_ids = [rec.test_case_id for rec in self._records]
-        test_recs = self._records
-        for case in cases:
-            if case.work_item_id not in executed_ids \
-                    and case.type != "heading":
-                test_recs.append(
-                    TestRecord(self.project_id, case.work_item_id))
-        return test_recs
+        executed_ids = self._get_record_index()["positions"]
+        suds_records = getattr(self._suds_object, "records", None)
+        # ArrayOf Polarion objects have a double list.
+        items = list(suds_records[0]) if suds_records else []
+        items += [case_id for case_id in self._get_dynamic_case_ids()
+                  if case_id not in executed_ids]
+        return LazyTestRecords(self.project_id, items)
+
+    def _get_dynamic_case_ids(self):
+        # returns the ids of the test cases of a dynamic run. They are cached
+        # so that the query is not run every time the records are accessed.
+        now = time.time()
+        if self._dynamic_cases is None or \
+                now - self._dynamic_cases[0] > self.DYNAMIC_CASES_TTL:
+            if "Doc" in self.select_test_cases_by:
+                cases = self.document.get_work_items(None, True)
+            elif "Query" in self.select_test_cases_by:
+                cases = _WorkItem.query(
+                    self.query + " AND project.id:" + self.project_id,
+                    fields=["work_item_id", "type"])
+            else:
+                raise PyleroLibException("Only Test Runs based on Docs or"
+                                         " Queries can be dynamic")
+            self._dynamic_cases = (now, [case.work_item_id for case in cases
+                                         if case.type != "heading"])
+        return self._dynamic_cases[1]
+
+    def refresh_records(self):
+        """Clears the cached test cases of a dynamic test run, so that the
+        next access to the records runs the query (or gets the document work
+        items) again. Without it, the cached test cases are used for
+        DYNAMIC_CASES_TTL seconds.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._dynamic_cases = None
 
     @records.setter
     def records(self, val):
@@ -392,11 +659,13 @@ class TestRun(BasePolarion):
 
     @classmethod
     def search(cls, query, fields=["test_run_id"], sort="test_run_id",
-               limit=-1, search_templates=False, project_id=None):
+               limit=-1, search_templates=False, project_id=None,
+               page_size=None):
         """class method search executes the given query and returns the results
 
         Args:
-            query: the Polarion query used to find test runs
+            query: the Polarion query used to find test runs, "" for all the
+                   test runs of the project
             fields:  test run fields that should be initialized,
                      all other fields will be null.
                      Field names are from the object's attributes and not
@@ -409,6 +678,10 @@ class TestRun(BasePolarion):
             search_templates (bool): if set, searches the templates
                                      instead of the test runs, default False
             project_id: if set, searches the project id, else default project
+            page_size (int): if given, returns a generator that fetches
+                             page_size results at a time, sorted by
+                             test_run_id, which is unique in the project
+                             (see BasePolarion._search). default None
         Returns:
             list of TestRun objects
 
@@ -422,37 +695,20 @@ class TestRun(BasePolarion):
             test_management.searchTestRunsWithFields
             test_management.searchTestRunsWithFieldsLimited
         """
-
-# The Polarion functions with limited seem to be the same as without limited
-#    when -1 is passed in as limit. Because of this, the wrapper will not
-#    implement the functions without limited.
         project_id = project_id or cls.default_project
-        query += " AND project.id:%s" % (project_id)
-
-        # The following line one purpose is to instantiate a TestRun and by
-        # doing so setting all the class attribute (including 'customFields').
-        TestRun(project_id=project_id)
-        function_name = "search"
-        p_sort = cls._cls_suds_map[sort] if not isinstance(
-            cls._cls_suds_map[sort], dict) else \
-            cls._cls_suds_map[sort]["field_name"]
-        parms = [query, p_sort]
-        if search_templates:
-            function_name += "TestRunTemplates"
-        else:
-            function_name += "TestRuns"
-        p_fields = cls._convert_obj_fields_to_polarion(fields)
-        if p_fields:
-            function_name += "WithFieldsLimited"
-            parms.append(p_fields)
-        parms.append(limit)
-        test_runs = []
-        results = getattr(cls.session.test_management_client.service,
-                          function_name)(*parms)
-        for suds_obj in results:
-            tr = TestRun(suds_object=suds_obj)
-            test_runs.append(tr)
-        return test_runs
+        # an empty query searches all the test runs of the project
+        query = "%s AND project.id:%s" % (query, project_id) if query \
+            else "project.id:%s" % project_id
+
+        # the fields and the sort are converted by the map of the schema of
+        # the project, which has its custom fields.
+        schema = cls.get_schema(project_id)
+        return cls._search(query, fields=fields, sort=sort, limit=limit,
+                           search_templates=search_templates,
+                           page_size=page_size, suds_map=schema.suds_map,
+                           wrap_page=lambda results: [
+                               cls(suds_object=suds_obj, project_id=project_id)
+                               for suds_obj in results])
 
     def __init__(self, test_run_id=None, suds_object=None, project_id=None,
                  uri=None):
@@ -476,7 +732,13 @@ class TestRun(BasePolarion):
             test_management.getTestRunById
             test_management.getTestRunByUri
         """
-        self._add_custom_fields(project_id)
+        self._changed_fields = {}
+        schema = self.get_schema(project_id)
+        self._register_schema(schema)
+        self._required_fields = schema.required_fields
+        # the map of the schema is not changed by the object, so it is shared
+        # by all the test runs of the project instead of being copied.
+        self._cls_suds_map = schema.suds_map
         super(self.__class__, self).__init__(test_run_id, suds_object)
         if test_run_id:
             if not project_id:
@@ -492,12 +754,8 @@ class TestRun(BasePolarion):
                 raise PyleroLibException(
                     "The Test Run {0} was not found.".format(test_run_id))
 
-    def _fix_circular_refs(self):
-        # a class can't reference itself as a class attribute so it is
-        # defined after instatiation
-        self._cls_suds_map["template"]["cls"] = self.__class__
-
-    def _custom_field_types(self, field_type):
+    @classmethod
+    def _custom_field_types(cls, field_type):
         """There are 4 types of custom fields in test runs:
         * built-in types (string, boolean, ...)
         * Pylero Text object (text)
@@ -532,11 +790,30 @@ class TestRun(BasePolarion):
                 # a regular enum
                 return split_type[1]
 
-    def _cache_custom_fields(self, project_id):
+    @staticmethod
+    def _parse_custom_fields(content):
+        # parses the custom fields xml file into a dict of field id -> dict
+        # of its raw "type", "required" and "multi", which can be saved by
+        # the RepoFileCache.
+        fields = {}
+        for field in ElementTree.fromstring(content).iter():
+            # the tag may be qualified by a namespace
+            if field.tag.split("}")[-1] != "field":
+                continue
+            fields[field.get("id")] = {
+                "type": field.get("type", ""),
+                "required": field.get("required") == "true",
+                "multi": field.get("multi") == "true"}
+        return fields
+
+    @classmethod
+    def _cache_custom_fields(cls, project_id):
         """Polarion API does not provide the custom fields of a TestRun.
         As a workaround, this function connects to the SVN repo and reads the
         custom_fields xml file and then processes it. Because the SVN function
-        takes longer then desired, this caches the custom fields, per project
+        takes longer then desired, this caches the custom fields, per project.
+        The file is also kept on disk by the session RepoFileCache, which
+        only downloads it again when it was changed on the server.
 
         Args:
             project_id
@@ -547,75 +824,146 @@ class TestRun(BasePolarion):
         # proj.location[8:-30] removes the default: at the beginning and
         # .polarion/polarion-project.xml
         # Getting the location of the verifying CA-Bundle
-        if self._session._server.cert_path:
-            cert_path = self._session._server.cert_path
+        if cls._session._server.cert_path:
+            cert_path = cls._session._server.cert_path
         else:
             cert_path = False
-        file_download = requests.get("{0}{1}{2}".format(
-            self.repo, proj.location[8:-30], self.CUSTOM_FIELDS_FILE),
-            auth=HTTPBasicAuth(self.logged_in_user_id, self.session.password),
+        repo_file_cache = getattr(cls.session, "repo_file_cache", None) or \
+            RepoFileCache()
+        fields = repo_file_cache.get(
+            "{0}{1}{2}".format(cls.repo, proj.location[8:-30],
+                               cls.CUSTOM_FIELDS_FILE),
+            cls._parse_custom_fields,
+            auth=HTTPBasicAuth(cls.logged_in_user_id, cls.session.password),
             verify=cert_path)
-        file_content = file_download.text
-        xmldoc = minidom.parseString(file_content)
-        fields = xmldoc.getElementsByTagName("field")
-        self._custom_field_cache[project_id] = {}
-        for field in fields:
-            f_type = self._custom_field_types(field.getAttribute("type"))
-            f_name = field.getAttribute("id")
-            f_req = False
-            if field.getAttribute("required") == "true":
-                f_req = True
-            f_multi = False
-            if field.getAttribute("multi") == "true":
-                f_multi = True
-            self._custom_field_cache[project_id][f_name] = {}
-            self._custom_field_cache[project_id][f_name]["type"] = f_type
-            self._custom_field_cache[project_id][f_name]["required"] = f_req
-            self._custom_field_cache[project_id][f_name]["multi"] = f_multi
-
-    def _add_custom_fields(self, project_id):
-        """ This generates object attributes, with validation, so that custom
-        fields can be related to as regular attributes. It takes the custom
-        fields from the cache and calls the cache function if the values are
-        not already there.
+        cls._custom_field_cache[project_id] = {}
+        for f_name, field in fields.items():
+            cls._custom_field_cache[project_id][f_name] = {}
+            cls._custom_field_cache[project_id][f_name]["type"] = \
+                cls._custom_field_types(field["type"])
+            cls._custom_field_cache[project_id][f_name]["required"] = \
+                field["required"]
+            cls._custom_field_cache[project_id][f_name]["multi"] = \
+                field["multi"]
+
+    @classmethod
+    def get_schema(cls, project_id=None):
+        """Returns the schema of the test runs of the project. It is built
+        the first time it is requested and then reused.
+
         Args:
-            project_id - Each project can have its own custom fields. This
-                function takes the custom fields for the specific project and
-                adds them to the _cls_suds_map so they will be built into
-                object attributes.
+            project_id: the project, default: the default project
+
         Returns:
-            None
+            TestRunSchema object
         """
-        self._changed_fields = {}
         # force the session to initialize. This is needed here because the
-        # system has not yet been initialized.
-        self.session
-        if not project_id:
-            project_id = self.default_project
-        if project_id not in self._custom_field_cache:
-            self._cache_custom_fields(project_id)
-        cache = self._custom_field_cache[project_id]
-        self._required_fields = []
-        for field in cache:
-            if cache[field]["required"]:
-                self._required_fields.append(field)
-            self._cls_suds_map[field] = {}
-            self._cls_suds_map[field]["field_name"] = field
-            self._cls_suds_map[field]["is_custom"] = True
-            if cache[field]["type"] == Text:
-                self._cls_suds_map[field]["cls"] = Text
-            elif cache[field]["type"]:
-                if cache[field]["multi"]:
-                    self._cls_suds_map[field]["cls"] = ArrayOfEnumOptionId
-                    self._cls_suds_map[field]["is_array"] = True
-                else:
-                    self._cls_suds_map[field]["cls"] = EnumOptionId
-                self._cls_suds_map[field]["enum_id"] = cache[field]["type"]
-                if isinstance(cache[field]["type"], type) and "project_id" in \
-                        cache[field]["type"].__init__.__code__.co_varnames[
-                        :cache[field]["type"].__init__.__code__.co_argcount]:
-                    self._cls_suds_map[field]["additional_parms"] = \
-                        {"project_id": project_id}
+        # system may not yet have been initialized.
+        cls.session
+        project_id = project_id or cls.default_project
+        schema = cls._schemas.get(project_id)
+        if not schema:
+            if project_id not in cls._custom_field_cache:
+                cls._cache_custom_fields(project_id)
+            schema = TestRunSchema(project_id, cls._base_suds_map,
+                                   cls._custom_field_cache[project_id], cls)
+            cls._schemas[project_id] = schema
+        return schema
+
+    @classmethod
+    def _register_schema(cls, schema):
+        """Creates the properties of the fields of the schema on the class.
+        It is only done once per schema. The custom fields stay in the
+        suds_map of the schema, so a field of one project doesn't change
+        the conversion of a field of another project.
+
+        Args:
+            schema: TestRunSchema object
+
+        Returns:
+            None
+        """
+        if schema in cls._registered_schemas:
+            return
+        cls._add_properties(schema.suds_map)
+        cls._registered_schemas.add(schema)
+
+    def _get_record_index(self):
+        """Returns the index of the test records of the run by test case id.
+        It is built from the records the first time it is needed (and again
+        if the records were reloaded) and is kept up to date by the functions
+        that add or update records, so that finding a record doesn't go over
+        all the records of the run.
+
+        Returns:
+            dict with the keys:
+                ids: the test case ids, by record position
+                positions: test case id -> position in the records
+                executed_flags: executed or not, by record position
+                executed: test case id -> index within the executed records,
+                          None when it has to be rebuilt
+                          (see _get_executed_index)
+        """
+        suds_records = getattr(self._suds_object, "records", None)
+        index = self._record_index
+        if index is None or index["src"] is not suds_records:
+            index = {"src": suds_records,
+                     "ids": [],
+                     "positions": {},
+                     "executed_flags": [],
+                     "executed": {}}
+            # ArrayOf Polarion objects have a double list.
+            for suds_record in (suds_records[0] if suds_records else []):
+                test_case_id = re.search(
+                    self.REGEX_ID, suds_record.testCaseURI).group(1)
+                self._index_record(index, test_case_id,
+                                   bool(suds_record.executed))
+            self._record_index = index
+        return index
+
+    @staticmethod
+    def _index_record(index, test_case_id, executed):
+        # adds the record to the index or updates its executed flag.
+        position = index["positions"].get(test_case_id)
+        if position is None:
+            index["positions"][test_case_id] = len(index["ids"])
+            index["ids"].append(test_case_id)
+            index["executed_flags"].append(executed)
+            if executed and index["executed"] is not None:
+                index["executed"][test_case_id] = len(index["executed"])
+        elif index["executed_flags"][position] != executed:
+            index["executed_flags"][position] = executed
+            # the executed index of all the following records changed
+            index["executed"] = None
+
+    def _store_record(self, index, test_case_id, suds_record):
+        # puts a record that was added to (or updated in) the test run on the
+        # server in the local records and the index, so that the records can
+        # be used by position (see add_attachments) and the records property
+        # includes it, without reloading the test run.
+        suds_records = getattr(self._suds_object, "records", None)
+        if not suds_records:
+            suds_records = ArrayOfTestRecord._new_suds_object()
+            self._suds_object.records = suds_records
+            index["src"] = suds_records
+        position = index["positions"].get(test_case_id)
+        # ArrayOf Polarion objects have a double list.
+        if position is None:
+            suds_records[0].append(suds_record)
+        else:
+            suds_records[0][position] = suds_record
+        self._index_record(index, test_case_id, bool(suds_record.executed))
+
+    def _get_executed_index(self):
+        index = self._get_record_index()
+        if index["executed"] is None:
+            executed_ids = [test_case_id for test_case_id, executed in
+                            zip(index["ids"], index["executed_flags"])
+                            if executed]
+            index["executed"] = dict(
+                (test_case_id, idx)
+                for idx, test_case_id in enumerate(executed_ids))
+        return index["executed"]
 
     def _get_index_of_test_record(self, test_case_id):
         # specific functions request the index of the test record within the
@@ -625,37 +973,134 @@ class TestRun(BasePolarion):
         # However, this function does not work for update_test_record_by_object
         # as that function requires the actual index of the record and not the
         # index of only executed records.
-        index = -1
-        for test_record in self._records:
-            if test_record.executed:
-                index += 1
-            if test_case_id in test_record._suds_object.testCaseURI:
-                return index
-        raise PyleroLibException("The Test Case is either not part of "
-                                   "this TestRun or has not been executed")
+        executed_index = self._get_executed_index()
+        if test_case_id not in executed_index:
+            raise PyleroLibException("The Test Case is either not part of "
+                                     "this TestRun or has not been executed")
+        return executed_index[test_case_id]
+
+    @staticmethod
+    def _calc_status(result_count, record_count):
+        # the test run status based on the number of records with results
+        if not result_count:
+            return "notrun"
+        elif result_count == record_count:
+            return "finished"
+        else:
+            return "inprogress"
 
-    def _status_change(self):
-        # load a new object to test if the status should be changed.
-        # can't use existing object because it doesn't include the new test rec
+    def _apply_status(self, check_tr, status):
         # if the status needs changing, change it in the new object, so it
         # doesn't update any user made changes in the existing object.
-        check_tr = TestRun(uri=self.uri)
-        results = [rec.result for rec in check_tr.records if rec.result]
-        if not results:
-            status = "notrun"
-            check_tr.finished_on = None
-        elif len(results) == len(check_tr.records):
-            status = "finished"
-            # Do not touch finished_on because it can not be reverted
-            # DPP-171495 Web services: You cannot reset finishedOn in TestRun
-            # check_tr.finished_on = datetime.datetime.now()
-        else:
-            status = "inprogress"
+        if status != "finished":
             check_tr.finished_on = None
+        # Do not touch finished_on when finished because it can not be
+        # reverted
+        # DPP-171495 Web services: You cannot reset finishedOn in TestRun
+        # check_tr.finished_on = datetime.datetime.now()
         if status != check_tr.status:
             check_tr.status = status
             check_tr.update()
 
+    def _status_change(self):
+        # load a new object to test if the status should be changed.
+        # can't use existing object because it doesn't include the new test rec
+        # returns the status of the test run.
+        check_tr = TestRun(uri=self.uri)
+        results = [rec.result for rec in check_tr.records if rec.result]
+        status = self._calc_status(len(results), len(check_tr.records))
+        self._apply_status(check_tr, status)
+        return status
+
+    def _record_status_change(self, test_record):
+        # called after a test record was added or updated. When the status is
+        # deferred, only the local counters are updated.
+        if self._deferred_status is None:
+            self._status_change()
+            return
+        test_case_id = test_record.test_case_id
+        self._deferred_status["cases"].add(test_case_id)
+        if test_record.result:
+            self._deferred_status["results"].add(test_case_id)
+        else:
+            self._deferred_status["results"].discard(test_case_id)
+
+    def defer_status_change(self, verify=False):
+        """Stops recalculating the test run status after every test record
+        that is added or updated. Instead, the run keeps local counters of
+        the records and their results and the status is changed once, when
+        flush_status_change is called. Without it, every added or updated
+        record downloads the whole test run to calculate its status.
+        The test run can also be used as a context manager, which defers the
+        status until the end of the with block:
+            with TestRun(project_id="proj", test_run_id="run") as tr:
+                for rec in records:
+                    tr.add_test_record_by_object(rec)
+
+        Args:
+            verify (bool): if True, flush_status_change calculates the status
+                           from the records on the server instead of the
+                           local counters. default: False
+
+        Returns:
+            None
+        """
+        self._verify_obj()
+        check_tr = TestRun(uri=self.uri)
+        records = check_tr.records
+        self._deferred_status = {
+            "status": check_tr.status,
+            "verify": verify,
+            "cases": set(rec.test_case_id for rec in records),
+            "results": set(rec.test_case_id for rec in records
+                           if rec.result)}
+
+    def flush_status_change(self, verify=None):
+        """Changes the test run status based on the records that were added or
+        updated since defer_status_change was called. The status is changed
+        on the server only if it is different than the current status. The
+        status stays deferred.
+
+        Args:
+            verify (bool): if True, calculates the status from the records on
+                           the server. default: the verify value that was
+                           passed to defer_status_change
+
+        Returns:
+            None
+        """
+        deferred = self._deferred_status
+        if deferred is None:
+            raise PyleroLibException("The status change is not deferred")
+        if verify is None:
+            verify = deferred["verify"]
+        if verify:
+            deferred["status"] = self._status_change()
+            return
+        status = self._calc_status(len(deferred["results"]),
+                                   len(deferred["cases"]))
+        if status != deferred["status"]:
+            self._apply_status(TestRun(uri=self.uri), status)
+            deferred["status"] = status
+
+    def __enter__(self):
+        self.defer_status_change()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # the status is flushed even when there was an error, so that it
+        # matches the records that were added before the error. An error of
+        # the flush is logged instead of replacing the error in flight.
+        try:
+            self.flush_status_change()
+        except Exception:
+            if exc_type is None:
+                raise
+            logger.exception("Failed to change the status of test run %s",
+                             self.test_run_id)
+        finally:
+            self._deferred_status = None
+
     def _verify_record_count(self, record_index):
         # verifies the number of records is not less then the index given.
         self._verify_obj()
@@ -692,11 +1137,10 @@ class TestRun(BasePolarion):
         """
         record_index = self._get_index_of_test_record(test_case_id)
         self._verify_record_count(record_index)
-        data = self._get_file_data(path)
         filename = os.path.basename(path)
-        self.session.test_management_client.service. \
-            addAttachmentToTestRecord(self.uri, record_index, filename,
-                                      title, data)
+        self.session.test_management_client.call_with_file(
+            "addAttachmentToTestRecord", path, self.uri, record_index,
+            filename, title)
 
     def add_attachment(self, path, title):
         """method add_attachment adds the given attachment to the current
@@ -716,10 +1160,9 @@ class TestRun(BasePolarion):
             test_management.addAttachmentToTestRun
         """
         self._verify_obj()
-        data = self._get_file_data(path)
         filename = os.path.basename(path)
-        self.session.test_management_client.service. \
-            addAttachmentToTestRun(self.uri, filename, title, data)
+        self.session.test_management_client.call_with_file(
+            "addAttachmentToTestRun", path, self.uri, filename, title)
 
     def add_attachment_to_test_step(self, test_case_id, test_step_index,
                                     path, title):
@@ -745,10 +1188,110 @@ class TestRun(BasePolarion):
         """
         record_index = self._get_index_of_test_record(test_case_id)
         self._verify_test_step_count(record_index, test_step_index)
-        data = self._get_file_data(path)
         filename = os.path.basename(path)
-        self.session.test_management_client.service.addAttachmentToTestStep(
-            self.uri, record_index, test_step_index, filename, title, data)
+        self.session.test_management_client.call_with_file(
+            "addAttachmentToTestStep", path, self.uri, record_index,
+            test_step_index, filename, title)
+
+    def add_attachments(self, attachments, concurrency=4, retries=2):
+        """method add_attachments, adds many attachments to test records and
+        test steps of the test run. The records are looked up once for all
+        the attachments and the files are uploaded concurrency at a time. A
+        failed upload is retried and does not stop the other uploads. A file
+        that the record (or step) already has an attachment of, with the same
+        file name and length, is skipped.
+
+        Args:
+            attachments (dict): (test_case_id, test_step_index) -> list of
+                                files. test_step_index is the 0 based index
+                                of the test step or None to attach the files
+                                to the test record. A file is a path or a
+                                (path, title) tuple. The default title is the
+                                file name.
+            concurrency (int): the number of uploads at a time, default: 4
+            retries (int): the number of times a failed upload is retried,
+                           default: 2
+
+        Returns:
+            dict with the number of files that were "uploaded" and
+            "skipped" and the list of the "failed" files, as
+            (test_case_id, test_step_index, path, error) tuples
+
+        References:
+            test_management.addAttachmentToTestRecord
+            test_management.addAttachmentToTestStep
+        """
+        self._verify_obj()
+        executed_index = self._get_executed_index()
+        positions = self._get_record_index()["positions"]
+        # the local records include the ones added by this object (see
+        # _store_record), in the order of the index.
+        suds_records = self._suds_object.records
+        summary = {"uploaded": 0, "skipped": 0, "failed": []}
+        jobs = []
+        for (test_case_id, test_step_index), files in attachments.items():
+            files = [(item, os.path.basename(item))
+                     if isinstance(item, basestring) else tuple(item)
+                     for item in files]
+            if test_case_id not in executed_index:
+                error = "The Test Case is either not part of this TestRun " \
+                        "or has not been executed"
+                summary["failed"].extend(
+                    (test_case_id, test_step_index, path, error)
+                    for path, title in files)
+                continue
+            # ArrayOf Polarion objects have a double list.
+            record = TestRecord(
+                suds_object=suds_records[0][positions[test_case_id]])
+            if test_step_index is None:
+                existing = record.attachments
+            elif test_step_index < len(record.test_step_results):
+                existing = record.test_step_results[test_step_index]. \
+                    attachments
+            else:
+                error = "There are only {0} test steps".format(
+                    len(record.test_step_results))
+                summary["failed"].extend(
+                    (test_case_id, test_step_index, path, error)
+                    for path, title in files)
+                continue
+            existing = set((attach.filename, int(attach.length))
+                           for attach in existing or [])
+            for path, title in files:
+                if (os.path.basename(path), os.path.getsize(path)) in \
+                        existing:
+                    summary["skipped"] += 1
+                else:
+                    jobs.append((test_case_id, test_step_index, path, title,
+                                 executed_index[test_case_id]))
+
+        def upload(job):
+            test_case_id, test_step_index, path, title, record_index = job
+            filename = os.path.basename(path)
+            for attempt in range(retries + 1):
+                if attempt:
+                    time.sleep(
+                        self.ATTACHMENT_RETRY_DELAY * 2 ** (attempt - 1))
+                try:
+                    if test_step_index is None:
+                        self.session.test_management_client.call_with_file(
+                            "addAttachmentToTestRecord", path, self.uri,
+                            record_index, filename, title)
+                    else:
+                        self.session.test_management_client.call_with_file(
+                            "addAttachmentToTestStep", path, self.uri,
+                            record_index, test_step_index, filename, title)
+                    return None
+                except Exception as e:
+                    error = "%s: %s" % (e.__class__.__name__, e)
+            return error
+        for job, error in zip(jobs, SessionPool(concurrency).map(upload,
+                                                                 jobs)):
+            if error:
+                summary["failed"].append(job[:3] + (error,))
+            else:
+                summary["uploaded"] += 1
+        return summary
 
     def _check_test_record_exists(self, test_case_id):
         """Searches the test run to see if the case is already a member of it
@@ -842,7 +1385,7 @@ class TestRun(BasePolarion):
         self._check_test_record_exists(test_case_id)
         if isinstance(test_record, TestRecord):
             suds_object = test_record._suds_object
-        elif isinstance(test_record, TestRecord()._suds_object.__class__):
+        elif isinstance(test_record, TestRecord._suds_class()):
             suds_object = test_record
         if test_record.result == "failed" and not test_record.defect_case_id:
             test_record.defect_case_id = \
@@ -850,7 +1393,112 @@ class TestRun(BasePolarion):
                                        TestCase(work_item_id=test_case_id))
         self.session.test_management_client.service.addTestRecordToTestRun(
             self.uri, suds_object)
-        self._status_change()
+        self._store_record(self._get_record_index(), test_case_id,
+                           suds_object)
+        self._record_status_change(test_record)
+
+    @tx_wrapper
+    def create_incident_reports(self, test_records, concurrency=4):
+        """method create_incident_reports, creates the incident reports of all
+        the failed test records that have no defect and sets the
+        defect_case_id of the records to them. The descriptions of all the
+        reports are rendered together (see generate_descriptions) and the
+        reports are created in one transaction by concurrency threads. When
+        the records are then added or updated, no incident report is created
+        for them.
+
+        Args:
+            test_records (list): list of TestRecord objects
+            concurrency (int): the number of reports created at a time,
+                               default: 4
+
+        Returns:
+            list of the ids of the incident reports that were created
+        """
+        self._verify_obj()
+        failed_records = [rec for rec in test_records
+                          if rec.result == "failed" and not rec.defect_case_id]
+        if not failed_records:
+            return []
+        pool = SessionPool(concurrency)
+        # the test cases and their test steps are retrieved once per test
+        # case, for all the descriptions (see generate_descriptions).
+        case_ids = list(set(rec.test_case_id for rec in failed_records))
+        test_cases = dict(zip(case_ids, pool.map(
+            lambda case_id: TestCase(work_item_id=case_id), case_ids)))
+        descriptions = generate_descriptions(
+            self, [(test_cases[rec.test_case_id], rec)
+                   for rec in failed_records], concurrency)
+
+        def create_report(job):
+            test_record, description = job
+            test_record.defect_case_id = create_incident_report(
+                self, test_record, test_cases[test_record.test_case_id],
+                description)
+            return test_record.defect_case_id
+        return pool.map(create_report, list(zip(failed_records,
+                                                descriptions)))
+
+    @tx_wrapper
+    def add_test_records(self, test_records, concurrency=4):
+        """method add_test_records, adds many test records to the test run.
+        Unlike calling add_test_record_by_object for each record, the check
+        for records that are already part of the test run is done against the
+        local index of the records (see _get_record_index) instead of a
+        search per record, the records are added in one transaction and the
+        status of the test run is recalculated once, after all the records
+        were added.
+        The records are added one at a time, in the order they are given, so
+        that their positions in the test run are the positions in the local
+        index (which the functions that update records by index rely on).
+        As in add_test_record_by_object, an incident report is created for
+        failed records that have no defect (see create_incident_reports).
+
+        Notes:
+            Records that were added by another process after the test run was
+            loaded are not detected. Reload the test run before the call if
+            other processes may add records.
+
+        Args:
+            test_records (list): list of TestRecord or Polarion TestRecord
+            concurrency (int): the number of incident reports created at a
+                               time, default: 4
+
+        Returns:
+            None
+
+        References:
+            test_management.addTestRecordToTestRun
+        """
+        self._verify_obj()
+        test_records = [rec if isinstance(rec, TestRecord) else
+                        TestRecord(self.project_id, suds_object=rec)
+                        for rec in test_records]
+        index = self._get_record_index()
+        new_ids = set()
+        for test_record in test_records:
+            test_case_id = test_record.test_case_id
+            if test_case_id in index["positions"] or \
+                    test_case_id in new_ids:
+                raise PyleroLibException(
+                    "The test case {0} is already part of the test run"
+                    .format(test_case_id))
+            new_ids.add(test_case_id)
+
+        self.create_incident_reports(test_records, concurrency)
+        # the records are added serially, concurrent adds to the same test
+        # run in one transaction are not safe and would add the records in
+        # an unknown order.
+        for test_record in test_records:
+            self.session.test_management_client.service. \
+                addTestRecordToTestRun(self.uri, test_record._suds_object)
+            self._store_record(index, test_record.test_case_id,
+                               test_record._suds_object)
+        if self._deferred_status is None:
+            self._status_change()
+        else:
+            for test_record in test_records:
+                self._record_status_change(test_record)
 
     def create_summary_defect(self, defect_template_id=None):
         """method create_summary_defect, adds a new summary _WorkItem for the
@@ -935,6 +1583,22 @@ class TestRun(BasePolarion):
         self.session.test_management_client.service. \
             deleteTestRunAttachment(self.uri, filename)
 
+    def download_all(self, dest_dir, concurrency=4):
+        """method download_all downloads all the attachments of the TestRun
+        to a directory, concurrency at a time.
+        see attachment.download_attachments
+
+        Args:
+            dest_dir: the directory to save the attachments in
+            concurrency (int): the number of downloads at a time, default: 4
+
+        Returns:
+            list of the paths of the files
+        """
+        self._verify_obj()
+        return download_attachments(self.get_attachments(), dest_dir,
+                                    concurrency)
+
     def get_attachment(self, filename):
         """Gets Test Run Attachment specified by attachment's
         file name. Method is applicable also on Test Run Template.
@@ -1080,10 +1744,9 @@ class TestRun(BasePolarion):
             test_management.updateTestRunAttachment
         """
         self._verify_obj()
-        data = self._get_file_data(path)
         filename = os.path.basename(original_filename)
-        self.session.test_management_client.service. \
-            updateTestRunAttachment(self.uri, filename, title, data)
+        self.session.test_management_client.call_with_file(
+            "updateTestRunAttachment", path, self.uri, filename, title)
 
     def update_summary_defect(self, source, total_failures, total_errors,
                               total_tests, defect_template_id):
@@ -1184,8 +1847,8 @@ class TestRun(BasePolarion):
         # because this function (specifically and not documented) uses the
         # actual index of the test records and not the index of all
         # executed records.
-        test_case_ids = [rec.test_case_id for rec in self._records]
-        if test_case_id not in test_case_ids:
+        record_index = self._get_record_index()
+        if test_case_id not in record_index["positions"]:
             self.add_test_record_by_object(test_record)
         else:
             if test_record.result == "failed" and \
@@ -1193,14 +1856,15 @@ class TestRun(BasePolarion):
                 test_record.defect_case_id = \
                     create_incident_report(self, test_record,
                                            TestCase(work_item_id=test_case_id))
-            index = test_case_ids.index(test_case_id)
+            index = record_index["positions"][test_case_id]
             if isinstance(test_record, TestRecord):
                 suds_object = test_record._suds_object
-            elif isinstance(test_record, TestRecord()._suds_object.__class__):
+            elif isinstance(test_record, TestRecord._suds_class()):
                 suds_object = test_record
             self.session.test_management_client.service. \
                 updateTestRecordAtIndex(self.uri, index, suds_object)
-            self._status_change()
+            self._store_record(record_index, test_case_id, suds_object)
+            self._record_status_change(test_record)
 
     def update_wiki_content(self, content):
         """method update_wiki_content updates the wiki for the current TestRun
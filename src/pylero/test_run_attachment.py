@@ -1,6 +1,7 @@
 # -*- coding: utf8 -*-
 from __future__ import absolute_import, division, print_function
 from __future__ import unicode_literals
+import os
 from pylero.base_polarion import BasePolarion
 from pylero.user import User
 
@@ -33,6 +34,20 @@ class TestRunAttachment(BasePolarion):
     _obj_client = "test_management_client"
     _obj_struct = "tns4:TestRunAttachment"
 
+    def download(self, path):
+        """Downloads the attachment. see Session.download
+
+        Args:
+            path: the path to save the file to. If it is a directory, the
+                  file is saved in it with the file name of the attachment
+
+        Returns:
+            the path of the file
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, self.filename)
+        return self.session.download(self.url, path, self.length)
+
 
 class ArrayOfTestRunAttachment(BasePolarion):
     _obj_client = "test_management_client"
@@ -0,0 +1,352 @@
+# -*- coding: utf8 -*-
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+from pylero._compatible import basestring, object
+import csv
+import json
+import re
+from pylero.session_pool import SessionPool
+from pylero.test_run import TestRun
+from pylero.work_item import _WorkItem
+
+
+class TraceabilityGraph(object):
+    """Walks the links between work items breadth first, for impact analysis
+    and traces.
+
+    Instead of fetching every linked work item by its uri, all the work items
+    of a level of the walk are fetched together, with one queryWorkItems
+    request per chunk_size work items of a project, that only requests the
+    FIELDS and the link fields. The requests of a level run concurrently.
+    The fetched work items are kept in nodes, so a later walk of the same
+    graph does not fetch them again.
+
+    Example:
+        graph = TraceabilityGraph(roles=["verifies", "parent"])
+        trace = graph.walk(["PROJ-1"], max_depth=5)
+        for uri, links in trace["edges"].items():
+            print(trace["nodes"][uri].work_item_id, len(links))
+
+    Attributes:
+        roles (list): the link roles that are followed, None for all of them
+        direct (bool): follow the links of the work items (linked_work_items)
+        derived (bool): follow the back links of the work items
+                        (linked_work_items_derived)
+        fields (list): the fields of the work items in nodes
+        project_id (str): the project of start items given by id
+        chunk_size (int): work items fetched per request
+        concurrency (int): requests sent at a time
+        nodes (dict): uri -> _WorkItem of the work items that were fetched.
+                      None if the work item was not found.
+    """
+    FIELDS = ["work_item_id", "title", "type", "status"]
+    # suds field name -> the link is derived
+    LINK_FIELDS = [("linkedWorkItems", False),
+                   ("linkedWorkItemsDerived", True)]
+
+    def __init__(self, roles=None, direct=True, derived=True, fields=None,
+                 project_id=None, chunk_size=100, concurrency=4):
+        """TraceabilityGraph constructor
+
+        Args:
+            roles (list): the link roles to follow, default: None (all roles)
+            direct (bool): follow the links of the work items, default: True
+            derived (bool): follow the back links, default: True
+            fields (list): fields of the work items in addition to FIELDS,
+                           default: None
+            project_id (str): the project of start items given by id,
+                              default: the default project
+            chunk_size (int): work items fetched per request, default: 100
+            concurrency (int): requests sent at a time, default: 4
+        """
+        self.roles = set(roles) if roles is not None else None
+        self.direct = direct
+        self.derived = derived
+        self.fields = self.FIELDS + [field for field in fields or []
+                                     if field not in self.FIELDS]
+        self.project_id = project_id or _WorkItem.default_project
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.nodes = {}
+        self._query_fields = self.fields + \
+            (["linked_work_items"] if direct else []) + \
+            (["linked_work_items_derived"] if derived else [])
+
+    def _uri(self, item):
+        # start items can be work item objects, uris or ids
+        if isinstance(item, _WorkItem):
+            return item.uri
+        if item.startswith("subterra:"):
+            return item
+        return _WorkItem.URI_STRUCT % {"project": self.project_id,
+                                       "obj": "WorkItem",
+                                       "id": item}
+
+    def _fetch(self, uris):
+        # fetches the work items that are not in nodes yet
+        missing = [uri for uri in uris if uri not in self.nodes]
+        ids_by_project = {}
+        for uri in missing:
+            project_id = re.search(_WorkItem.REGEX_PROJ, uri).group(1)
+            ids_by_project.setdefault(project_id, []).append(
+                re.search(_WorkItem.REGEX_ID, uri).group(1))
+        chunks = []
+        for project_id, ids in ids_by_project.items():
+            for start in range(0, len(ids), self.chunk_size):
+                chunks.append((project_id, ids[start:start +
+                                               self.chunk_size]))
+
+        def query(chunk):
+            project_id, ids = chunk
+            return _WorkItem.query(
+                "project.id:%s AND id:(%s)" %
+                (project_id, " ".join('"%s"' % wi_id for wi_id in ids)),
+                fields=self._query_fields)
+        for wis in SessionPool(self.concurrency).map(query, chunks):
+            for wi in wis:
+                self.nodes[wi.uri] = wi
+        # work items that were deleted or that the user can't read
+        for uri in missing:
+            self.nodes.setdefault(uri, None)
+
+    def _links(self, wi):
+        # the links of the work item that are followed, read from the suds
+        # object so that no LinkedWorkItem objects are built
+        links = []
+        for suds_field, derived in self.LINK_FIELDS:
+            if (derived and not self.derived) or \
+                    (not derived and not self.direct):
+                continue
+            suds_links = getattr(wi._suds_object, suds_field, None)
+            # ArrayOf Polarion objects have a double list.
+            for suds_link in (suds_links[0] if suds_links else []):
+                role = getattr(getattr(suds_link, "role", None), "id", None)
+                if self.roles is None or role in self.roles:
+                    links.append((suds_link.workItemURI, role, derived))
+        return links
+
+    def walk(self, start, max_depth=-1):
+        """Walks the graph breadth first from the start work items. Every
+        work item is visited once, so cycles end the walk of their branch.
+
+        Args:
+            start (list): the work items to start from, as _WorkItem objects,
+                          uris or ids (of the project_id project)
+            max_depth (int): the number of levels of links that are walked,
+                             -1 for no limit. default: -1
+
+        Returns:
+            dict with the keys:
+                nodes: uri -> _WorkItem of the work items that were reached
+                       (None if it was not found)
+                edges: uri -> list of (target uri, role, derived) tuples of
+                       the followed links of the work item. Only links to
+                       work items that were reached are included.
+                depth: uri -> the level the work item was reached at
+        """
+        if isinstance(start, (basestring, _WorkItem)):
+            start = [start]
+        level = []
+        depth = {}
+        for item in start:
+            uri = self._uri(item)
+            if uri not in depth:
+                depth[uri] = 0
+                level.append(uri)
+        edges = {}
+        cur_depth = 0
+        while level:
+            self._fetch(level)
+            last_level = max_depth >= 0 and cur_depth >= max_depth
+            next_level = []
+            for uri in level:
+                wi = self.nodes[uri]
+                links = self._links(wi) if wi else []
+                if last_level:
+                    links = [link for link in links if link[0] in depth]
+                else:
+                    for target in [link[0] for link in links]:
+                        if target not in depth:
+                            depth[target] = cur_depth + 1
+                            next_level.append(target)
+                edges[uri] = links
+            level = next_level
+            cur_depth += 1
+        return {"nodes": dict((uri, self.nodes[uri]) for uri in depth),
+                "edges": edges,
+                "depth": depth}
+
+
+class TraceabilityMatrix(object):
+    """Builds the coverage matrix of requirements, the test cases that verify
+    them and the latest result of each test case.
+
+    The matrix is built from 3 queries, whatever the number of work items:
+    the requirements with their back links, the test cases and the test runs
+    with their records (fetched page_size at a time). The test cases and the
+    latest results are indexed by uri, and the rows are generated while the
+    requirements are read, so they can be written as they are built (see
+    write_csv and write_json).
+
+    Example:
+        matrix = TraceabilityMatrix(
+            requirement_query="plannedin.KEY:release_1",
+            run_query="plannedin.KEY:release_1")
+        with open("matrix.csv", "w") as f:
+            matrix.write_csv(f)
+
+    Attributes:
+        project_id (str): the project of the work items and the test runs
+        requirement_query (str): Lucene query that selects the requirements
+        test_case_query (str): Lucene query that selects the test cases
+        run_query (str): Lucene query that selects the test runs, None to
+                         not include results
+        roles (list): the roles of the links from a test case to the
+                      requirements it verifies
+        requirement_type (str): the work item type of the requirements
+        test_case_type (str): the work item type of the test cases
+        page_size (int): test runs fetched per request
+    """
+    COLUMNS = ["requirement_id", "requirement_title", "test_case_id",
+               "test_case_title", "result", "test_run_id", "executed"]
+
+    def __init__(self, project_id=None, requirement_query="",
+                 test_case_query="", run_query="", roles=None,
+                 requirement_type="requirement", test_case_type="testcase",
+                 page_size=500):
+        """TraceabilityMatrix constructor
+
+        Args:
+            project_id (str): the project, default: the default project
+            requirement_query (str): query of the requirements, default: ""
+                                     (all the requirements)
+            test_case_query (str): query of the test cases, default: "" (all
+                                   the test cases)
+            run_query (str): query of the test runs, for example the runs of
+                             a plan. default: "" (all the test runs). None
+                             to not include results
+            roles (list): link roles, default: ["verifies"]
+            requirement_type (str): default: requirement
+            test_case_type (str): default: testcase
+            page_size (int): test runs fetched per request, default: 500
+        """
+        self.project_id = project_id or _WorkItem.default_project
+        self.requirement_query = requirement_query
+        self.test_case_query = test_case_query
+        self.run_query = run_query
+        self.roles = set(roles or ["verifies"])
+        self.requirement_type = requirement_type
+        self.test_case_type = test_case_type
+        self.page_size = page_size
+
+    def _work_items(self, query, wi_type, fields):
+        query = "project.id:%s AND type:%s" % (self.project_id, wi_type) + \
+            (" AND (%s)" % query if query else "")
+        return _WorkItem.query(query, fields=fields)
+
+    def _index_test_cases(self):
+        # test case uri -> (id, title)
+        return dict((wi.uri, (wi.work_item_id, wi.title))
+                    for wi in self._work_items(self.test_case_query,
+                                               self.test_case_type,
+                                               ["work_item_id", "title"]))
+
+    def _index_results(self):
+        # test case uri -> (executed, test run id, result) of the latest
+        # executed record of the test case
+        results = {}
+        if self.run_query is None:
+            return results
+        for test_run in TestRun.search(self.run_query,
+                                       fields=["test_run_id", "_records"],
+                                       project_id=self.project_id,
+                                       page_size=self.page_size):
+            suds_records = getattr(test_run._suds_object, "records", None)
+            # ArrayOf Polarion objects have a double list.
+            for suds_record in (suds_records[0] if suds_records else []):
+                result = getattr(getattr(suds_record, "result", None), "id",
+                                 None)
+                executed = getattr(suds_record, "executed", None)
+                if not result or not executed:
+                    continue
+                latest = results.get(suds_record.testCaseURI)
+                if not latest or executed > latest[0]:
+                    results[suds_record.testCaseURI] = \
+                        (executed, test_run.test_run_id, result)
+        return results
+
+    def rows(self):
+        """Generates the rows of the matrix. A requirement that no test case
+        verifies has a single row without a test case, and a test case
+        without results has a row without a result.
+
+        Returns:
+            generator of dicts with the keys in COLUMNS. executed is a
+            datetime or None
+        """
+        test_cases = self._index_test_cases()
+        results = self._index_results()
+        for req in self._work_items(self.requirement_query,
+                                    self.requirement_type,
+                                    ["work_item_id", "title",
+                                     "linked_work_items_derived"]):
+            row = {"requirement_id": req.work_item_id,
+                   "requirement_title": req.title}
+            case_uris = []
+            suds_links = getattr(req._suds_object, "linkedWorkItemsDerived",
+                                 None)
+            for suds_link in (suds_links[0] if suds_links else []):
+                role = getattr(getattr(suds_link, "role", None), "id", None)
+                uri = suds_link.workItemURI
+                if role in self.roles and uri in test_cases and \
+                        uri not in case_uris:
+                    case_uris.append(uri)
+            if not case_uris:
+                yield dict(row, test_case_id=None, test_case_title=None,
+                           result=None, test_run_id=None, executed=None)
+            for uri in case_uris:
+                executed, test_run_id, result = \
+                    results.get(uri, (None, None, None))
+                yield dict(row, test_case_id=test_cases[uri][0],
+                           test_case_title=test_cases[uri][1],
+                           result=result, test_run_id=test_run_id,
+                           executed=executed)
+
+    def write_csv(self, f):
+        """Writes the matrix as CSV, with a header row of the COLUMNS.
+
+        Args:
+            f: text file object, opened with newline=""
+
+        Returns:
+            int: the number of rows that were written
+        """
+        writer = csv.writer(f)
+        writer.writerow(self.COLUMNS)
+        count = 0
+        for row in self.rows():
+            writer.writerow(["" if row[column] is None else
+                             row[column].isoformat() if column == "executed"
+                             else row[column] for column in self.COLUMNS])
+            count += 1
+        return count
+
+    def write_json(self, f):
+        """Writes the matrix as a JSON list of objects, one row at a time.
+
+        Args:
+            f: text file object
+
+        Returns:
+            int: the number of rows that were written
+        """
+        f.write("[")
+        count = 0
+        for row in self.rows():
+            if row["executed"] is not None:
+                row["executed"] = row["executed"].isoformat()
+            f.write((",\n" if count else "\n") + json.dumps(row,
+                                                             sort_keys=True))
+            count += 1
+        f.write("\n]\n")
+        return count
@@ -68,6 +68,13 @@ class WikiPage(BasePolarion):
                      "_unresolved": "_unresolved"}
     _obj_client = "tracker_client"
     _obj_struct = "tns3:WikiPage"
+    _search_spec = {"client": "tracker_client",
+                    "function": "queryWikiPages",
+                    "uris_function": "queryWikiPageUris",
+                    "baseline": "InBaseline",
+                    "sql": "BySQL",
+                    "fields": "always",
+                    "limit": "always"}
 
     @classmethod
     def get_wiki_pages(cls, project_id, space_id, fields):
@@ -129,33 +136,8 @@ class WikiPage(BasePolarion):
             queryWikiPagesInBaseline
             queryWikiPagesInBaselineBySQL
         """
-        parms = [query]
-        # The parameters have to be listed in the specific order, based on the
-        # specific function called. That's why there are 2 if not is_sql
-        # conditions.
-        if not is_sql:
-            parms.append(sort)
-        if baseline_revision:
-            parms.append(baseline_revision)
-        if not query_uris:
-            p_fields = cls._convert_obj_fields_to_polarion(fields)
-            parms.append(p_fields)
-        if not is_sql:
-            parms.append(limit)
-        if not query_uris:
-            base_name = "queryWikiPages"
-        else:
-            base_name = "queryWikiPageUris"
-        if baseline_revision:
-            base_name += "InBaseline"
-        if is_sql:
-            base_name += "BySQL"
-        wps = getattr(cls.session.tracker_client.service, base_name)(*parms)
-        if query_uris:
-            return wps
-        else:
-            lst_wp = [WikiPage(suds_object=wp) for wp in wps]
-            return lst_wp
+        return cls._search(query, is_sql, fields, sort, limit,
+                           baseline_revision, query_uris)
 
     def __init__(self, fields=None, uri=None, suds_object=None):
         """
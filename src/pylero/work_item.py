@@ -13,6 +13,7 @@ from pylero.approval import Approval
 from pylero.approval import ArrayOfApproval
 from pylero.attachment import Attachment
 from pylero.attachment import ArrayOfAttachment
+from pylero.attachment import download_attachments
 from pylero.user import User
 from pylero.user import ArrayOfUser
 from pylero.category import Category
@@ -49,6 +50,7 @@ from pylero.work_record import WorkRecord
 from pylero.work_record import ArrayOfWorkRecord
 from pylero.workflow_action import WorkflowAction
 from pylero.base_polarion import tx_wrapper
+from pylero.session_pool import SessionPool
 
 
 class _WorkItem(BasePolarion):
@@ -248,6 +250,20 @@ class _WorkItem(BasePolarion):
     _id_field = "work_item_id"
     _obj_client = "tracker_client"
     _obj_struct = "tns3:WorkItem"
+    _search_spec = {"client": "tracker_client",
+                    "function": "queryWorkItems",
+                    "uris_function": "queryWorkItemUris",
+                    "baseline": "InBaseline",
+                    "sql": "BySQL",
+                    "fields": "always",
+                    "limit": "Limited"}
+    # maximum number of work items loaded by one _fault_in request
+    FAULT_IN_CHUNK = 100
+    # fields that are never loaded by _fault_in. test_steps is not loaded
+    # with the work item (see get_test_steps)
+    FAULT_IN_SKIP = ["uri", "_unresolved", "test_steps"]
+    # the WSDL TestSteps of the work item, see get_test_steps
+    _test_steps_cache = None
 
     @classmethod
     def create(cls, project_id, wi_type, title, desc, status, **kwargs):
@@ -275,7 +291,18 @@ class _WorkItem(BasePolarion):
         References:
             Tracker.createWorkItem
         """
-        wi = cls()
+        wi = cls._new_work_item(project_id, wi_type, title, desc, status,
+                                **kwargs)
+        wi_uri = cls.session.tracker_client.service.createWorkItem(
+            wi._suds_object)
+        new_wi = cls(uri=wi_uri)
+        return new_wi
+
+    @classmethod
+    def _new_work_item(cls, project_id, wi_type, title, desc, status,
+                       **kwargs):
+        # builds the object that is sent to the server by create
+        wi = cls(project_id)
         wi.project_id = project_id
         wi.type = wi_type
         wi.title = title
@@ -283,10 +310,173 @@ class _WorkItem(BasePolarion):
         wi.status = status
         for field in kwargs:
             setattr(wi, field, kwargs[field])
-        wi_uri = cls.session.tracker_client.service.createWorkItem(
-            wi._suds_object)
-        new_wi = cls(uri=wi_uri)
-        return new_wi
+        return wi
+
+    @classmethod
+    def _build_many(cls, items):
+        # builds the objects of create_many. items are dicts of the create
+        # parameters
+        return [cls._new_work_item(**item) for item in items]
+
+    @classmethod
+    @tx_wrapper
+    def _create_batch(cls, wis, pool):
+        return pool.map(
+            lambda wi: cls.session.tracker_client.service.createWorkItem(
+                wi._suds_object), wis)
+
+    @classmethod
+    def create_many(cls, items, batch_size=100, concurrency=4, reload=False):
+        """Creates many work items. All the items are built and validated
+        before the first one is created, so an invalid item is reported
+        before anything was changed on the server. The items are then created
+        batch_size at a time, each batch in its own transaction (unless
+        create_many is called within a transaction) by concurrency threads.
+        Unlike create, the new work items are not loaded from the server
+        unless reload is True.
+
+        Args:
+            items (list): list of dicts of the parameters of create, for
+                          example: {"project_id": "proj1",
+                                    "wi_type": "requirement",
+                                    "title": "t", "desc": "d",
+                                    "status": "draft", "severity": "must_have"}
+            batch_size (int): the number of items created in one transaction,
+                              default: 100
+            concurrency (int): the number of items created at a time,
+                               default: 4
+            reload (bool): return the new work item objects, default: False
+
+        Returns:
+            list of (uri, work_item_id) tuples in the order of the items, or
+            list of the new work item objects if reload is True
+
+        References:
+            Tracker.createWorkItem
+        """
+        wis = cls._build_many(items)
+        uris = []
+        # one pool for all the batches, so that its sessions are reused
+        with SessionPool(concurrency) as pool:
+            for start in range(0, len(wis), batch_size):
+                uris.extend(cls._create_batch(wis[start:start + batch_size],
+                                              pool))
+            if reload:
+                return pool.map(lambda uri: cls(uri=uri), uris)
+        return [(uri, re.search(cls.REGEX_ID, uri).group(1)) for uri in uris]
+
+    @classmethod
+    def _new_update_object(cls, uri, changes):
+        # builds an object that has only the uri and the changed fields, so
+        # that updateWorkItem changes only those fields. test_steps are not
+        # part of the object, they are set by _send_update. The object is
+        # built in the project of the uri, whose fields it has.
+        project_id = re.search(cls.REGEX_PROJ, uri).group(1)
+        wi = cls(project_id, suds_object=cls._new_suds_object())
+        for field in changes:
+            if field != "test_steps":
+                setattr(wi, field, changes[field])
+        wi._suds_object.uri = uri
+        return wi
+
+    @classmethod
+    def _send_update(cls, update):
+        wi, changes = update
+        cls.session.tracker_client.service.updateWorkItem(wi._suds_object)
+        if "test_steps" in changes:
+            wi.set_test_steps(changes["test_steps"])
+
+    @classmethod
+    def _update_batch(cls, updates, pool):
+        # returns the exception of each update, None if it was sent. A batch
+        # that runs in its own transaction is committed only if all its
+        # updates were sent, otherwise it is rolled back.
+        new_tx = not cls.session.tx_in()
+        if new_tx:
+            cls.session.tx_begin()
+        try:
+            errors = pool.map(cls._send_update, updates,
+                              return_exceptions=True)
+        except Exception:
+            if new_tx and cls.session.tx_in():
+                cls.session.tx_rollback()
+            raise
+        if new_tx:
+            if any(errors):
+                cls.session.tx_rollback()
+            else:
+                cls.session.tx_commit()
+        return errors
+
+    @classmethod
+    def update_many(cls, changes, batch_size=100, concurrency=4):
+        """Updates many work items without loading them. For each work item,
+        an object with only its uri and the changed fields is sent to the
+        server, so the fields that were not changed keep their values. The
+        items are updated batch_size at a time, each batch in its own
+        transaction, by concurrency threads. If an item of a batch fails, the
+        batch is rolled back and its other items are sent again in a new
+        transaction, until a transaction of the batch is committed.
+        If update_many is called within a transaction, the updates are part
+        of it and nothing is rolled back.
+
+        Args:
+            changes (list): list of (uri, {field: value}) tuples. The fields
+                            are the attributes of the work item object.
+                            test_steps is set with set_test_steps.
+            batch_size (int): the number of items updated in one transaction,
+                              default: 100
+            concurrency (int): the number of items updated at a time,
+                               default: 4
+
+        Returns:
+            list of dicts in the order of the changes, with the keys:
+                uri: the uri of the work item
+                updated (bool): the work item was updated
+                error: the error (str) or None if it was updated
+
+        References:
+            Tracker.updateWorkItem
+            Test_Management.setTestSteps
+        """
+        results = []
+        updates = []
+        for uri, fields in changes:
+            result = {"uri": uri, "updated": False, "error": None}
+            results.append(result)
+            try:
+                wi = cls._new_update_object(uri, fields)
+            except Exception as e:
+                result["error"] = "%s: %s" % (e.__class__.__name__, e)
+                continue
+            updates.append((result, (wi, fields)))
+        # one pool for all the batches, so that its sessions are reused.
+        with SessionPool(concurrency) as pool:
+            for start in range(0, len(updates), batch_size):
+                batch = updates[start:start + batch_size]
+                rolled_back = not cls.session.tx_in()
+                errors = cls._update_batch(
+                    [update for result, update in batch], pool)
+                # the updates that did not fail were rolled back with the
+                # batch, they are sent again without the failed ones, until
+                # none of them fails.
+                while rolled_back and any(errors):
+                    for (result, update), error in zip(batch, errors):
+                        if error:
+                            result["error"] = "%s: %s" % (
+                                error.__class__.__name__, error)
+                    batch = [(result, update) for (result, update), error
+                             in zip(batch, errors) if not error]
+                    errors = cls._update_batch(
+                        [update for result, update in batch], pool) \
+                        if batch else []
+                for (result, update), error in zip(batch, errors):
+                    if error:
+                        result["error"] = "%s: %s" % (
+                            error.__class__.__name__, error)
+                    else:
+                        result["updated"] = True
+        return results
 
     @classmethod
     def get_query_result_count(cls, query):
@@ -320,15 +510,16 @@ class _WorkItem(BasePolarion):
         References:
             tracker.getDefinedCustomFieldTypes
         """
-        if not cls._cache["custom_field_types"].get(wi_type):
+        # the custom fields are defined per project
+        key = (project_id, wi_type)
+        if not cls._cache["custom_field_types"].get(key):
             cfts = cls.session.tracker_client.service. \
                 getDefinedCustomFieldTypes(project_id, wi_type)
-            cls._cache["custom_field_types"][wi_type] = cfts
+            cls._cache["custom_field_types"][key] = cfts
         else:
-            cfts = cls._cache["custom_field_types"].get(wi_type)
+            cfts = cls._cache["custom_field_types"].get(key)
         results = [CustomFieldType(suds_object=item)
-                   if isinstance(item,
-                                 CustomFieldType()._suds_object.__class__)
+                   if isinstance(item, CustomFieldType._suds_class())
                    else EnumCustomFieldType(suds_object=item)
                    for item in cfts]
         return results
@@ -343,22 +534,20 @@ class _WorkItem(BasePolarion):
             The query function only returns a partially populated object with
             the fields passed in (by default work_item_id) and the uri field.
             The uri field is the Polarion unique object identifier which can
-             be used (among other things) to instantiate objects. Because not
-             all fields are returned in the object, this can cause problems
-             when trying to update an object that was returned by the query
-             function. Another issue is that certain fields are references and
-             are not retrieved by using their standard field names.
-             Examples of problems are:
-              * trying to use custom fields
-              * updating an object that has required fields that were not
-                retrieved
-              * trying to retrieve the project_id field.
-            Because of these issues, recommended usage is as follows:
+             be used (among other things) to instantiate objects.
+             The returned objects know which fields were populated. When a
+             field that was not populated is accessed, it is loaded for all
+             the objects returned by the same query in a single request (see
+             _fault_in), so requesting too few fields costs one request per
+             missing field and not one request per object.
+             Updating an object that was returned by the query function may
+             still fail if it has required fields that were not retrieved.
+             In that case, the object should be instantiated by its uri:
             {WI_TYPE} is TestCase, Requirement, ...
                 query_results = {WI_TYPE}.query("query string")
                 for item in query_results:
                     wi = {WI_TYPE}(uri=item.uri)
-                    ... # do what you want with the object
+                    ... # update the object
 
         Args:
             query: query, either Lucene or SQL
@@ -371,11 +560,13 @@ class _WorkItem(BasePolarion):
                     For custom fields you can specify which fields you want to
                     be filled using following syntax:
                     customFields.CUSTOM_FIELD_ID (e.g. customFields.risk).
+                    The work_item_id field is always added.
                     Default: list containing "work_item_id".
             sort: Lucene sort string (can be null), default: work_item_id
             limit: how many results to return (-1 means everything, default)
             baseline_revision (str): if populated, query done in specified rev
-                                     default: None
+                                     The results are kept in the permanent
+                                     revision cache. default: None
             query_uris (bool): returns a list of URI of the WorkItems found,
                                default: False
 
@@ -396,33 +587,42 @@ class _WorkItem(BasePolarion):
             Tracker.queryWorkItemsInBaselineLimited
             Tracker.queryWorkItemsLimited
         """
-        parms = [query]
-        if not is_sql:
-            parms.append(sort)
-        if baseline_revision:
-            parms.append(baseline_revision)
-        if not query_uris:
-            p_fields = cls._convert_obj_fields_to_polarion(fields)
-            parms.append(p_fields)
-        if not is_sql and limit != -1:
-            parms.append(limit)
+        return cls._query(query, is_sql, fields, sort, limit,
+                          baseline_revision, query_uris)
+
+    @classmethod
+    def _query(cls, query, is_sql, fields, sort, limit, baseline_revision,
+               query_uris, schema=None):
+        # the query core of _WorkItem.query and _SpecificWorkItem.query. The
+        # fields and the sort are converted by the map of the schema when it
+        # is given, and the results are created in its project.
         if not query_uris:
-            base_name = "queryWorkItems"
-        else:
-            base_name = "queryWorkItemUris"
-        if baseline_revision:
-            base_name += "InBaseline"
-        if is_sql:
-            base_name += "BySQL"
-        elif limit != -1:
-            # You can't have both SQL and limited.
-            base_name += "Limited"
-        wis = getattr(cls.session.tracker_client.service, base_name)(*parms)
-        if query_uris:
-            return wis
-        else:
-            lst_wi = [cls(suds_object=wi) for wi in wis]
+            # the work_item_id is needed to load missing fields (_fault_in)
+            if not fields:
+                fields = []
+            elif not isinstance(fields, list):
+                fields = [fields]
+            if "work_item_id" not in fields:
+                fields = fields + ["work_item_id"]
+
+        def wrap_page(results):
+            if schema:
+                lst_wi = [cls(schema.project_id, suds_object=wi)
+                          for wi in results]
+            else:
+                lst_wi = [cls(suds_object=wi) for wi in results]
+            # the results share the set of loaded fields and the list of
+            # siblings, so that a missing field is loaded for all of them.
+            loaded_fields = set(fields + ["uri"])
+            for wi in lst_wi:
+                wi._loaded_fields = loaded_fields
+                wi._query_siblings = lst_wi
+                wi._query_baseline = baseline_revision
             return lst_wi
+        return cls._search(query, is_sql, fields, sort, limit,
+                           baseline_revision, query_uris,
+                           wrap_page=wrap_page,
+                           suds_map=schema.suds_map if schema else None)
 
     def __init__(self, project_id=None, work_item_id=None, suds_object=None,
                  uri=None, fields=None, revision=None):
@@ -439,7 +639,9 @@ class _WorkItem(BasePolarion):
             fields: the fields that are requested to be populated.
                     if this is null then it will return all fields.
             revision: if given, get the _WorkItem in the specified revision
-                       Is only relevant if URI is given.
+                       Is only relevant if URI is given. Work items in a
+                       specific revision are kept in the permanent revision
+                       cache.
 
         Notes:
             Either test_run_id and project or suds_object or uri can be passed
@@ -460,7 +662,8 @@ class _WorkItem(BasePolarion):
         # because other classes inherit from this. If super uses self.__class__
         # it will be a infinite loop for the derived class.
         super(_WorkItem, self).__init__(work_item_id, suds_object)
-        p_fields = self._convert_obj_fields_to_polarion(fields)
+        p_fields = self._convert_obj_fields_to_polarion(fields,
+                                                        self._cls_suds_map)
         if work_item_id or uri:
             function_name = "getWorkItemBy"
             parms = []
@@ -473,8 +676,13 @@ class _WorkItem(BasePolarion):
                     ("WithFields" if p_fields else "")
                 parms = [uri] + ([revision] if revision else []) + \
                     ([p_fields] if p_fields else [])
-            self._suds_object = getattr(self.session.tracker_client.service,
-                                        function_name)(*parms)
+            if uri and revision:
+                # a work item in a specific revision can never change, so it
+                # is cached
+                self._suds_object = self._pinned_call(function_name, parms)
+            else:
+                self._suds_object = getattr(
+                    self.session.tracker_client.service, function_name)(*parms)
         if not suds_object:
             if getattr(self._suds_object, "_unresolvable", True):
                 raise PyleroLibException(
@@ -483,16 +691,93 @@ class _WorkItem(BasePolarion):
         if not self.project_id and not suds_object:
             self.project_id = self.default_project
 
-    def _fix_circular_refs(self):
+    def _suds_field_value(self, field_name):
+        # returns the raw value of a field in the suds object, without going
+        # through the property (which would call _fault_in)
+        csm = self._cls_suds_map[field_name]
+        if isinstance(csm, dict) and csm.get("is_custom"):
+            custom_fields = getattr(self._suds_object, "customFields", None)
+            # ArrayOf Polarion objects have a double list.
+            for custom in (custom_fields[0] if custom_fields else []):
+                if custom.key == csm["field_name"]:
+                    return custom
+            return None
+        suds_key = csm["field_name"] if isinstance(csm, dict) else csm
+        return getattr(self._suds_object, suds_key, None)
+
+    def _fault_in(self, field_name):
+        """Loads a field that was not populated by the query that returned
+        this object. The field is loaded for all the objects returned by the
+        same query that don't have it yet, with one queryWorkItems request per
+        FAULT_IN_CHUNK objects, instead of fetching each object by its uri.
+
+        Args:
+            field_name: the field name of the Pylero object that is gotten
+
+        References:
+            Tracker.queryWorkItems
+            Tracker.queryWorkItemsInBaseline
+        """
+        loaded_fields = self._loaded_fields
+        if loaded_fields is None or field_name in loaded_fields or \
+                field_name in self.FAULT_IN_SKIP:
+            return
+        if self._suds_field_value(field_name) is not None:
+            # set locally, it must not be overwritten by the server value
+            return
+        siblings = dict(
+            (wi._suds_object.uri, wi) for wi in self._query_siblings
+            if wi._suds_field_value(field_name) is None)
+        csm = self._cls_suds_map[field_name]
+        p_fields = ["id"] + self._convert_obj_fields_to_polarion(
+            field_name, self._cls_suds_map)
+        ids = [wi._suds_object.id for wi in siblings.values()]
+        for start in range(0, len(ids), self.FAULT_IN_CHUNK):
+            query = "id:(%s)" % " ".join(
+                '"%s"' % wi_id for wi_id in ids[start:start +
+                                                self.FAULT_IN_CHUNK])
+            if self._query_baseline:
+                wis = self._pinned_call(
+                    "queryWorkItemsInBaseline",
+                    [query, "id", self._query_baseline, p_fields])
+            else:
+                wis = self.session.tracker_client.service.queryWorkItems(
+                    query, "id", p_fields)
+            for suds_wi in wis:
+                wi = siblings.get(suds_wi.uri)
+                if not wi:
+                    # same id in another project
+                    continue
+                if isinstance(csm, dict) and csm.get("is_custom"):
+                    custom_fields = getattr(suds_wi, "customFields", None)
+                    for custom in (custom_fields[0] if custom_fields else []):
+                        if custom.key == csm["field_name"]:
+                            if not getattr(wi._suds_object, "customFields",
+                                           None):
+                                wi._suds_object.customFields = \
+                                    wi.custom_array_obj()
+                            wi._suds_object.customFields[0].append(custom)
+                else:
+                    suds_key = csm["field_name"] \
+                        if isinstance(csm, dict) else csm
+                    setattr(wi._suds_object, suds_key,
+                            getattr(suds_wi, suds_key, None))
+        loaded_fields.add(field_name)
+
+    @staticmethod
+    def _fix_planned_in(suds_map):
         # This module imports plan and plan imports this module.
         # The module references itself as a class attribute, which is not
         # allowed, so the self reference is defined here.
         from pylero.plan import Plan
         from pylero.plan import ArrayOfPlan
-        self._cls_suds_map["planned_in"]["is_array"] = True
-        self._cls_suds_map["planned_in"]["cls"] = Plan
-        self._cls_suds_map["planned_in"]["arr_cls"] = ArrayOfPlan
-        self._cls_suds_map["planned_in"]["inner_field_name"] = "Plan"
+        suds_map["planned_in"]["is_array"] = True
+        suds_map["planned_in"]["cls"] = Plan
+        suds_map["planned_in"]["arr_cls"] = ArrayOfPlan
+        suds_map["planned_in"]["inner_field_name"] = "Plan"
+
+    def _fix_circular_refs(self):
+        self._fix_planned_in(self._cls_suds_map)
 
     def add_approvee(self, approvee_id):
         """method add_approvee adds an approvee to the current _WorkItem.
@@ -669,10 +954,9 @@ class _WorkItem(BasePolarion):
             Tracker.createAttachment
         """
         self._verify_obj()
-        data = self._get_file_data(path)
         filename = os.path.basename(path)
-        self.session.tracker_client.service. \
-            createAttachment(self.uri, filename, title, data)
+        self.session.tracker_client.call_with_file(
+            "createAttachment", path, self.uri, filename, title)
 
     def create_comment(self, content):
         """method create_comment adds a comment to the current _WorkItem
@@ -751,6 +1035,21 @@ class _WorkItem(BasePolarion):
         self.session.tracker_client.service.deleteAttachment(
             self.uri, attachment_id)
 
+    def download_all(self, dest_dir, concurrency=4):
+        """method download_all downloads all the attachments of the current
+        _WorkItem to a directory, concurrency at a time.
+        see attachment.download_attachments
+
+        Args:
+            dest_dir: the directory to save the attachments in
+            concurrency (int): the number of downloads at a time, default: 4
+
+        Returns:
+            list of the paths of the files
+        """
+        self._verify_obj()
+        return download_attachments(self.attachments, dest_dir, concurrency)
+
     def do_auto_suspect(self):
         """Triggers auto suspect.
 
@@ -1005,11 +1304,16 @@ class _WorkItem(BasePolarion):
                               function_name)(*parm)
         return WorkflowAction(suds_object=suds_action)
 
-    def get_test_steps(self):
+    def get_test_steps(self, refresh=False):
         """method get_test_steps retrieves the test steps of the current
         WorkItem. If the _WorkItem is not populated, it returns an exception.
+        The test steps are retrieved once and kept in the object (which is
+        also used by the test_steps attribute), until they are changed by
+        set_test_steps or update.
+
         Args:
-            None
+            refresh (bool): retrieve the test steps even if they were
+                            retrieved before, default: False
 
         Returns:
             a TestSteps object
@@ -1018,9 +1322,54 @@ class _WorkItem(BasePolarion):
             Tracker.getTestSteps
         """
         self._verify_obj()
-        suds_ts = self.session.test_management_client.service. \
-            getTestSteps(self.uri)
-        return TestSteps(suds_object=suds_ts)
+        if refresh or self._test_steps_cache is None:
+            self._test_steps_cache = self.session.test_management_client. \
+                service.getTestSteps(self.uri)
+        return TestSteps(suds_object=self._test_steps_cache)
+
+    @classmethod
+    def get_test_steps_many(cls, work_items, concurrency=4, pool=None):
+        """Retrieves the test steps of many work items, concurrency at a time.
+        The test steps are not part of the work items returned by queries
+        (see FAULT_IN_SKIP), so each work item needs its own getTestSteps
+        request. Work item objects keep their test steps (see
+        get_test_steps) and the ones that already have them are not
+        requested again.
+
+        Args:
+            work_items (list): list of work item uris or _WorkItem objects
+            concurrency (int): the number of requests sent at a time,
+                               default: 4
+            pool (SessionPool): the pool that sends the requests, for callers
+                                that get the test steps of many batches.
+                                default: None (a pool of concurrency
+                                sessions)
+
+        Returns:
+            dict of uri -> TestSteps object
+
+        References:
+            Tracker.getTestSteps
+        """
+        objs = {}
+        for item in work_items:
+            if isinstance(item, _WorkItem):
+                objs.setdefault(item.uri, []).append(item)
+            else:
+                objs.setdefault(item, [])
+        cached = dict((uri, items[0]._test_steps_cache)
+                      for uri, items in objs.items()
+                      if items and items[0]._test_steps_cache is not None)
+        missing = [uri for uri in objs if uri not in cached]
+        suds_steps = (pool or SessionPool(concurrency)).map(
+            lambda uri: cls.session.test_management_client.service.
+            getTestSteps(uri), missing)
+        cached.update(zip(missing, suds_steps))
+        for uri, items in objs.items():
+            for item in items:
+                item._test_steps_cache = cached[uri]
+        return dict((uri, TestSteps(suds_object=suds_ts))
+                    for uri, suds_ts in cached.items())
 
     def get_unavailable_actions(self):
         """Gets the actions that can not be used on the work item in the
@@ -1247,7 +1596,8 @@ class _WorkItem(BasePolarion):
             Tracker.setFieldsNull
         """
         self._verify_obj()
-        p_fields = self._convert_obj_fields_to_polarion(fields)
+        p_fields = self._convert_obj_fields_to_polarion(fields,
+                                                        self._cls_suds_map)
         self.session.tracker_client.service.setFieldsNull(self.uri, p_fields)
 
     def set_test_steps(self, test_steps=None):
@@ -1272,13 +1622,13 @@ class _WorkItem(BasePolarion):
             parm = []
             if isinstance(test_steps[0], TestStep):
                 parm = [item._suds_object for item in test_steps]
-            elif isinstance(test_steps[0], TestStep().
-                            _suds_object.__class__):
+            elif isinstance(test_steps[0], TestStep._suds_class()):
                 parm = test_steps
         else:
             raise PyleroLibException("Expecting a list of testStep objects")
         self.session.test_management_client.service.setTestSteps(self.uri,
                                                                  parm)
+        self._test_steps_cache = None
 
     def update(self):
         """Update the server with the current _WorkItem data
@@ -1294,6 +1644,7 @@ class _WorkItem(BasePolarion):
         """
         self._verify_obj()
         self.session.tracker_client.service.updateWorkItem(self._suds_object)
+        self._test_steps_cache = None
 
     def update_attachment(self, attachment_id, path, title):
         """method update_attachment updates the specified attachment to the
@@ -1314,10 +1665,10 @@ class _WorkItem(BasePolarion):
             Tracker.updateAttachment
         """
         self._verify_obj()
-        data = self._get_file_data(path)
         filename = os.path.basename(path)
-        self.session.tracker_client.service. \
-            updateAttachment(self.uri, attachment_id, filename, title, data)
+        self.session.tracker_client.call_with_file(
+            "updateAttachment", path, self.uri, attachment_id, filename,
+            title)
 
     def verify_required(self):
         for field in self._required_fields:
@@ -1340,6 +1691,70 @@ class _WorkItem(BasePolarion):
         return TestRun.search(self.work_item_id)
 
 
+class WorkItemSchema(object):
+    """The fields of the work items of a type in a project. The custom fields
+    of a work item type are defined per project, so the _cls_suds_map of a
+    specific work item depends on its project. The schema is built once per
+    project and type (see _SpecificWorkItem.get_schema) and its suds_map is
+    shared by all the work items of the project and type, so creating a work
+    item does no work for its custom fields.
+
+    Attributes:
+        project_id (str): the project of the schema
+        wi_type (str): the work item type of the schema
+        custom_fields (dict): field name -> _cls_suds_map entry of the custom
+                              fields
+        all_custom_fields (list): the names of the custom fields, in the
+                                  order they are defined
+        required_fields (list): the names of the required custom fields
+        suds_map (dict): the _cls_suds_map of the work items of the project
+                         and type. It must not be changed.
+    """
+
+    def __init__(self, project_id, wi_type, base_suds_map,
+                 custom_field_types):
+        """WorkItemSchema constructor
+
+        Args:
+            project_id: the project of the schema
+            wi_type: the work item type of the schema
+            base_suds_map (dict): the _cls_suds_map of the fields that all
+                                  work items have
+            custom_field_types (list): the CustomFieldType objects of the
+                                       type (see
+                                       get_defined_custom_field_types)
+        """
+        self.project_id = project_id
+        self.wi_type = wi_type
+        self.custom_fields = {}
+        self.all_custom_fields = []
+        self.required_fields = []
+        for cft in custom_field_types:
+            # convert the custom field name to use code convention, where
+            # possible
+            split_name = re.findall('[a-zA-Z][^A-Z]*', cft.cft_id)
+            local_name = "_".join(split_name).replace("_U_R_I", "_uri"). \
+                replace("_W_I", "_wi").replace("_I_D", "_id").lower()
+            csm = {"field_name": cft.cft_id}
+            # types are returned in format:
+            # * nsX:obj_type for objects and
+            # * xsd:string for native types
+            # for all object types, I need special processing.
+            parse_type = cft.type.split(":")
+            if parse_type[0].startswith("ns"):
+                csm["cls"] = globals()[parse_type[1]]
+            csm["enum_id"] = getattr(cft, "enum_id", None)
+            csm["is_custom"] = True
+            csm["control"] = wi_type
+            self.custom_fields[local_name] = csm
+            self.all_custom_fields.append(local_name)
+            if cft.required:
+                self.required_fields.append(local_name)
+        self.suds_map = copy.deepcopy(base_suds_map)
+        self.suds_map.update(copy.deepcopy(self.custom_fields))
+        _WorkItem._fix_planned_in(self.suds_map)
+
+
 class _SpecificWorkItem(_WorkItem):
     """specific work item is a class that contains the WorkItem implementation
     that is different per WorkItem type. Classes that inherit from this class
@@ -1349,6 +1764,11 @@ class _SpecificWorkItem(_WorkItem):
     _got_custom_fields = False
     _required_fields = []
     _all_custom_fields = []
+    # the fields that all work items have. The custom fields are in the
+    # suds_map of the schema of each project (see get_schema)
+    _base_suds_map = copy.deepcopy(_WorkItem._cls_suds_map)
+    # (project id, work item type) -> WorkItemSchema, see get_schema
+    _schemas = {}
 
     @classmethod
     def create(cls, project_id, title, desc, status="draft", **kwargs):
@@ -1366,64 +1786,118 @@ class _SpecificWorkItem(_WorkItem):
             kwargs: keyword arguments for custom fields. All required custom
                     fields must appear as keyword arguments.
         """
-        cls.get_custom_fields(project_id)
+        cls._verify_create_fields(cls.get_schema(project_id), kwargs)
+        return super(_SpecificWorkItem, cls).create(
+            project_id, cls._wi_type, title, desc, status, **kwargs)
+
+    @classmethod
+    def _verify_create_fields(cls, schema, kwargs):
+        # verifies the keyword fields of create against the fields of the
+        # schema
         fields = ""
-        for req in cls._required_fields:
+        for req in schema.required_fields:
             if req not in kwargs:
                 fields += (", " if fields else "") + req
         if fields:
             raise PyleroLibException("These parameters are required: {0}".
                                        format(fields))
         for field in kwargs:
-            if field not in cls._all_custom_fields and \
-                    field not in cls._cls_suds_map:
+            if field not in schema.suds_map:
                 fields += (", " if fields else "") + field
         if fields:
             raise PyleroLibException("These parameters are unknown: {0}".
                                        format(fields))
-        return super(_SpecificWorkItem, cls).create(
-            project_id, cls._wi_type, title, desc, status, **kwargs)
+
+    @classmethod
+    def _build_many(cls, items):
+        # items are dicts of the create parameters of the specific type, the
+        # project and the status are optional. All the items are verified
+        # before the objects are built.
+        parms = []
+        for item in items:
+            kwargs = dict(item)
+            project_id = kwargs.pop("project_id", None) or \
+                cls.default_project
+            parms.append((project_id, kwargs.pop("title"),
+                          kwargs.pop("desc", None),
+                          kwargs.pop("status", "draft"), kwargs))
+        for parm in parms:
+            cls._verify_create_fields(cls.get_schema(parm[0]), parm[4])
+        return [cls._new_work_item(project_id, cls._wi_type, title, desc,
+                                   status, **kwargs)
+                for project_id, title, desc, status, kwargs in parms]
+
+    @classmethod
+    def create_many(cls, items, batch_size=100, concurrency=4, reload=False):
+        """Creates many work items of the specific type. All the required
+        custom fields of every item are verified before the first item is
+        created (see _WorkItem.create_many).
+
+        Args:
+            items (list): list of dicts of the parameters of create. the
+                          project_id (default: the default project) and the
+                          status (default: draft) are optional, for example:
+                          {"title": "t", "desc": "d", "reqtype": "functional"}
+            batch_size (int): the number of items created in one transaction,
+                              default: 100
+            concurrency (int): the number of items created at a time,
+                               default: 4
+            reload (bool): return the new work item objects, default: False
+
+        Returns:
+            list of (uri, work_item_id) tuples in the order of the items, or
+            list of the new work item objects if reload is True
+        """
+        return super(_SpecificWorkItem, cls).create_many(
+            items, batch_size, concurrency, reload)
+
+    @classmethod
+    def _new_update_object(cls, uri, changes):
+        # a required field can't be cleared by update_many, as it can't by
+        # update (see verify_required). The required fields are the ones of
+        # the project of the work item.
+        project_id = re.search(cls.REGEX_PROJ, uri).group(1)
+        for field in cls.get_schema(project_id).required_fields:
+            if field in changes and not changes[field]:
+                raise PyleroLibException(
+                    "{0} is a required field".format(field))
+        return super(_SpecificWorkItem, cls)._new_update_object(uri, changes)
+
+    @classmethod
+    def get_schema(cls, project_id=None):
+        """Returns the schema of the work items of the specific type in the
+        project. It is built the first time it is requested and then reused.
+
+        Args:
+            project_id: the project, default: the default project
+
+        Returns:
+            WorkItemSchema object
+        """
+        project_id = project_id or cls.default_project
+        key = (project_id, cls._wi_type)
+        schema = cls._schemas.get(key)
+        if not schema:
+            schema = WorkItemSchema(
+                project_id, cls._wi_type, cls._base_suds_map,
+                cls.get_defined_custom_field_types(project_id, cls._wi_type))
+            cls._schemas[key] = schema
+        return schema
 
     @classmethod
     def get_custom_fields(cls, project_id):
-        """List of custom fields for the project and specific wi_type
+        """Sets the class _all_custom_fields and _required_fields to the
+        custom fields of the project and specific wi_type (see get_schema)
 
         Args:
             project_id: project that the user is working with
 
         Returns:
-            tuple containing:
-                a) list of all custom fields
-                b) list of all required fields
+            None
         """
-        cls._required_fields = []
-        cls._all_custom_fields = []
-        cfts = cls.get_defined_custom_field_types(project_id,
-                                                  cls._wi_type)
-        for cft in cfts:
-                # convert the custom field name to use code convention, where
-                # possible
-                split_name = re.findall('[a-zA-Z][^A-Z]*', cft.cft_id)
-                local_name = "_".join(split_name).replace("_U_R_I", "_uri"). \
-                    replace("_W_I", "_wi").replace("_I_D", "_id").lower()
-                cls._all_custom_fields.append(local_name)
-                cls._cls_suds_map[local_name] = {}
-                cls._cls_suds_map[local_name]["field_name"] = cft.cft_id
-                # types are returned in format:
-                # * nsX:obj_type for objects and
-                # * xsd:string for native types
-                # for all object types, I need special processing.
-                parse_type = cft.type.split(":")
-                if parse_type[0].startswith("ns"):
-                    cls._cls_suds_map[local_name]["cls"] = \
-                        globals()[parse_type[1]]
-                cls._cls_suds_map[local_name]["enum_id"] = getattr(cft,
-                                                                   "enum_id",
-                                                                   None)
-                cls._cls_suds_map[local_name]["is_custom"] = True
-                cls._cls_suds_map[local_name]["control"] = cls._wi_type
-                if cft.required:
-                    cls._required_fields.append(local_name)
+        schema = cls.get_schema(project_id)
+        cls._required_fields = schema.required_fields
+        cls._all_custom_fields = schema.all_custom_fields
         cls._got_custom_fields = True
         return None
 
@@ -1440,22 +1914,20 @@ class _SpecificWorkItem(_WorkItem):
             The query function only returns a partially populated object with
             the fields passed in (by default work_item_id) and the uri field.
             The uri field is the Polarion unique object identifier which can
-             be used (among other things) to instantiate objects. Because not
-             all fields are returned in the object, this can cause problems
-             when trying to update an object that was returned by the query
-             function. Another issue is that certain fields are references and
-             are not retrieved by using their standard field names.
-             Examples of problems are:
-              * trying to use custom fields
-              * updating an object that has required fields that were not
-                retrieved
-              * trying to retrieve the project_id field.
-            Because of these issues, recommended usage is as follows:
+             be used (among other things) to instantiate objects.
+             The returned objects know which fields were populated. When a
+             field that was not populated is accessed, it is loaded for all
+             the objects returned by the same query in a single request (see
+             _fault_in), so requesting too few fields costs one request per
+             missing field and not one request per object.
+             Updating an object that was returned by the query function may
+             still fail if it has required fields that were not retrieved.
+             In that case, the object should be instantiated by its uri:
             {WI_TYPE} is TestCase, Requirement, ...
                 query_results = {WI_TYPE}.query("query string")
                 for item in query_results:
                     wi = {WI_TYPE}(uri=item.uri)
-                    ... # do what you want with the object
+                    ... # update the object
 
         Args:
             query: query, Lucene
@@ -1480,26 +1952,38 @@ class _SpecificWorkItem(_WorkItem):
         Returns:
             list of the specific WorkItem objects that were found.
         """
-        if not cls._got_custom_fields:
-            cls.get_custom_fields(project_id or cls.default_project)
+        # the fields and the sort are converted by the map of the schema of
+        # the project, which has its custom fields.
+        schema = cls.get_schema(project_id)
         if query:
             query += " AND "
         query += "type:%s AND project.id:%s" % \
-            (cls._wi_type, project_id or cls.default_project)
-        return super(_SpecificWorkItem, cls).query(
-            query, False, fields, sort, limit, baseline_revision, query_uris)
+            (cls._wi_type, schema.project_id)
+        return cls._query(query, False, fields, sort, limit,
+                          baseline_revision, query_uris, schema)
+
+    def _fix_circular_refs(self):
+        # the map of the object is the map of its schema, which was fixed
+        # when the schema was built (see WorkItemSchema)
+        pass
 
     def __init__(self, project_id=None, work_item_id=None, suds_object=None,
                  uri=None, fields=None, revision=None):
-        """In this constructor, it adds the custom fields per WorkItem type to
-        the _cls_suds_map along with the is_custom and is_enum fields.
+        """In this constructor, the _cls_suds_map of the object is the one of
+        the schema of its project and WorkItem type, which has the custom
+        fields along with the is_custom and is_enum fields.
         In the property builder of the base class, it defines special behavior
         for custom fields so they are treated like regular attributes
         """
         if not project_id:
             project_id = self.default_project
         self._changed_fields = {}
-        self.get_custom_fields(project_id)
+        schema = self.get_schema(project_id)
+        self._required_fields = schema.required_fields
+        # the map of the schema is not changed by the object, so it is shared
+        # by all the work items of the project and type instead of being
+        # copied.
+        self._cls_suds_map = schema.suds_map
         super(_SpecificWorkItem, self).__init__(project_id, work_item_id,
                                                 suds_object, uri, fields,
                                                 revision)
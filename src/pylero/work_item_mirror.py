@@ -0,0 +1,600 @@
+# -*- coding: utf8 -*-
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+from pylero._compatible import object
+import collections
+import datetime
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import suds.client
+import suds.sudsobject
+from suds.transport import Transport, TransportError
+from suds.transport.https import HttpAuthenticated
+from pylero.base_polarion import BasePolarion, lazy_import
+from pylero.exceptions import PyleroLibException
+from pylero.session_pool import SessionPool
+from pylero.work_item_sync import WorkItemStore, WorkItemSync
+
+REGEX_DATETIME = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{6}))?"
+    r"(?:([+-])(\d{2}):(\d{2}))?$")
+# the attributes of the custom field types that WorkItemSchema uses
+_CustomFieldType = collections.namedtuple(
+    "_CustomFieldType", ["cft_id", "type", "enum_id", "required"])
+
+
+class _RecordingTransport(HttpAuthenticated):
+    """suds transport that keeps the documents that it reads: the WSDL and
+    the schemas that it imports"""
+
+    def __init__(self, **kwargs):
+        HttpAuthenticated.__init__(self, **kwargs)
+        # url -> content
+        self.documents = {}
+
+    def open(self, request):
+        content = HttpAuthenticated.open(self, request).read()
+        self.documents[request.url] = content
+        return io.BytesIO(content)
+
+
+class _StoredTransport(Transport):
+    """suds transport that reads the documents kept by the mirror, so that
+    its WSDL client is built without the server. It doesn't send requests.
+    """
+
+    def __init__(self, documents):
+        Transport.__init__(self)
+        self.documents = documents
+
+    def open(self, request):
+        if request.url not in self.documents:
+            raise TransportError(
+                "{0} is not in the mirror".format(request.url), 404)
+        return io.BytesIO(self.documents[request.url])
+
+    def send(self, request):
+        raise TransportError("The mirror doesn't send requests", 405)
+
+
+class _FixedOffset(datetime.tzinfo):
+    """tzinfo used to restore the timezone of mirrored dates"""
+
+    def __init__(self, minutes):
+        self._offset = datetime.timedelta(minutes=minutes)
+
+    def utcoffset(self, dt):
+        return self._offset
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+    def tzname(self, dt):
+        return None
+
+
+def suds_to_json(val):
+    """Converts a suds object (and everything it contains) to a json
+    serializable structure that keeps the suds class names and namespaces,
+    so that json_to_suds can rebuild the same object.
+    """
+    if isinstance(val, suds.sudsobject.Object):
+        sxtype = getattr(val.__metadata__, "sxtype", None)
+        return {"__suds__": val.__class__.__name__,
+                "ns": sxtype.namespace()[1] if sxtype else None,
+                "items": dict((name, suds_to_json(item))
+                              for name, item in val)}
+    if isinstance(val, datetime.datetime):
+        return {"__datetime__": val.isoformat()}
+    if isinstance(val, datetime.date):
+        return {"__date__": val.isoformat()}
+    if isinstance(val, (list, tuple)):
+        return [suds_to_json(item) for item in val]
+    return val
+
+
+def json_to_suds(val, factory):
+    """Rebuilds a suds object from the structure returned by suds_to_json.
+    The objects are created by the WSDL factory, so that they are the same
+    as the objects returned by the server and can be sent back to it.
+
+    Args:
+        val: the structure returned by suds_to_json
+        factory: the suds factory that creates the objects, for example the
+                 factory of the tracker client or SqliteWorkItemStore.factory
+
+    Returns:
+        the suds object
+    """
+    if isinstance(val, list):
+        return [json_to_suds(item, factory) for item in val]
+    if not isinstance(val, dict):
+        return val
+    if "__datetime__" in val:
+        parts = REGEX_DATETIME.match(val["__datetime__"]).groups()
+        tzinfo = None
+        if parts[7]:
+            minutes = int(parts[8]) * 60 + int(parts[9])
+            tzinfo = _FixedOffset(-minutes if parts[7] == "-" else minutes)
+        return datetime.datetime(*([int(x) for x in parts[:6]] +
+                                   [int(parts[6] or 0), tzinfo]))
+    if "__date__" in val:
+        return datetime.datetime.strptime(val["__date__"], "%Y-%m-%d").date()
+    if val.get("ns"):
+        obj = factory.create("{%s}%s" % (val["ns"], val["__suds__"]))
+    else:
+        obj = suds.sudsobject.Factory.object(val["__suds__"])
+    for name, item in val["items"].items():
+        setattr(obj, name, json_to_suds(item, factory))
+    return obj
+
+
+class SqliteWorkItemStore(WorkItemStore):
+    """WorkItemStore that materializes work items in a local SQLite database,
+    so that read only queries can run locally instead of on the server.
+
+    The complete work item is kept, so that the query functions return the
+    same Pylero objects as the server does. Custom fields, links and test
+    steps are also kept in their own tables and the title and description
+    are indexed in an FTS5 table for full text search.
+
+    Tables:
+        work_items: uri, project_id, type, work_item_id, title, status,
+                    updated, data (the json of the suds object)
+        custom_fields: uri, key, value (json)
+        links: uri, role, target_uri, derived (0 or 1)
+        test_steps: uri, step_index, step_values (json list of the contents)
+                    of the work items of the TEST_STEP_TYPES
+        work_items_fts: uri, title, description
+        sync_state: project_id, type, watermark, reconciled
+        wsdl_documents: url, root (1 for the WSDL of the tracker service, 0
+                        for the documents it imports), content
+        custom_field_types: project_id, type, cft_id, field_type, enum_id,
+                            required (0 or 1)
+        work_item_types: type, name
+
+    The WSDL documents, the custom field types and the work item types are
+    kept by the sync, so that the mirrored work items are rebuilt without
+    the server (see factory and _wrap).
+
+    Attributes:
+        path (str): the database file
+        conn (sqlite3.Connection): the database connection
+        concurrency (int): the number of test steps requests sent at a time
+    """
+    # the work item types that have test steps
+    TEST_STEP_TYPES = ["testcase"]
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS work_items ("
+        "uri TEXT PRIMARY KEY, project_id TEXT, type TEXT, "
+        "work_item_id TEXT, title TEXT, status TEXT, updated TEXT, "
+        "data TEXT)",
+        "CREATE INDEX IF NOT EXISTS work_items_id "
+        "ON work_items (project_id, work_item_id)",
+        "CREATE INDEX IF NOT EXISTS work_items_type "
+        "ON work_items (project_id, type)",
+        "CREATE TABLE IF NOT EXISTS custom_fields ("
+        "uri TEXT, key TEXT, value TEXT)",
+        "CREATE INDEX IF NOT EXISTS custom_fields_uri "
+        "ON custom_fields (uri)",
+        "CREATE INDEX IF NOT EXISTS custom_fields_key "
+        "ON custom_fields (key, value)",
+        "CREATE TABLE IF NOT EXISTS links ("
+        "uri TEXT, role TEXT, target_uri TEXT, derived INTEGER)",
+        "CREATE INDEX IF NOT EXISTS links_uri ON links (uri)",
+        "CREATE INDEX IF NOT EXISTS links_target ON links (target_uri)",
+        "CREATE TABLE IF NOT EXISTS test_steps ("
+        "uri TEXT, step_index INTEGER, step_values TEXT)",
+        "CREATE INDEX IF NOT EXISTS test_steps_uri ON test_steps (uri)",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS work_items_fts USING fts5("
+        "uri UNINDEXED, title, description)",
+        "CREATE TABLE IF NOT EXISTS sync_state ("
+        "project_id TEXT, type TEXT, watermark TEXT, reconciled REAL, "
+        "PRIMARY KEY (project_id, type))",
+        "CREATE TABLE IF NOT EXISTS wsdl_documents ("
+        "url TEXT PRIMARY KEY, root INTEGER, content BLOB)",
+        "CREATE TABLE IF NOT EXISTS custom_field_types ("
+        "project_id TEXT, type TEXT, cft_id TEXT, field_type TEXT, "
+        "enum_id TEXT, required INTEGER)",
+        "CREATE INDEX IF NOT EXISTS custom_field_types_type "
+        "ON custom_field_types (project_id, type)",
+        "CREATE TABLE IF NOT EXISTS work_item_types ("
+        "type TEXT PRIMARY KEY, name TEXT)"]
+    DETAIL_TABLES = ["work_items", "custom_fields", "links", "test_steps",
+                     "work_items_fts"]
+
+    def __init__(self, path, concurrency=4):
+        super(SqliteWorkItemStore, self).__init__()
+        self.path = os.path.expanduser(path)
+        self.concurrency = concurrency
+        # the pool of the test steps requests, reused by all the batches
+        self._pool = None
+        # the (project id, type) whose custom field types were saved by this
+        # store, they are saved once per sync run
+        self._saved_types = set()
+        self._factory = None
+        # (project id, type) -> WorkItemSchema built from the saved types
+        self._schemas = {}
+        self.conn = sqlite3.connect(self.path)
+        try:
+            for stmt in self.SCHEMA:
+                self.conn.execute(stmt)
+        except sqlite3.OperationalError as e:
+            raise PyleroLibException(
+                "Unable to create the mirror database: {0}. The SQLite "
+                "library must be built with FTS5".format(e))
+        self.conn.commit()
+
+    def _get_state(self, project_id, wi_type, column):
+        row = self.conn.execute(
+            "SELECT %s FROM sync_state WHERE project_id=? AND type=?" %
+            column, (project_id, wi_type)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, project_id, wi_type, column, val):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO sync_state (project_id, type) "
+            "VALUES (?, ?)", (project_id, wi_type))
+        self.conn.execute(
+            "UPDATE sync_state SET %s=? WHERE project_id=? AND type=?" %
+            column, (val, project_id, wi_type))
+
+    def get_watermark(self, project_id, wi_type):
+        return self._get_state(project_id, wi_type, "watermark")
+
+    def set_watermark(self, project_id, wi_type, watermark):
+        self._set_state(project_id, wi_type, "watermark", watermark)
+
+    def get_reconciled(self, project_id, wi_type):
+        return self._get_state(project_id, wi_type, "reconciled")
+
+    def set_reconciled(self, project_id, wi_type, timestamp):
+        self._set_state(project_id, wi_type, "reconciled", timestamp)
+
+    def get_uris(self, project_id, wi_type):
+        return set(row[0] for row in self.conn.execute(
+            "SELECT uri FROM work_items WHERE project_id=? AND type=?",
+            (project_id, wi_type)))
+
+    def delete(self, uri):
+        for table in self.DETAIL_TABLES:
+            self.conn.execute("DELETE FROM %s WHERE uri=?" % table, (uri,))
+
+    def _save_wsdl(self, session):
+        """Saves the WSDL of the tracker service and the documents that it
+        imports, as they are read by a suds client.
+
+        Args:
+            session: the session whose server is mirrored
+
+        Returns:
+            None
+        """
+        url = session._url_for_name("Tracker")
+        transport = _RecordingTransport()
+        suds.client.Client(url, transport=transport, cache=None)
+        self.conn.execute("DELETE FROM wsdl_documents")
+        for doc_url, content in transport.documents.items():
+            self.conn.execute(
+                "INSERT INTO wsdl_documents (url, root, content) "
+                "VALUES (?, ?, ?)",
+                (doc_url, int(doc_url == url), sqlite3.Binary(content)))
+        self._factory = None
+
+    def _save_types(self, project_id, wi_type):
+        """Saves the custom field types of the work item type in the project
+        and the work item types of the server.
+
+        Args:
+            project_id: the project of the work items
+            wi_type: the work item type
+
+        Returns:
+            None
+        """
+        _WorkItem = self.import_work_item()._WorkItem
+        if not self._saved_types:
+            self._save_wsdl(_WorkItem.session)
+            self.conn.execute("DELETE FROM work_item_types")
+            for item in BasePolarion._cache["enums"]["workitem-type"][None]:
+                self.conn.execute(
+                    "INSERT INTO work_item_types (type, name) VALUES (?, ?)",
+                    (item.id, item.name))
+        self.conn.execute(
+            "DELETE FROM custom_field_types WHERE project_id=? AND type=?",
+            (project_id, wi_type))
+        for cft in _WorkItem.get_defined_custom_field_types(project_id,
+                                                            wi_type):
+            self.conn.execute(
+                "INSERT INTO custom_field_types (project_id, type, cft_id, "
+                "field_type, enum_id, required) VALUES (?, ?, ?, ?, ?, ?)",
+                (project_id, wi_type, cft.cft_id, cft.type,
+                 getattr(cft, "enum_id", None), int(bool(cft.required))))
+        self._schemas.pop((project_id, wi_type), None)
+        self._saved_types.add((project_id, wi_type))
+
+    def upsert_many(self, project_id, wi_type, work_items, fields):
+        if (project_id, wi_type) not in self._saved_types:
+            self._save_types(project_id, wi_type)
+        # the test steps are not returned by queries, so they are fetched
+        # together before the work items are stored.
+        if wi_type in self.TEST_STEP_TYPES and work_items:
+            _WorkItem = self.import_work_item()._WorkItem
+            if self._pool is None:
+                self._pool = SessionPool(self.concurrency)
+            _WorkItem.get_test_steps_many(work_items, pool=self._pool)
+        super(SqliteWorkItemStore, self).upsert_many(
+            project_id, wi_type, work_items, fields)
+
+    def upsert(self, project_id, wi_type, work_item, fields):
+        uri = work_item.uri
+        self.delete(uri)
+        suds_wi = work_item._suds_object
+        description = getattr(suds_wi, "description", None)
+        description = getattr(description, "content", None)
+        updated = getattr(suds_wi, "updated", None)
+        self.conn.execute(
+            "INSERT INTO work_items (uri, project_id, type, work_item_id, "
+            "title, status, updated, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (uri, project_id, wi_type, work_item.work_item_id,
+             work_item.title, work_item.status,
+             updated.isoformat() if updated else None,
+             json.dumps(suds_to_json(suds_wi))))
+        self.conn.execute(
+            "INSERT INTO work_items_fts (uri, title, description) "
+            "VALUES (?, ?, ?)", (uri, work_item.title, description))
+        # ArrayOf Polarion objects have a double list.
+        custom_fields = getattr(suds_wi, "customFields", None)
+        for custom in (custom_fields[0] if custom_fields else []):
+            self.conn.execute(
+                "INSERT INTO custom_fields (uri, key, value) "
+                "VALUES (?, ?, ?)",
+                (uri, custom.key, json.dumps(suds_to_json(custom.value))))
+        if wi_type in self.TEST_STEP_TYPES:
+            # kept by the work item when they were fetched by upsert_many
+            steps = work_item.get_test_steps()._suds_object.steps
+            for idx, step in enumerate(steps[0] if steps else []):
+                values = step.values[0] if step.values else []
+                self.conn.execute(
+                    "INSERT INTO test_steps (uri, step_index, step_values) "
+                    "VALUES (?, ?, ?)",
+                    (uri, idx, json.dumps([getattr(text, "content", None)
+                                           for text in values])))
+        for field_name, derived in [("linkedWorkItems", 0),
+                                    ("linkedWorkItemsDerived", 1)]:
+            links = getattr(suds_wi, field_name, None)
+            for link in (links[0] if links else []):
+                self.conn.execute(
+                    "INSERT INTO links (uri, role, target_uri, derived) "
+                    "VALUES (?, ?, ?, ?)",
+                    (uri, getattr(link.role, "id", None), link.workItemURI,
+                     derived))
+
+    def commit(self):
+        self.conn.commit()
+
+    @property
+    def factory(self):
+        """The suds factory of the saved WSDL of the tracker service, which
+        creates the mirrored objects without the server"""
+        if self._factory is None:
+            documents = dict(
+                (url, bytes(content)) for url, content in self.conn.execute(
+                    "SELECT url, content FROM wsdl_documents"))
+            row = self.conn.execute(
+                "SELECT url FROM wsdl_documents WHERE root=1").fetchone()
+            if not row:
+                raise PyleroLibException(
+                    "The mirror has no WSDL, it must be refreshed first")
+            self._factory = suds.client.Client(
+                row[0], transport=_StoredTransport(documents),
+                cache=None).factory
+        return self._factory
+
+    def _schema(self, cls, project_id):
+        """Returns the WorkItemSchema of the specific work item class in the
+        project, built from the saved custom field types."""
+        key = (project_id, cls._wi_type)
+        if key not in self._schemas:
+            from pylero.work_item import WorkItemSchema
+            cfts = [_CustomFieldType(*row) for row in self.conn.execute(
+                "SELECT cft_id, field_type, enum_id, required "
+                "FROM custom_field_types WHERE project_id=? AND type=?",
+                key)]
+            self._schemas[key] = WorkItemSchema(
+                project_id, cls._wi_type, cls._base_suds_map, cfts)
+        return self._schemas[key]
+
+    def import_work_item(self):
+        """Imports the work_item module (see lazy_import). The saved work
+        item types are used for its classes, when there are any, instead of
+        the types of the server.
+
+        Returns:
+            the work_item module
+        """
+        if "pylero.work_item" not in sys.modules:
+            types = [suds.sudsobject.Factory.object(
+                "EnumOption", {"id": wi_type, "name": name})
+                for wi_type, name in self.conn.execute(
+                    "SELECT type, name FROM work_item_types")]
+            enums = BasePolarion._cache["enums"]
+            if types and not enums.get("workitem-type"):
+                enums["workitem-type"] = {None: types}
+        return lazy_import("pylero.work_item")
+
+    def _wrap(self, project_id, wi_type, data):
+        # the specific class is used when it exists so that the custom fields
+        # are accessible as attributes.
+        work_item = self.import_work_item()
+        suds_wi = json_to_suds(json.loads(data), self.factory)
+        for cls in work_item._SpecificWorkItem.__subclasses__():
+            if cls._wi_type == wi_type:
+                # the schema of the mirror is used when the class doesn't
+                # have one for the project yet, so it isn't built from the
+                # server.
+                cls._schemas.setdefault((project_id, wi_type),
+                                        self._schema(cls, project_id))
+                wi = cls(project_id, suds_object=suds_wi)
+                break
+        else:
+            wi = work_item._WorkItem(project_id, suds_object=suds_wi)
+        # all the fields were mirrored, so none of them is loaded from the
+        # server (see _WorkItem._fault_in).
+        wi._loaded_fields = set(wi._cls_suds_map)
+        return wi
+
+    def query(self, where=None, parms=(), text=None, order_by="work_item_id",
+              limit=-1):
+        """Queries the mirrored work items.
+
+        Args:
+            where (str): SQL condition on the work_items table columns
+                         (uri, project_id, type, work_item_id, title, status,
+                         updated). The other tables can be used in sub
+                         queries, for example:
+                         "uri IN (SELECT uri FROM custom_fields WHERE
+                         key='caseimportance' AND value='\"high\"')"
+                         default: None
+            parms (tuple): parameters of the where condition
+            text (str): FTS5 full text query on the title and description
+                        default: None
+            order_by (str): SQL order by, default: work_item_id
+            limit (int): maximum number of results, -1 for no limit
+
+        Returns:
+            list of _WorkItem objects (of the specific type when it exists)
+        """
+        conditions = []
+        sql_parms = []
+        if where:
+            conditions.append("(%s)" % where)
+            sql_parms.extend(parms)
+        if text:
+            conditions.append("uri IN (SELECT uri FROM work_items_fts WHERE "
+                              "work_items_fts MATCH ?)")
+            sql_parms.append(text)
+        sql = "SELECT project_id, type, data FROM work_items"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if order_by:
+            sql += " ORDER BY " + order_by
+        sql += " LIMIT ?"
+        sql_parms.append(limit)
+        return [self._wrap(project_id, wi_type, data) for
+                project_id, wi_type, data in self.conn.execute(sql, sql_parms)]
+
+    def search(self, text, limit=-1):
+        """Full text search of the title and description of the mirrored work
+        items, ordered by relevance.
+
+        Args:
+            text: FTS5 query, for example: "kernel AND panic"
+            limit (int): maximum number of results, -1 for no limit
+
+        Returns:
+            list of _WorkItem objects (of the specific type when it exists)
+        """
+        return [self._wrap(project_id, wi_type, data)
+                for project_id, wi_type, data in self.conn.execute(
+                    "SELECT w.project_id, w.type, w.data "
+                    "FROM work_items_fts f "
+                    "JOIN work_items w ON w.uri = f.uri "
+                    "WHERE work_items_fts MATCH ? ORDER BY f.rank LIMIT ?",
+                    (text, limit))]
+
+    def get_test_steps(self, uri):
+        """Returns the mirrored test steps of a work item.
+
+        Args:
+            uri: the uri of the work item
+
+        Returns:
+            list of lists of the step values (step, expected result, ...)
+        """
+        return [json.loads(row[0]) for row in self.conn.execute(
+            "SELECT step_values FROM test_steps WHERE uri=? "
+            "ORDER BY step_index", (uri,))]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+        self.conn.close()
+
+
+class WorkItemMirror(object):
+    """Local SQLite mirror of the work items of a project, kept up to date
+    with WorkItemSync. All the work item fields, including all the custom
+    fields, are mirrored. The queries only read the mirror, so once it was
+    refreshed they don't need the server, except for the object fields of
+    the work items that are empty and have no id (for example an empty
+    description), whose empty object is created by the session.
+
+    Example:
+        mirror = WorkItemMirror("~/proj1.db", ["testcase", "requirement"])
+        mirror.refresh()
+        cases = mirror.query("type='testcase' AND status='approved'")
+        found = mirror.search("network AND bond*")
+
+    Attributes:
+        store (SqliteWorkItemStore)
+        sync (WorkItemSync)
+    """
+
+    def __init__(self, path, wi_types, project_id=None, query=None,
+                 reconcile_interval=3600):
+        """WorkItemMirror constructor
+
+        Args:
+            path: the SQLite database file
+            wi_types: list of work item types to mirror
+            project_id: the project to mirror, default project if None
+            query: Lucene query to restrict the mirrored work items.
+                   default: None
+            reconcile_interval (int): seconds between the checks for deleted
+                                      work items (see WorkItemSync).
+                                      default: 3600
+        """
+        self.store = SqliteWorkItemStore(path)
+        self._sync_args = (wi_types, project_id, query, reconcile_interval)
+        self._sync = None
+
+    @property
+    def sync(self):
+        # created when the mirror is refreshed, so that the queries of the
+        # mirror don't need the default project of the server.
+        if self._sync is None:
+            wi_types, project_id, query, reconcile_interval = \
+                self._sync_args
+            _WorkItem = self.store.import_work_item()._WorkItem
+            # "uri" is always returned and "_unresolved" is not a Polarion
+            # field
+            fields = [field for field in _WorkItem._cls_suds_map
+                      if field not in ["uri", "_unresolved"]]
+            self._sync = WorkItemSync(self.store, wi_types, project_id,
+                                      fields, query, reconcile_interval)
+        return self._sync
+
+    def refresh(self, reconcile=None):
+        """Brings the mirror up to date with the server.
+
+        Args:
+            reconcile (bool): see WorkItemSync.sync
+
+        Returns:
+            see WorkItemSync.sync
+        """
+        return self.sync.sync(reconcile)
+
+    def query(self, where=None, parms=(), text=None, order_by="work_item_id",
+              limit=-1):
+        """see SqliteWorkItemStore.query"""
+        return self.store.query(where, parms, text, order_by, limit)
+
+    def search(self, text, limit=-1):
+        """see SqliteWorkItemStore.search"""
+        return self.store.search(text, limit)
@@ -0,0 +1,310 @@
+# -*- coding: utf8 -*-
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+from pylero._compatible import ABC, basestring, object
+import abc
+import datetime
+import json
+import os
+import tempfile
+import time
+from pylero.base_polarion import BasePolarion, lazy_import
+from pylero.exceptions import PyleroLibException
+from pylero.text import Text
+
+
+def plain_value(val):
+    """Converts an attribute value of a Pylero object to a value that can be
+    stored locally (json/sql). Text objects are converted to their content,
+    objects with an id field to their id, dates to ISO format strings and
+    lists are converted item by item.
+
+    Args:
+        val: the attribute value
+
+    Returns:
+        str, int, float, bool, None or list of those
+    """
+    if val is None or isinstance(val, (basestring, bool, int, float)):
+        return val
+    if isinstance(val, (datetime.datetime, datetime.date)):
+        return val.isoformat()
+    if isinstance(val, Text):
+        return val.content
+    if isinstance(val, (list, tuple)):
+        return [plain_value(item) for item in val]
+    if isinstance(val, BasePolarion):
+        if val._id_field:
+            return getattr(val, val._id_field)
+        return dict((key, plain_value(getattr(val, key)))
+                    for key in val._cls_suds_map
+                    if not key.startswith("_"))
+    return "%s" % val
+
+
+class WorkItemStore(ABC):
+    """Base class of the local stores that WorkItemSync applies the changes
+    to. The sync state (the watermarks and the times of the deletion checks)
+    is kept in the watermarks and reconciled dicts, which the child class
+    saves in commit, or the child class overrides the state methods to keep
+    it in its own storage. The work items are stored by the child class.
+
+    Attributes:
+        watermarks (dict): "project/type" -> the high water mark of the last
+                           sync
+        reconciled (dict): "project/type" -> the time (seconds since the
+                           epoch) of the last deletion check
+    """
+
+    def __init__(self):
+        self.watermarks = {}
+        self.reconciled = {}
+
+    def get_watermark(self, project_id, wi_type):
+        """Returns the high water mark of the last sync or None if the
+        project/type was never synced."""
+        return self.watermarks.get("%s/%s" % (project_id, wi_type))
+
+    def set_watermark(self, project_id, wi_type, watermark):
+        """Saves the high water mark of the sync."""
+        self.watermarks["%s/%s" % (project_id, wi_type)] = watermark
+
+    def get_reconciled(self, project_id, wi_type):
+        """Returns the time (seconds since the epoch) of the last deletion
+        check or None if it was never done."""
+        return self.reconciled.get("%s/%s" % (project_id, wi_type))
+
+    def set_reconciled(self, project_id, wi_type, timestamp):
+        """Saves the time of the deletion check."""
+        self.reconciled["%s/%s" % (project_id, wi_type)] = timestamp
+
+    @abc.abstractmethod
+    def get_uris(self, project_id, wi_type):
+        """Returns the set of URIs stored for the project/type."""
+
+    @abc.abstractmethod
+    def upsert(self, project_id, wi_type, work_item, fields):
+        """Adds or replaces the stored work item.
+
+        Args:
+            project_id: the project the work item is in
+            wi_type: the type of the work item
+            work_item: the _WorkItem object that was returned by the query
+            fields: the field names that were populated in the work_item
+        """
+
+    def upsert_many(self, project_id, wi_type, work_items, fields):
+        """Adds or replaces the work items returned by a query. Stores that
+        need more than the queried fields can fetch them in bulk here.
+
+        Args:
+            project_id: the project the work items are in
+            wi_type: the type of the work items
+            work_items (list): the _WorkItem objects
+            fields: the field names that were populated in the work_items
+        """
+        for work_item in work_items:
+            self.upsert(project_id, wi_type, work_item, fields)
+
+    @abc.abstractmethod
+    def delete(self, uri):
+        """Removes the work item with the given URI from the store."""
+
+    @abc.abstractmethod
+    def commit(self):
+        """Persists the changes made since the last commit."""
+
+
+class JsonWorkItemStore(WorkItemStore):
+    """A WorkItemStore kept in a single json file. The work items are stored
+    as dicts of their plain field values (see plain_value)
+
+    Attributes:
+        path (str): the json file
+        items (dict): uri -> {"project_id", "type", "fields"}
+    """
+
+    def __init__(self, path):
+        super(JsonWorkItemStore, self).__init__()
+        self.path = os.path.expanduser(path)
+        self.items = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.watermarks = data["watermarks"]
+            self.reconciled = data["reconciled"]
+            self.items = data["items"]
+
+    def get_uris(self, project_id, wi_type):
+        return set(uri for uri, item in self.items.items()
+                   if item["project_id"] == project_id and
+                   item["type"] == wi_type)
+
+    def upsert(self, project_id, wi_type, work_item, fields):
+        self.items[work_item.uri] = {
+            "project_id": project_id,
+            "type": wi_type,
+            "fields": dict((field, plain_value(getattr(work_item, field)))
+                           for field in fields)}
+
+    def delete(self, uri):
+        self.items.pop(uri, None)
+
+    def commit(self):
+        # write to a temp file and rename it, so that a failure while writing
+        # does not corrupt the store.
+        dir_name = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=dir_name)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"watermarks": self.watermarks,
+                       "reconciled": self.reconciled,
+                       "items": self.items}, f)
+        os.rename(tmp_path, self.path)
+
+
+class WorkItemSync(object):
+    """Incrementally mirrors work items into a local WorkItemStore.
+
+    Each sync pass only queries the work items that were updated since the
+    high water mark of the previous pass (per project and work item type), so
+    the cost of a pass is proportional to the number of changes and not the
+    number of work items. Deleted work items can't be found by the updated
+    field, so once every reconcile_interval seconds the full set of URIs is
+    queried and the work items that no longer exist are deleted from the
+    store. The time of the last check is kept in the store, so the interval
+    is kept even when every pass is run by a new process.
+
+    Notes:
+        The watermark is the updated time of the last work item of the pass,
+        in UTC, in the WATERMARK_FORMAT format. The range of the query
+        includes it, so the work items updated in the second of the
+        watermark are queried again in the next pass, which is harmless
+        because the store replaces them.
+
+    Attributes:
+        store (WorkItemStore): the local store
+        project_id (str): the project to sync
+        wi_types (list): the work item types to sync
+        fields (list): the work item fields to sync
+        query (str): an optional Lucene query to restrict the synced items
+        reconcile_interval (int): seconds between deletion checks.
+                                  None disables the periodic check.
+    """
+    WATERMARK_FORMAT = "%Y%m%dT%H%M%S"
+    DEFAULT_FIELDS = ["work_item_id", "title", "type", "status", "updated"]
+
+    def __init__(self, store, wi_types, project_id=None, fields=None,
+                 query=None, reconcile_interval=3600):
+        """WorkItemSync constructor
+
+        Args:
+            store (WorkItemStore): the store to apply the changes to
+            wi_types: list of work item types (i.e. testcase, requirement)
+            project_id: the project to sync, default project if None
+            fields: list of work item fields to sync (custom fields of the
+                    specific type can be used). The work_item_id and updated
+                    fields are always synced. default: DEFAULT_FIELDS
+            query: Lucene query to restrict the synced work items.
+                   default: None
+            reconcile_interval (int): seconds between the deletion checks,
+                                      default: 3600
+        """
+        if isinstance(wi_types, basestring):
+            wi_types = [wi_types]
+        self.store = store
+        self.wi_types = wi_types
+        self.project_id = project_id or BasePolarion.default_project
+        self.fields = list(fields or self.DEFAULT_FIELDS)
+        for field in ["work_item_id", "updated"]:
+            if field not in self.fields:
+                self.fields.append(field)
+        self.query = query
+        self.reconcile_interval = reconcile_interval
+
+    @staticmethod
+    def _watermark(updated):
+        # the watermark of an updated time. Aware times are converted to UTC,
+        # naive times are taken as UTC.
+        if updated.tzinfo is not None and updated.utcoffset() is not None:
+            updated = (updated - updated.utcoffset()).replace(tzinfo=None)
+        return updated.strftime(WorkItemSync.WATERMARK_FORMAT)
+
+    def _query_cls(self, wi_type):
+        # the specific class is used when it exists, so that its custom
+        # fields can be requested.
+        work_item = lazy_import("pylero.work_item")
+        for cls in work_item._SpecificWorkItem.__subclasses__():
+            if cls._wi_type == wi_type:
+                return cls
+        raise PyleroLibException(
+            "{0} is not a valid work item type".format(wi_type))
+
+    def _base_query(self):
+        return "(%s)" % self.query if self.query else ""
+
+    def sync_type(self, wi_type, reconcile=None):
+        """Runs one sync pass of a single work item type
+
+        Args:
+            wi_type: the work item type to sync
+            reconcile (bool): force (True) or skip (False) the deletion check
+                              of the work items that no longer exist on the
+                              server. If None, it is done when
+                              reconcile_interval passed since the last check.
+                              default: None
+
+        Returns:
+            dict with the number of "updated" and "deleted" work items
+        """
+        cls = self._query_cls(wi_type)
+        watermark = self.store.get_watermark(self.project_id, wi_type)
+        reconciled = self.store.get_reconciled(self.project_id, wi_type)
+        now = time.time()
+        if reconcile is None:
+            reconcile = reconciled is not None and \
+                self.reconcile_interval is not None and \
+                now - reconciled >= self.reconcile_interval
+        query = self._base_query()
+        if watermark:
+            query += "%supdated:[%s TO *]" % (" AND " if query else "",
+                                              watermark)
+        work_items = cls.query(query, fields=self.fields, sort="updated",
+                               project_id=self.project_id)
+        self.store.upsert_many(self.project_id, wi_type, work_items,
+                               self.fields)
+        new_watermark = watermark
+        for wi in work_items:
+            if wi.updated:
+                updated = self._watermark(wi.updated)
+                if not new_watermark or updated > new_watermark:
+                    new_watermark = updated
+        deleted = 0
+        if reconcile:
+            server_uris = set(cls.query(self._base_query(), query_uris=True,
+                                        project_id=self.project_id))
+            for uri in self.store.get_uris(self.project_id, wi_type) - \
+                    server_uris:
+                self.store.delete(uri)
+                deleted += 1
+        if reconcile or not watermark:
+            # a pass without a watermark downloads all the work items, so it
+            # is as good as a deletion check.
+            self.store.set_reconciled(self.project_id, wi_type, now)
+        if new_watermark:
+            self.store.set_watermark(self.project_id, wi_type, new_watermark)
+        self.store.commit()
+        return {"updated": len(work_items), "deleted": deleted}
+
+    def sync(self, reconcile=None):
+        """Runs one sync pass of all the work item types.
+
+        Args:
+            reconcile (bool): force (True) or skip (False) the deletion check.
+                              see sync_type. default: None
+
+        Returns:
+            dict of wi_type -> dict with the number of "updated" and
+            "deleted" work items
+        """
+        return dict((wi_type, self.sync_type(wi_type, reconcile))
+                    for wi_type in self.wi_types)
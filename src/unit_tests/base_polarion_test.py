@@ -0,0 +1,144 @@
+import unittest2
+import re
+from suds.sudsobject import Factory
+from pylero.base_polarion import BasePolarion
+from pylero.exceptions import PyleroLibException
+from unit_tests.fakes import FakeClient, FakeSession
+
+URI = "subterra:data-service:objects:/default/proj1${Thing}%s"
+
+
+class FakeService(object):
+    """search function that applies the range of the key, the sort and the
+    limit like the server, instead of calling it"""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.calls = []
+
+    def searchThings(self, query, sort, fields, limit):
+        self.calls.append((query, sort, fields, limit))
+        ids = self.ids
+        match = re.search(r'id:\{"(.*)" TO \*\}', query)
+        if match:
+            ids = [thing_id for thing_id in ids if thing_id > match.group(1)]
+        if sort == "id":
+            ids = sorted(ids)
+        return [Factory.object("Thing", {"id": thing_id,
+                                         "_uri": URI % thing_id})
+                for thing_id in ids[:limit if limit != -1 else None]]
+
+
+class Thing(BasePolarion):
+    _cls_suds_map = {"thing_id": "id",
+                     "uri": "_uri"}
+    _id_field = "thing_id"
+    _search_spec = {"client": "thing_client",
+                    "function": "searchThings",
+                    "fields": "always",
+                    "limit": "always",
+                    "parms": ["query", "sort", "fields", "limit"],
+                    "sort_attrs": True,
+                    "key": "thing_id"}
+
+
+class UnkeyedThing(Thing):
+    _search_spec = dict(Thing._search_spec, key=None)
+
+
+class ProjectThing(Thing):
+    """Thing whose fields depend on its project, like TestRun"""
+    _shared_properties = True
+    _project_maps = {
+        "proj1": dict(Thing._cls_suds_map,
+                      color={"field_name": "color", "is_custom": True}),
+        "proj2": Thing._cls_suds_map}
+
+    def __init__(self, project_id, suds_object=None):
+        self._cls_suds_map = self._project_maps[project_id]
+        super(ProjectThing, self).__init__(suds_object=suds_object)
+
+
+ProjectThing._add_properties(ProjectThing._project_maps["proj1"])
+
+
+class SearchTest(unittest2.TestCase):
+    """These tests do not use the server"""
+    IDS = ["c", "a", "e", "b", "d", "f"]
+
+    def setUp(self):
+        self.session = FakeSession(
+            thing_client=FakeClient(FakeService(self.IDS)))
+        BasePolarion._thread_sessions.session = self.session
+
+    def tearDown(self):
+        BasePolarion._thread_sessions.session = None
+
+    def _calls(self):
+        return self.session.thing_client.service.calls
+
+    def test_001_pages(self):
+        """This test does the following:
+        * searches with pages that end exactly at the last result
+        * verifies that every result is returned once and in order
+        * verifies the range query of every page
+        """
+        things = Thing._search("type:thing", fields=["thing_id"],
+                               page_size=3)
+        self.assertEqual([thing.thing_id for thing in things],
+                         ["a", "b", "c", "d", "e", "f"])
+        self.assertEqual([call[0] for call in self._calls()],
+                         ["type:thing",
+                          '(type:thing) AND id:{"c" TO *}',
+                          '(type:thing) AND id:{"f" TO *}'])
+        self.assertEqual(self._calls()[0][1:], ("id", ["id"], 3))
+
+    def test_002_pages_limit(self):
+        """This test does the following:
+        * searches with a limit that ends in the middle of a page
+        * verifies that the limit is kept and the last page is smaller
+        """
+        uris = list(Thing._search("", limit=4, query_uris=True,
+                                  page_size=3))
+        self.assertEqual(uris, [URI % thing_id for thing_id in "abcd"])
+        self.assertEqual([call[0] for call in self._calls()],
+                         ["", 'id:{"c" TO *}'])
+        self.assertEqual([call[3] for call in self._calls()], [3, 1])
+
+    def test_003_no_key(self):
+        """This test does the following:
+        * searches a type without a paging key with a page size
+        * verifies that a PyleroLibException is raised and nothing is
+          fetched
+        * verifies that the search without a page size fetches all the
+          results with one call, in the order of the sort that was given
+        """
+        with self.assertRaises(PyleroLibException):
+            UnkeyedThing._search("type:thing", sort="title", page_size=2)
+        self.assertEqual(self._calls(), [])
+        things = UnkeyedThing._search("type:thing", sort="title")
+        self.assertEqual([thing.thing_id for thing in things], self.IDS)
+        self.assertEqual(self._calls(), [("type:thing", "title", [], -1)])
+
+
+class CustomFieldTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def test_001_other_project(self):
+        """This test does the following:
+        * creates an object of a project that doesn't have a custom field
+          that the class has a property of
+        * verifies that the field is None and that setting it raises a
+          PyleroLibException
+        """
+        thing = ProjectThing("proj2", Factory.object(
+            "Thing", {"id": "a", "_uri": URI % "a"}))
+        self.assertTrue(hasattr(ProjectThing, "color"))
+        self.assertEqual(thing.thing_id, "a")
+        self.assertIsNone(thing.color)
+        with self.assertRaises(PyleroLibException):
+            thing.color = "red"
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,211 @@
+"""Fakes shared by the tests that do not use the server"""
+import os
+import sys
+from suds.sudsobject import Factory
+from pylero.base_polarion import BasePolarion
+
+PROJECT_ID = "proj1"
+URI_STRUCT = "subterra:data-service:objects:/default/%s${%s}%s"
+
+
+def uri(obj, obj_id, project_id=PROJECT_ID):
+    """Returns the uri of a Polarion object, for example a WorkItem"""
+    return URI_STRUCT % (project_id, obj, obj_id)
+
+
+class FakeServer(object):
+    """Server that the sessions use"""
+    url = "https://polarion.example.com/polarion"
+    timeout = 30
+
+
+class FakeSession(object):
+    """Session that records its clones, log outs and transactions, instead
+    of connecting to the server. Clones that share the login share the
+    transaction, like the clones of Session. Keyword arguments are set as
+    attributes (for example the WSDL clients) and are shared by the clones.
+    """
+    default_project = PROJECT_ID
+    user_id = "user1"
+
+    def __init__(self, parent=None, share_login=True, **attrs):
+        self.parent = parent
+        self.share_login = share_login
+        self.clones = []
+        self.logged_out = False
+        self._attrs = attrs
+        self.__dict__.update(attrs)
+        # the session whose transaction is used
+        self._tx_session = parent._tx_session if parent and share_login \
+            else self
+        self._tx_open = False
+        # "begin", "commit" and "rollback" in the order they were called
+        self.tx_log = []
+
+    def clone(self, share_login=True):
+        session = FakeSession(self, share_login, **self._attrs)
+        self.clones.append(session)
+        return session
+
+    def _logout(self):
+        self.logged_out = True
+
+    def tx_in(self):
+        return self._tx_session._tx_open
+
+    def _tx_event(self, event):
+        self._tx_session._tx_open = event == "begin"
+        self._tx_session.tx_log.append(event)
+
+    def tx_begin(self):
+        self._tx_event("begin")
+
+    def tx_commit(self):
+        self._tx_event("commit")
+
+    def tx_rollback(self):
+        self._tx_event("rollback")
+
+
+class FakeClient(object):
+    """WSDL client whose service is a fake service, for example an object
+    whose functions record their calls. Keyword arguments are set as
+    attributes (for example last_reply)."""
+
+    def __init__(self, service, **attrs):
+        self.service = service
+        self.__dict__.update(attrs)
+
+
+class FakeCustomFieldType(object):
+    """custom field type of a work item type, like the ones that the tracker
+    service returns"""
+
+    def __init__(self, cft_id, cft_type, enum_id=None, required=False):
+        self.cft_id = cft_id
+        self.type = cft_type
+        self.enum_id = enum_id
+        self.required = required
+
+
+class FakeRecord(object):
+    """test record with the fields that the publishers use"""
+
+    def __init__(self, test_case_id, result=None):
+        self.test_case_id = test_case_id
+        self.result = result
+        self.defect_case_id = None
+
+
+class FakeTestRun(object):
+    """Test run that keeps its records locally, instead of on the server.
+
+    Args:
+        existing: the test case ids of the records that the run already has
+        fail_adds: the add_test_records calls (starting at 1) that fail
+        partial (bool): the failed calls add their first record before they
+                        fail, default: they add nothing
+        error: the error raised when the status change is deferred, for
+               example when the run is used in a with block
+    """
+    uri = URI_STRUCT % (PROJECT_ID, "TestRun", "run1")
+    project_id = PROJECT_ID
+    logged_in_user_id = "user1"
+
+    def __init__(self, existing=(), fail_adds=(), partial=False, error=None):
+        self.positions = dict((case_id, idx)
+                              for idx, case_id in enumerate(existing))
+        self.records = {}
+        self.incidents = []
+        self.add_calls = 0
+        self.fail_adds = fail_adds
+        self.partial = partial
+        self.error = error
+        self._deferred_status = None
+        self.status_changes = 0
+
+    def _verify_obj(self):
+        pass
+
+    def defer_status_change(self):
+        if self.error:
+            raise self.error
+        self._deferred_status = {}
+
+    def flush_status_change(self):
+        self.status_changes += 1
+
+    def __enter__(self):
+        self.defer_status_change()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush_status_change()
+        self._deferred_status = None
+
+    def _get_record_index(self):
+        return {"positions": self.positions}
+
+    def create_incident_reports(self, test_records, concurrency=4):
+        for rec in test_records:
+            if rec.result == "failed" and not rec.defect_case_id:
+                self.incidents.append(rec.test_case_id)
+                rec.defect_case_id = "INC-%s" % len(self.incidents)
+
+    def add_test_records(self, test_records, concurrency=4):
+        self.add_calls += 1
+        fail = self.add_calls in self.fail_adds
+        if fail:
+            test_records = test_records[:1] if self.partial else []
+        self.create_incident_reports(test_records)
+        for rec in test_records:
+            self.positions[rec.test_case_id] = len(self.positions)
+            self.records[rec.test_case_id] = rec
+        if fail:
+            raise RuntimeError("add failed")
+
+    def update_test_record_by_object(self, test_case_id, test_record):
+        self.records[test_case_id] = test_record
+
+
+def import_work_item(wi_types=None):
+    """Imports the work_item module. When it is imported, it connects to the
+    server and creates a class for each work item type. The types are given
+    instead, and a FakeSession is used for the import.
+
+    Args:
+        wi_types (dict): work item type id -> name, default: Test Case
+
+    Returns:
+        the work_item module
+    """
+    if "pylero.work_item" in sys.modules:
+        return sys.modules["pylero.work_item"]
+    wi_types = wi_types or {"testcase": "Test Case"}
+    enums = BasePolarion._cache["enums"]
+    prev_types = enums.get("workitem-type")
+    enums["workitem-type"] = {None: [
+        Factory.object("EnumOption", {"id": wi_type, "name": name})
+        for wi_type, name in wi_types.items()]}
+    # the module reads the configuration, which requires a server
+    environ = dict(os.environ)
+    os.environ.update({"POLARION_URL": "https://polarion.example.com",
+                       "POLARION_REPO": "https://polarion.example.com/repo",
+                       "POLARION_USERNAME": "user1",
+                       "POLARION_PASSWORD": "password",
+                       "POLARION_PROJECT": PROJECT_ID,
+                       "POLARION_TIMEOUT": "120"})
+    thread_sessions = BasePolarion._thread_sessions
+    prev_session = getattr(thread_sessions, "session", None)
+    thread_sessions.session = FakeSession()
+    try:
+        import pylero.work_item
+    finally:
+        thread_sessions.session = prev_session
+        os.environ.clear()
+        os.environ.update(environ)
+        if prev_types is None:
+            enums.pop("workitem-type", None)
+        else:
+            enums["workitem-type"] = prev_types
+    return pylero.work_item
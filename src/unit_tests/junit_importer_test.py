@@ -0,0 +1,134 @@
+import unittest2
+import json
+import os
+import shutil
+import tempfile
+from xml.etree import ElementTree
+from pylero.exceptions import PyleroLibException
+from pylero.junit_importer import JUnitImporter
+from pylero.junit_importer import property_rule
+from pylero.junit_importer import regex_rule
+from unit_tests.fakes import FakeRecord, FakeTestRun
+
+JUNIT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuites>
+ <testsuite name="suite1">
+  <testcase classname="tests.a" name="test_PROJ-1" time="1.5"/>
+  <testcase classname="tests.a" name="test_PROJ-2">
+   <failure message="assert 1 == 2"/>
+  </testcase>
+  <testcase classname="tests.a" name="test_other"/>
+  <testcase classname="tests.b" name="test_PROJ-1">
+   <skipped/>
+  </testcase>
+  <testcase classname="tests.b" name="test_PROJ-3">
+   <error>timeout</error>
+  </testcase>
+  <testcase classname="tests.b" name="test_PROJ-4"/>
+ </testsuite>
+</testsuites>
+"""
+
+
+class FakeImporter(JUnitImporter):
+    def _build_record(self, test_case_id, testcase):
+        rec = FakeRecord(test_case_id)
+        rec.result, rec.comment = self._result(testcase)
+        rec.duration = testcase.get("time") or "0"
+        return rec
+
+
+class JUnitImporterTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "results.xml")
+        with open(self.path, "w") as f:
+            f.write(JUNIT)
+        self.checkpoint = os.path.join(self.tmp_dir, "run1.checkpoint")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_001_rules(self):
+        """This test does the following:
+        * verifies the test case id of the property rule
+        * verifies the test case id of the regex rule, with and without a
+          group
+        """
+        testcase = ElementTree.fromstring(
+            '<testcase classname="tests.a" name="test_x"><properties>'
+            '<property name="polarion-testcase-id" value="PROJ-7"/>'
+            '</properties></testcase>')
+        self.assertEqual(property_rule()(testcase), "PROJ-7")
+        self.assertIsNone(property_rule("other")(testcase))
+        self.assertEqual(regex_rule(r"tests\.(\w)")(testcase), "a")
+        self.assertEqual(regex_rule(r"test_\w")(testcase), "test_x")
+        self.assertIsNone(regex_rule(r"PROJ-\d+")(testcase))
+
+    def test_002_run(self):
+        """This test does the following:
+        * imports the file in one batch
+        * verifies the results, the merge of the duplicate test case and
+          the incident reports of the failed records
+        * verifies that the status was changed once
+        """
+        test_run = FakeTestRun()
+        stats = FakeImporter(test_run, r"PROJ-\d+").run(self.path)
+        self.assertEqual(stats, {"added": 4, "updated": 0, "unmapped": 1,
+                                 "resumed": 0})
+        self.assertEqual(
+            dict((test_case_id, rec.result)
+                 for test_case_id, rec in test_run.records.items()),
+            {"PROJ-1": "blocked", "PROJ-2": "failed", "PROJ-3": "failed",
+             "PROJ-4": "passed"})
+        self.assertEqual(test_run.records["PROJ-1"].duration, "0")
+        self.assertEqual(test_run.records["PROJ-2"].comment, "assert 1 == 2")
+        self.assertEqual(test_run.records["PROJ-3"].comment, "timeout")
+        self.assertEqual(sorted(test_run.incidents), ["PROJ-2", "PROJ-3"])
+        self.assertEqual(test_run.status_changes, 1)
+        self.assertIsNone(test_run._deferred_status)
+
+    def test_003_resume(self):
+        """This test does the following:
+        * imports the file in batches of 2, failing to add the second batch
+        * verifies the checkpoint and the incident report it keeps
+        * resumes the import with a new importer
+        * verifies that the published testcases were skipped, no incident
+          report was created twice and the checkpoint was removed
+        """
+        test_run = FakeTestRun(fail_adds=[2])
+        importer = FakeImporter(test_run, r"PROJ-\d+", batch_size=2,
+                                checkpoint_path=self.checkpoint)
+        with self.assertRaises(RuntimeError):
+            importer.run(self.path)
+        with open(self.checkpoint) as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint["processed"], 2)
+        self.assertEqual(checkpoint["incidents"], {"PROJ-3": "INC-2"})
+        self.assertEqual(test_run.incidents, ["PROJ-2", "PROJ-3"])
+        stats = FakeImporter(test_run, r"PROJ-\d+", batch_size=2,
+                             checkpoint_path=self.checkpoint).run(self.path)
+        self.assertEqual(stats, {"added": 2, "updated": 1, "unmapped": 1,
+                                 "resumed": 2})
+        self.assertEqual(test_run.incidents, ["PROJ-2", "PROJ-3"])
+        self.assertEqual(test_run.records["PROJ-3"].defect_case_id, "INC-2")
+        self.assertEqual(test_run.records["PROJ-1"].result, "blocked")
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_004_checkpoint_of_another_import(self):
+        """This test does the following:
+        * writes a checkpoint of another file
+        * verifies that the import refuses to use it
+        """
+        with open(self.checkpoint, "w") as f:
+            json.dump({"test_run": FakeTestRun.uri, "file": "/other.xml",
+                       "processed": 1}, f)
+        with self.assertRaises(PyleroLibException):
+            FakeImporter(FakeTestRun(), r"PROJ-\d+",
+                         checkpoint_path=self.checkpoint).run(self.path)
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,108 @@
+import unittest2
+from pylero.base_polarion import BasePolarion
+from pylero.result_publisher import ResultPublisher
+from unit_tests.fakes import FakeRecord, FakeSession, FakeTestRun
+
+
+class FakePublisher(ResultPublisher):
+    RETRY_DELAY = 0
+
+    def __init__(self, runs, **kwargs):
+        super(FakePublisher, self).__init__(project_id="proj1", **kwargs)
+        self.runs = runs
+
+    def _load_run(self, run_id):
+        return self.runs[run_id]
+
+    def _build_record(self, test_run, result):
+        return FakeRecord(result["test_case_id"], result["result"])
+
+
+class ResultPublisherTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        self.session = FakeSession()
+        BasePolarion._thread_sessions.session = self.session
+
+    def tearDown(self):
+        BasePolarion._thread_sessions.session = None
+
+    def test_001_group(self):
+        """This test does the following:
+        * groups results with a test case that has 2 results
+        * verifies that the last result is kept, in the position of the
+          last result
+        """
+        records = FakePublisher({})._group(None, [
+            {"test_case_id": "PROJ-1", "result": "failed"},
+            {"test_case_id": "PROJ-2", "result": "passed"},
+            {"test_case_id": "PROJ-1", "result": "passed"}])
+        self.assertEqual([(rec.test_case_id, rec.result) for rec in records],
+                         [("PROJ-2", "passed"), ("PROJ-1", "passed")])
+
+    def test_002_publish(self):
+        """This test does the following:
+        * publishes the results of 2 runs, one with an existing record
+        * verifies the records that were added and updated and the summary,
+          with the test cases that were published
+        * verifies that the status of every run was changed once
+        * verifies that the sessions of the pool were logged out
+        """
+        runs = {"run1": FakeTestRun(),
+                "run2": FakeTestRun(existing=["PROJ-1"])}
+        summary = FakePublisher(runs, workers=2).publish({
+            "run1": [{"test_case_id": "PROJ-1", "result": "passed"},
+                     {"test_case_id": "PROJ-2", "result": "failed"}],
+            "run2": [{"test_case_id": "PROJ-1", "result": "failed"},
+                     {"test_case_id": "PROJ-3", "result": "passed"}]})
+        self.assertEqual(summary["failed_runs"], [])
+        self.assertEqual(summary["records"], 4)
+        for run_id, added, updated in [("run1", 2, 0), ("run2", 1, 1)]:
+            stats = summary["runs"][run_id]
+            self.assertEqual((stats["added"], stats["updated"],
+                              stats["attempts"], stats["error"]),
+                             (added, updated, 1, None))
+            self.assertEqual(runs[run_id].status_changes, 1)
+        self.assertEqual(summary["runs"]["run1"]["published"],
+                         ["PROJ-1", "PROJ-2"])
+        self.assertEqual(summary["runs"]["run2"]["published"],
+                         ["PROJ-3", "PROJ-1"])
+        self.assertEqual(runs["run1"].incidents, ["PROJ-2"])
+        self.assertEqual(runs["run2"].incidents, ["PROJ-1"])
+        self.assertEqual(runs["run2"].records["PROJ-1"].defect_case_id,
+                         "INC-1")
+        self.assertTrue(self.session.clones)
+        self.assertTrue(all(session.logged_out
+                            for session in self.session.clones))
+
+    def test_003_retry(self):
+        """This test does the following:
+        * publishes a run that fails once and a run that always fails
+        * verifies that the first run was published by the retry, with the
+          records added by the failed attempt updated and no incident
+          report created twice
+        * verifies that the second run is reported as failed after the
+          retries, without published test cases
+        """
+        runs = {"run1": FakeTestRun(fail_adds=[1], partial=True),
+                "run2": FakeTestRun(error=RuntimeError("no access"))}
+        results = [{"test_case_id": "PROJ-1", "result": "failed"},
+                   {"test_case_id": "PROJ-2", "result": "failed"}]
+        summary = FakePublisher(runs, workers=2, retries=2).publish(
+            {"run1": results, "run2": results})
+        self.assertEqual(summary["failed_runs"], ["run2"])
+        stats = summary["runs"]["run1"]
+        self.assertEqual((stats["added"], stats["updated"],
+                          stats["attempts"], stats["error"]), (1, 1, 2, None))
+        self.assertEqual(runs["run1"].incidents, ["PROJ-1", "PROJ-2"])
+        self.assertEqual(runs["run1"].records["PROJ-2"].defect_case_id,
+                         "INC-2")
+        stats = summary["runs"]["run2"]
+        self.assertEqual(stats["attempts"], 3)
+        self.assertEqual(stats["error"], "RuntimeError: no access")
+        self.assertEqual(stats["published"], [])
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,106 @@
+import unittest2
+import os
+import shutil
+import tempfile
+from pylero.base_polarion import BasePolarion
+from pylero.revision_cache import RevisionCache
+from unit_tests.fakes import FakeClient, FakeServer, FakeSession
+
+REPLY = b"<Envelope>revision 10</Envelope>"
+
+
+class FakeService(object):
+    """WSDL service that records its calls, instead of calling the server"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def getWorkItemByUriInRevision(self, *parms, **kwargs):
+        self.calls.append((parms, kwargs))
+        if isinstance(self.result, Exception):
+            raise self.result
+        if "__inject" in kwargs:
+            return "parsed %s" % kwargs["__inject"]["reply"].decode("utf-8")
+        return self.result
+
+
+class FakeUnresolvable(object):
+    _unresolvable = True
+
+
+class RevisionCacheTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        BasePolarion._thread_sessions.session = None
+        shutil.rmtree(self.cache_dir)
+
+    def _session(self, result, reply=REPLY):
+        return FakeSession(
+            revision_cache=RevisionCache(self.cache_dir),
+            tracker_client=FakeClient(FakeService(result), last_reply=reply),
+            _server=FakeServer())
+
+    def _call(self, session):
+        BasePolarion._thread_sessions.session = session
+        return BasePolarion._pinned_call("getWorkItemByUriInRevision",
+                                         ["uri1", "10"])
+
+    def test_001_put_get(self):
+        """This test does the following:
+        * verifies that an unknown key is not found
+        * stores 2 identical responses under 2 keys
+        * verifies that both are returned and the content is stored once
+        """
+        cache = RevisionCache(self.cache_dir)
+        key1 = cache.key("server", "getWorkItemByUri", ["uri1", "10"])
+        key2 = cache.key("server", "getWorkItemByUri", ["uri1", "11"])
+        self.assertNotEqual(key1, key2)
+        self.assertIsNone(cache.get(key1))
+        cache.put(key1, REPLY)
+        cache.put(key2, REPLY.decode("utf-8"))
+        self.assertEqual(cache.get(key1), REPLY)
+        self.assertEqual(cache.get(key2), REPLY)
+        objects = []
+        for _, _, files in os.walk(os.path.join(self.cache_dir,
+                                                RevisionCache.OBJECTS_DIR)):
+            objects += files
+        self.assertEqual(len(objects), 1)
+
+    def test_002_pinned_call_replay(self):
+        """This test does the following:
+        * calls a pinned function, which is sent to the server
+        * calls it again with a new session
+        * verifies that the raw reply of the first call was injected
+        """
+        session = self._session("result")
+        self.assertEqual(self._call(session), "result")
+        session2 = self._session("result2")
+        self.assertEqual(self._call(session2),
+                         "parsed %s" % REPLY.decode("utf-8"))
+        calls = session2.tracker_client.service.calls
+        self.assertEqual(calls[0][0], ("uri1", "10"))
+        self.assertEqual(calls[0][1]["__inject"]["reply"], REPLY)
+
+    def test_003_pinned_call_not_cached(self):
+        """This test does the following:
+        * calls a pinned function that fails, that returns an unresolvable
+          object and that has no reply
+        * verifies that none of them was cached
+        """
+        with self.assertRaises(ValueError):
+            self._call(self._session(ValueError("fault")))
+        self._call(self._session(FakeUnresolvable()))
+        self._call(self._session("result", reply=None))
+        session = self._session("result")
+        self.assertEqual(self._call(session), "result")
+        self.assertNotIn("__inject",
+                         session.tracker_client.service.calls[0][1])
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,72 @@
+import unittest2
+import threading
+from pylero.base_polarion import BasePolarion
+from pylero.session_pool import SessionPool
+from unit_tests.fakes import FakeSession
+
+
+class SessionPoolTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        self.session = FakeSession()
+        BasePolarion._thread_sessions.session = self.session
+
+    def tearDown(self):
+        BasePolarion._thread_sessions.session = None
+
+    def _map(self, pool):
+        started = []
+        cond = threading.Condition()
+
+        def current_session(item):
+            # the first 2 items wait for each other, so that both threads
+            # get a session
+            with cond:
+                started.append(item)
+                cond.notify_all()
+                if len(started) < 2:
+                    cond.wait(5)
+            return BasePolarion._thread_sessions.session
+        return pool.map(current_session, range(4))
+
+    def test_001_map(self):
+        """This test does the following:
+        * maps items with a pool of 2 threads
+        * verifies that the items ran with the cloned sessions
+        * verifies that the thread session was restored
+        """
+        sessions = self._map(SessionPool(2))
+        self.assertEqual(len(self.session.clones), 2)
+        self.assertTrue(all(session in self.session.clones
+                            for session in sessions))
+        self.assertIs(BasePolarion._thread_sessions.session, self.session)
+
+    def test_002_close_logout(self):
+        """This test does the following:
+        * maps items with a pool of sessions that log in separately, as a
+          context manager
+        * verifies that the sessions were logged out when the pool was
+          closed
+        """
+        with SessionPool(2, share_login=False) as pool:
+            self._map(pool)
+            self.assertFalse(any(session.logged_out
+                                 for session in self.session.clones))
+        self.assertEqual(len(self.session.clones), 2)
+        self.assertTrue(all(not session.share_login and session.logged_out
+                            for session in self.session.clones))
+
+    def test_003_close_shared(self):
+        """This test does the following:
+        * maps items with a pool of sessions that share the login
+        * verifies that close does not log out the shared login
+        """
+        with SessionPool(2) as pool:
+            self._map(pool)
+        self.assertFalse(any(session.logged_out
+                             for session in self.session.clones))
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,181 @@
+import unittest2
+import base64
+import os
+import shutil
+import requests
+import tempfile
+from suds import WebFault
+from pylero.session import _Base64Envelope
+from pylero.session import _SudsClientWrapper
+from unit_tests.fakes import FakeServer, FakeSession
+
+PREFIX = b"<Envelope><content>"
+SUFFIX = b"</content></Envelope>"
+WSDL = """<?xml version="1.0" encoding="UTF-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/"
+ xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+ xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:tns="urn:t"
+ targetNamespace="urn:t">
+ <types><xsd:schema targetNamespace="urn:t" elementFormDefault="qualified">
+  <xsd:element name="upload"><xsd:complexType><xsd:sequence>
+   <xsd:element name="name" type="xsd:string"/>
+   <xsd:element name="content" type="xsd:base64Binary"/>
+  </xsd:sequence></xsd:complexType></xsd:element>
+  <xsd:element name="uploadResponse"><xsd:complexType><xsd:sequence>
+   <xsd:element name="result" type="xsd:string"/>
+  </xsd:sequence></xsd:complexType></xsd:element>
+ </xsd:schema></types>
+ <message name="uploadRequest">
+  <part name="parameters" element="tns:upload"/></message>
+ <message name="uploadResponse">
+  <part name="parameters" element="tns:uploadResponse"/></message>
+ <portType name="P"><operation name="upload">
+  <input message="tns:uploadRequest"/>
+  <output message="tns:uploadResponse"/></operation></portType>
+ <binding name="B" type="tns:P">
+  <soap:binding style="document"
+   transport="http://schemas.xmlsoap.org/soap/http"/>
+  <operation name="upload"><soap:operation soapAction="urn:upload"/>
+   <input><soap:body use="literal"/></input>
+   <output><soap:body use="literal"/></output></operation></binding>
+ <service name="S"><port name="p" binding="tns:B">
+  <soap:address location="http://localhost:1/"/></port></service>
+</definitions>"""
+REPLY = b"""<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+ <soapenv:Body><uploadResponse xmlns="urn:t"><result>ok</result>
+ </uploadResponse></soapenv:Body></soapenv:Envelope>"""
+FAULT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+ <soapenv:Body><soapenv:Fault><faultcode>soapenv:Server</faultcode>
+ <faultstring>no space left</faultstring></soapenv:Fault>
+ </soapenv:Body></soapenv:Envelope>"""
+
+
+class FakeResponse(object):
+    reason = "reason"
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.reason)
+
+
+class FakeHttpSession(object):
+    """Reads the posted data, instead of sending it to the server"""
+
+    def __init__(self, response):
+        self.response = response
+        self.posts = []
+
+    def post(self, url, data, headers, timeout):
+        self.posts.append((url, len(data), data.read(), headers))
+        return self.response
+
+
+class SessionTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _file(self, size):
+        path = os.path.join(self.tmp_dir, "file%s" % size)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        with open(path, "rb") as f:
+            return path, PREFIX + base64.b64encode(f.read()) + SUFFIX
+
+    def test_001_envelope(self):
+        """This test does the following:
+        * creates envelopes of files of several sizes, that are encoded in
+          several chunks
+        * verifies that the envelope and its length are the prefix, the
+          base64 encoded file and the suffix
+        """
+        for size in [0, 1, 2, 3, 10, 11, 12, 1000]:
+            path, expected = self._file(size)
+            envelope = _Base64Envelope(PREFIX, path, SUFFIX)
+            envelope.CHUNK_SIZE = 3 * 4
+            self.assertEqual(len(envelope), len(expected))
+            self.assertEqual(envelope.read(), expected)
+            self.assertEqual(envelope.read(), b"")
+
+    def test_002_envelope_read_size(self):
+        """This test does the following:
+        * reads envelopes with several read sizes, smaller and larger than
+          the chunks
+        * verifies that every read returns size bytes until the end and that
+          they make up the envelope
+        """
+        path, expected = self._file(1000)
+        for size in [1, 5, 12, 100, 5000]:
+            envelope = _Base64Envelope(PREFIX, path, SUFFIX)
+            envelope.CHUNK_SIZE = 3 * 4
+            parts = []
+            while True:
+                part = envelope.read(size)
+                if not part:
+                    break
+                self.assertEqual(len(part),
+                                 min(size, len(expected) - len(b"".join(
+                                     parts))))
+                parts.append(part)
+            self.assertEqual(b"".join(parts), expected)
+
+    def _client(self, status_code, content):
+        wsdl_path = os.path.join(self.tmp_dir, "test.wsdl")
+        with open(wsdl_path, "w") as f:
+            f.write(WSDL)
+        session = FakeSession(
+            http_session=FakeHttpSession(FakeResponse(status_code, content)),
+            _session_id_header=None, _server=FakeServer())
+        client = _SudsClientWrapper("file://%s" % wsdl_path, session, 30)
+        return client, session.http_session.posts
+
+    def test_003_call_with_file(self):
+        """This test does the following:
+        * calls a WSDL function with call_with_file
+        * verifies that the posted envelope has the base64 encoded file in
+          place of the last parameter, with the length of the envelope
+        * verifies that the reply was parsed
+        """
+        client, posts = self._client(200, REPLY)
+        path, expected = self._file(1000)
+        self.assertEqual(client.call_with_file("upload", path, "file1"),
+                         "ok")
+        url, length, data, headers = posts[0]
+        self.assertEqual(url, "http://localhost:1/")
+        # suds-py3 quotes the soap action of the WSDL, suds 1.x doesn't
+        self.assertEqual(headers["SOAPAction"].strip('"'), "urn:upload")
+        self.assertEqual(length, len(data))
+        content = expected[len(PREFIX):-len(SUFFIX)]
+        self.assertIn(b">file1<", data)
+        self.assertIn(b">" + content + b"<", data)
+
+    def test_004_call_with_file_errors(self):
+        """This test does the following:
+        * calls a WSDL function with call_with_file, that returns a SOAP
+          fault, an HTTP error and no content
+        * verifies that the fault is raised as a WebFault, the HTTP error as
+          an HTTPError and that no content returns None
+        """
+        path, _ = self._file(10)
+        client, _ = self._client(500, FAULT)
+        with self.assertRaises(WebFault) as cm:
+            client.call_with_file("upload", path, "file1")
+        self.assertEqual(cm.exception.fault.faultstring, "no space left")
+        client, _ = self._client(503, b"")
+        with self.assertRaises(requests.HTTPError):
+            client.call_with_file("upload", path, "file1")
+        client, _ = self._client(204, b"")
+        self.assertIsNone(client.call_with_file("upload", path, "file1"))
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,111 @@
+import unittest2
+from suds.sudsobject import Factory
+from pylero.base_polarion import BasePolarion
+from unit_tests.fakes import FakeSession, import_work_item, uri
+
+
+def suds_record(case_id):
+    return Factory.object("TestRecord",
+                          {"testCaseURI": uri("WorkItem", case_id)})
+
+
+class LazyTestRecordsTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        import_work_item()
+        from pylero.test_run import LazyTestRecords
+        from pylero.test_record import TestRecord
+        self.TestRecord = TestRecord
+        BasePolarion._thread_sessions.session = FakeSession()
+        self.records = LazyTestRecords(
+            "proj1", [suds_record("PROJ-%s" % idx) for idx in range(4)])
+
+    def tearDown(self):
+        BasePolarion._thread_sessions.session = None
+
+    def _built(self):
+        return [isinstance(item, self.TestRecord)
+                for item in self.records._items]
+
+    def test_001_lazy(self):
+        """This test does the following:
+        * gets the length, an item and a slice of the records
+        * verifies that only the accessed records were created and that the
+          same object is returned every time
+        """
+        self.assertEqual(len(self.records), 4)
+        self.assertEqual(self._built(), [False] * 4)
+        rec = self.records[-1]
+        self.assertIs(self.records[3], rec)
+        self.assertEqual(self.records[1:3], [self.records[1], self.records[2]])
+        self.assertEqual(self._built(), [False, True, True, True])
+
+    def test_002_list(self):
+        """This test does the following:
+        * uses the list operations on the records
+        * verifies that they give the same results as on a list of the same
+          records
+        """
+        lst = list(self.records)
+        self.assertEqual(self.records, lst)
+        self.assertFalse(self.records != lst)
+        self.assertEqual(self.records.index(lst[2]), 2)
+        self.assertEqual(self.records.count(lst[1]), 1)
+        self.assertIn(lst[0], self.records)
+        self.assertEqual(self.records + [lst[0]], lst + [lst[0]])
+        self.assertEqual([lst[0]] + self.records, [lst[0]] + lst)
+        rec = self.TestRecord(suds_object=suds_record("PROJ-9"))
+        self.records.append(rec)
+        self.records.insert(0, rec)
+        del self.records[1]
+        self.assertEqual(self.records, [rec] + lst[1:] + [rec])
+        self.assertEqual(self.records.pop(), rec)
+        self.records.sort(key=lambda record: record.test_case_id,
+                          reverse=True)
+        self.assertEqual(self.records, [rec] + lst[1:][::-1])
+        with self.assertRaises(IndexError):
+            self.records[10]
+
+
+class DeferredStatusTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        import_work_item()
+        from pylero.test_run import TestRun
+        # the run is not created by the constructor, which needs the server
+        TestRun._add_properties(TestRun._base_suds_map)
+        self.run = TestRun.__new__(TestRun)
+        self.run._cls_suds_map = TestRun._base_suds_map
+        self.run._suds_object = Factory.object("TestRun", {"id": "run1"})
+        self.run.defer_status_change = self._defer
+        self.run.flush_status_change = self._flush
+
+    def _defer(self):
+        self.run._deferred_status = {}
+
+    def _flush(self):
+        raise RuntimeError("flush failed")
+
+    def test_001_exit_error(self):
+        """This test does the following:
+        * raises an error in a with block of a test run whose status change
+          fails
+        * verifies that the error of the block is raised and the status is
+          no longer deferred
+        * verifies that the error of the status change is raised when the
+          block has no error
+        """
+        with self.assertRaises(ValueError):
+            with self.run:
+                raise ValueError("record failed")
+        self.assertIsNone(self.run._deferred_status)
+        with self.assertRaises(RuntimeError):
+            with self.run:
+                pass
+        self.assertIsNone(self.run._deferred_status)
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -6,6 +6,7 @@ Created on Apr 19, 2015
 import unittest2
 import datetime
 import os
+import tempfile
 from pylero.test_run import TestRun
 from pylero.exceptions import PyleroLibException
 from pylero.test_record import TestRecord
@@ -231,6 +232,7 @@ class TestRunTest(unittest2.TestCase):
         * verify that there is 1 attachment with the correct title
         * verify the get_attachment function
         * verify the get_attachments function
+        * download the attachments and verify the content
         * delete the attachment
         * verify that there are no attachments.
         """
@@ -243,6 +245,10 @@ class TestRunTest(unittest2.TestCase):
         self.assertEqual(tr.attachments[0].title, attach.title)
         lst_attach = tr.get_attachments()
         self.assertEqual(lst_attach[0].title, attach.title)
+        paths = tr.download_all(tempfile.mkdtemp())
+        self.assertEqual(len(paths), 1)
+        with open(paths[0], "rb") as f1, open(ATTACH_PATH, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
         tr.delete_attachment(tr.attachments[0].filename)
         tr.reload()
         self.assertEqual(tr.attachments, [])
@@ -380,6 +386,96 @@ class TestRunTest(unittest2.TestCase):
                             work_item_id=linked_work_items[idx].work_item_id)
         self.assertIsNotNone(incident)
 
+    def test_014_add_test_records(self):
+        """This test does the following:
+        * creates a test run
+        * creates TestRecords for both test cases
+        * adds the TestRecords in one call
+        * Reloads the TestRun
+        * Verifies the TestRecords were added and the status was changed
+        * Tries to add the same TestRecords again (should fail)
+        """
+        tr = TestRun.create(DEFAULT_PROJ, "%s_batch" % TEST_RUN_ID,
+                            TEMPLATE_ID, "%s_batch" % TEST_RUN_TITLE)
+        recs = []
+        for test_case_id in [self.NEW_TEST_CASE, self.NEW_TEST_CASE2]:
+            rec = TestRecord(DEFAULT_PROJ, test_case_id)
+            rec.result = "passed"
+            rec.comment = "Batch Comment"
+            rec.duration = "10.5"
+            rec.executed_by = tr.logged_in_user_id
+            rec.executed = datetime.datetime.now()
+            recs.append(rec)
+        tr.add_test_records(recs)
+        tr.reload()
+        self.assertEqual(
+            sorted(rec.test_case_id for rec in tr.records if rec.result),
+            sorted([self.NEW_TEST_CASE, self.NEW_TEST_CASE2]))
+        self.assertNotEqual(tr.status, "notrun")
+        with self.assertRaises(PyleroLibException):
+            tr.add_test_records(recs)
+
+    def test_015_deferred_status(self):
+        """This test does the following:
+        * creates a test run
+        * adds TestRecords within a with block of the TestRun
+        * Verifies that the status did not change within the block
+        * Verifies that the status changed at the end of the block
+        """
+        tr = TestRun.create(DEFAULT_PROJ, "%s_deferred" % TEST_RUN_ID,
+                            TEMPLATE_ID, "%s_deferred" % TEST_RUN_TITLE)
+        with tr:
+            for test_case_id in [self.NEW_TEST_CASE, self.NEW_TEST_CASE2]:
+                tr.add_test_record_by_fields(
+                    test_case_id, "passed", "Deferred Comment",
+                    tr.logged_in_user_id, datetime.datetime.now(), "10.5")
+            check_tr = TestRun(uri=tr.uri)
+            self.assertEqual(check_tr.status, "notrun")
+        check_tr = TestRun(uri=tr.uri)
+        self.assertNotEqual(check_tr.status, "notrun")
+
+    def test_016_create_incident_reports(self):
+        """This test does the following:
+        * creates failed TestRecords for both test cases
+        * creates their incident reports in one call
+        * Verifies that every TestRecord got a defect_case_id
+        * Verifies that the Incident Reports were created
+        """
+        tr = TestRun(project_id=DEFAULT_PROJ, test_run_id=TEST_RUN_ID)
+        recs = []
+        for test_case_id in [self.NEW_TEST_CASE, self.NEW_TEST_CASE2]:
+            rec = TestRecord(DEFAULT_PROJ, test_case_id)
+            rec.result = "failed"
+            rec.executed_by = tr.logged_in_user_id
+            rec.executed = datetime.datetime.now()
+            recs.append(rec)
+        incident_ids = tr.create_incident_reports(recs)
+        self.assertEqual(incident_ids, [rec.defect_case_id for rec in recs])
+        for incident_id in incident_ids:
+            incident = IncidentReport(project_id=DEFAULT_PROJ,
+                                      work_item_id=incident_id)
+            self.assertEqual(incident.type, "incident")
+
+    def test_017_add_attachments(self):
+        """This test does the following:
+        * adds an attachment to an executed test record with add_attachments
+        * verifies that it was uploaded
+        * adds it again and verifies that it was skipped
+        * adds an attachment to a test case that is not in the test run and
+          verifies that it failed
+        """
+        tr = TestRun(project_id=DEFAULT_PROJ, test_run_id=TEST_RUN_ID)
+        summary = tr.add_attachments(
+            {(self.NEW_TEST_CASE, None): [(ATTACH_PATH, ATTACH_TITLE)]})
+        self.assertEqual(summary["uploaded"], 1)
+        tr.reload()
+        summary = tr.add_attachments(
+            {(self.NEW_TEST_CASE, None): [ATTACH_PATH],
+             ("NOT-IN-RUN", None): [ATTACH_PATH]})
+        self.assertEqual(summary["uploaded"], 0)
+        self.assertEqual(summary["skipped"], 1)
+        self.assertEqual(len(summary["failed"]), 1)
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
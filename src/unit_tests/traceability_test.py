@@ -0,0 +1,73 @@
+import unittest2
+from suds.sudsobject import Factory
+from pylero.base_polarion import BasePolarion
+from unit_tests.fakes import FakeClient, FakeSession, import_work_item
+from unit_tests.fakes import uri
+
+
+class FakeService(object):
+    """search function that records its queries and returns runs, instead of
+    calling the server"""
+
+    def __init__(self, runs):
+        self.runs = runs
+        self.queries = []
+
+    def searchTestRunsWithFieldsLimited(self, query, sort, fields, limit):
+        self.queries.append(query)
+        return self.runs if len(self.queries) == 1 else []
+
+
+def suds_run(run_id, records):
+    return Factory.object("TestRun", {
+        "id": run_id, "_uri": uri("TestRun", run_id),
+        "records": [[Factory.object("TestRecord", {
+            "testCaseURI": uri("WorkItem", case_id),
+            "result": Factory.object("EnumOptionId", {"id": result}),
+            "executed": executed})
+            for case_id, result, executed in records]]})
+
+
+class TraceabilityMatrixTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    @classmethod
+    def setUpClass(cls):
+        import_work_item()
+
+    def setUp(self):
+        # imports done in the function, after the work_item module was
+        # imported by import_work_item
+        from pylero.test_run import TestRun, TestRunSchema
+        self.client = FakeClient(FakeService([
+            suds_run("run1", [("PROJ-1", "passed", 1), ("PROJ-2", None, 1)]),
+            suds_run("run2", [("PROJ-1", "failed", 2)])]))
+        BasePolarion._thread_sessions.session = FakeSession(
+            test_management_client=self.client)
+        self.prev_schema = TestRun._schemas.get("proj1")
+        TestRun._schemas["proj1"] = TestRunSchema(
+            "proj1", TestRun._base_suds_map, {}, TestRun)
+
+    def tearDown(self):
+        from pylero.test_run import TestRun
+        BasePolarion._thread_sessions.session = None
+        if self.prev_schema is None:
+            TestRun._schemas.pop("proj1")
+        else:
+            TestRun._schemas["proj1"] = self.prev_schema
+
+    def test_001_default_run_query(self):
+        """This test does the following:
+        * indexes the results of the test runs with the default run query
+        * verifies that all the test runs of the project were searched
+        * verifies that the latest executed result of each test case is kept
+        """
+        from pylero.traceability import TraceabilityMatrix
+        results = TraceabilityMatrix(project_id="proj1")._index_results()
+        self.assertEqual(self.client.service.queries[0], "project.id:proj1")
+        self.assertEqual(results,
+                         {uri("WorkItem", "PROJ-1"): (2, "run2", "failed")})
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,116 @@
+import unittest2
+import threading
+from pylero.base_polarion import BasePolarion
+from unit_tests.fakes import FakeClient, FakeSession, import_work_item
+from unit_tests.fakes import uri
+
+
+class FakeService(object):
+    def __init__(self):
+        self.created = []
+
+    def createWorkItem(self, suds_wi):
+        self.created.append(suds_wi)
+        return uri("WorkItem", suds_wi)
+
+
+def fake_work_item_cls(failures):
+    """Returns a work item class whose updates are recorded, instead of
+    being sent to the server. failures is uri -> the attempts (starting at
+    1) of the update of the work item that fail."""
+    _WorkItem = import_work_item()._WorkItem
+    lock = threading.Lock()
+
+    class FakeWorkItem(_WorkItem):
+        attempts = {}
+
+        @classmethod
+        def _build_many(cls, items):
+            return [FakeSuds(item) for item in items]
+
+        @classmethod
+        def _new_update_object(cls, wi_uri, changes):
+            return wi_uri
+
+        @classmethod
+        def _send_update(cls, update):
+            wi_uri, changes = update
+            with lock:
+                cls.attempts[wi_uri] = cls.attempts.get(wi_uri, 0) + 1
+                attempt = cls.attempts[wi_uri]
+            if attempt in failures.get(wi_uri, []):
+                raise RuntimeError("update %s failed" % attempt)
+    return FakeWorkItem
+
+
+class FakeSuds(object):
+    def __init__(self, suds_object):
+        self._suds_object = suds_object
+
+
+class WorkItemBatchTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        self.session = FakeSession(
+            tracker_client=FakeClient(FakeService()))
+        BasePolarion._thread_sessions.session = self.session
+
+    def tearDown(self):
+        BasePolarion._thread_sessions.session = None
+
+    def test_001_update_many_retry(self):
+        """This test does the following:
+        * updates a batch in which an item fails, and another item fails
+          when the batch is sent again
+        * verifies that the batch is sent until it is committed, without the
+          failed items
+        * verifies that only the committed items are reported as updated
+        """
+        uris = [uri("WorkItem", "PROJ-%s" % idx) for idx in range(4)]
+        cls = fake_work_item_cls({uris[0]: [1], uris[1]: [2]})
+        results = cls.update_many([(wi_uri, {"title": "t"})
+                                   for wi_uri in uris])
+        self.assertEqual([result["updated"] for result in results],
+                         [False, False, True, True])
+        self.assertEqual(results[0]["error"], "RuntimeError: update 1 failed")
+        self.assertEqual(results[1]["error"], "RuntimeError: update 2 failed")
+        self.assertEqual(self.session.tx_log,
+                         ["begin", "rollback", "begin", "rollback", "begin",
+                          "commit"])
+        self.assertEqual(cls.attempts,
+                         dict(zip(uris, [1, 2, 3, 3])))
+
+    def test_002_update_many_in_tx(self):
+        """This test does the following:
+        * updates a batch that has a failed item within a transaction
+        * verifies that nothing is sent again and the other items are
+          reported as updated
+        """
+        uris = [uri("WorkItem", "PROJ-%s" % idx) for idx in range(3)]
+        cls = fake_work_item_cls({uris[0]: [1]})
+        self.session.tx_begin()
+        results = cls.update_many([(wi_uri, {"title": "t"})
+                                   for wi_uri in uris])
+        self.assertEqual([result["updated"] for result in results],
+                         [False, True, True])
+        self.assertEqual(self.session.tx_log, ["begin"])
+        self.assertEqual(cls.attempts, dict(zip(uris, [1, 1, 1])))
+
+    def test_003_create_many_pool(self):
+        """This test does the following:
+        * creates work items in several batches
+        * verifies that the batches reuse the sessions of one pool and that
+          each batch has its own transaction
+        """
+        cls = fake_work_item_cls({})
+        created = cls.create_many(["PROJ-%s" % idx for idx in range(10)],
+                                  batch_size=3, concurrency=2)
+        self.assertEqual([wi_id for wi_uri, wi_id in created],
+                         ["PROJ-%s" % idx for idx in range(10)])
+        self.assertLessEqual(len(self.session.clones), 2)
+        self.assertEqual(self.session.tx_log, ["begin", "commit"] * 4)
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,268 @@
+import unittest2
+import datetime
+import json
+import os
+import shutil
+import suds.client
+import suds.sax.date
+import tempfile
+from suds.sudsobject import Factory
+from pylero.base_polarion import BasePolarion
+from pylero.work_item_mirror import json_to_suds
+from pylero.work_item_mirror import SqliteWorkItemStore
+from pylero.work_item_mirror import suds_to_json
+from unit_tests.fakes import FakeCustomFieldType, FakeSession
+from unit_tests.fakes import import_work_item
+
+URI = "subterra:data-service:objects:/default/proj1${WorkItem}%s"
+WSDL = """<?xml version="1.0" encoding="UTF-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/"
+ xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+ xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:tns="urn:t"
+ targetNamespace="urn:t">
+ <types><xsd:schema targetNamespace="urn:t" elementFormDefault="qualified">
+  <xsd:complexType name="Text"><xsd:sequence>
+   <xsd:element name="content" type="xsd:string" minOccurs="0"/>
+  </xsd:sequence></xsd:complexType>
+  <xsd:complexType name="EnumOptionId"><xsd:sequence>
+   <xsd:element name="id" type="xsd:string" minOccurs="0"/>
+  </xsd:sequence></xsd:complexType>
+  <xsd:complexType name="Project"><xsd:sequence>
+   <xsd:element name="id" type="xsd:string" minOccurs="0"/>
+  </xsd:sequence></xsd:complexType>
+  <xsd:complexType name="Custom"><xsd:sequence>
+   <xsd:element name="key" type="xsd:string" minOccurs="0"/>
+   <xsd:element name="value" type="xsd:anyType" minOccurs="0"/>
+  </xsd:sequence></xsd:complexType>
+  <xsd:complexType name="ArrayOfCustom"><xsd:sequence>
+   <xsd:element name="Custom" type="tns:Custom" minOccurs="0"
+    maxOccurs="unbounded"/>
+  </xsd:sequence></xsd:complexType>
+  <xsd:complexType name="WorkItem"><xsd:sequence>
+   <xsd:element name="id" type="xsd:string" minOccurs="0"/>
+   <xsd:element name="title" type="xsd:string" minOccurs="0"/>
+   <xsd:element name="project" type="tns:Project" minOccurs="0"/>
+   <xsd:element name="type" type="tns:EnumOptionId" minOccurs="0"/>
+   <xsd:element name="description" type="tns:Text" minOccurs="0"/>
+   <xsd:element name="customFields" type="tns:ArrayOfCustom"
+    minOccurs="0"/>
+   <xsd:element name="updated" type="xsd:dateTime" minOccurs="0"/>
+  </xsd:sequence><xsd:attribute name="uri" type="xsd:string"/>
+  </xsd:complexType>
+  <xsd:element name="update"><xsd:complexType><xsd:sequence>
+   <xsd:element name="content" type="tns:WorkItem"/>
+  </xsd:sequence></xsd:complexType></xsd:element>
+  <xsd:element name="updateResponse"><xsd:complexType/></xsd:element>
+ </xsd:schema></types>
+ <message name="updateRequest">
+  <part name="parameters" element="tns:update"/></message>
+ <message name="updateResponse">
+  <part name="parameters" element="tns:updateResponse"/></message>
+ <portType name="P"><operation name="update">
+  <input message="tns:updateRequest"/>
+  <output message="tns:updateResponse"/></operation></portType>
+ <binding name="B" type="tns:P">
+  <soap:binding style="document"
+   transport="http://schemas.xmlsoap.org/soap/http"/>
+  <operation name="update"><soap:operation soapAction=""/>
+   <input><soap:body use="literal"/></input>
+   <output><soap:body use="literal"/></output></operation></binding>
+ <service name="S"><port name="p" binding="tns:B">
+  <soap:address location="http://localhost:1/"/></port></service>
+</definitions>"""
+
+
+class FakeTestSteps(object):
+    def __init__(self, steps):
+        self._suds_object = Factory.object("TestSteps", {"steps": [[
+            Factory.object("TestStep", {"values": [[
+                Factory.object("Text", {"content": value})
+                for value in step]]}) for step in steps]]})
+
+
+class FakeWorkItem(object):
+    """Work item with the test steps already fetched"""
+
+    def __init__(self, wi_id, suds_wi, steps=None):
+        self.uri = URI % wi_id
+        self.work_item_id = wi_id
+        self.title = "title %s" % wi_id
+        self.status = "draft"
+        self._suds_object = suds_wi
+        self.steps = steps or []
+
+    def get_test_steps(self):
+        return FakeTestSteps(self.steps)
+
+
+class WorkItemMirrorTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        wsdl_path = os.path.join(self.tmp_dir, "test.wsdl")
+        with open(wsdl_path, "w") as f:
+            f.write(WSDL)
+        self.wsdl_url = "file://" + wsdl_path
+        self.client = suds.client.Client(self.wsdl_url, cache=None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _suds_wi(self, wi_id):
+        suds_wi = self.client.factory.create("tns:WorkItem")
+        suds_wi.id = wi_id
+        suds_wi._uri = URI % wi_id
+        suds_wi.description = self.client.factory.create("tns:Text")
+        suds_wi.description.content = "description of %s" % wi_id
+        return suds_wi
+
+    def test_001_json_to_suds(self):
+        """This test does the following:
+        * converts a WSDL object to json and back
+        * verifies that the values, the dates and their timezones are kept
+        * verifies that the objects are created by the WSDL factory
+        """
+        suds_wi = self._suds_wi("PROJ-1")
+        suds_wi.updated = datetime.datetime(
+            2020, 1, 2, 3, 4, 5, 6,
+            tzinfo=suds.sax.date.FixedOffsetTimezone(
+                datetime.timedelta(minutes=-150)))
+        val = json_to_suds(json.loads(json.dumps(suds_to_json(suds_wi))),
+                           self.client.factory)
+        self.assertIsInstance(val, suds_wi.__class__)
+        self.assertEqual(val.__metadata__.sxtype.name, "WorkItem")
+        self.assertEqual(val.description.__metadata__.sxtype.name, "Text")
+        self.assertEqual(val.id, "PROJ-1")
+        self.assertEqual(val.description.content, "description of PROJ-1")
+        self.assertEqual(val.updated, suds_wi.updated)
+        self.assertEqual(val.updated.utcoffset(),
+                         datetime.timedelta(minutes=-150))
+
+    def test_002_store(self):
+        """This test does the following:
+        * upserts 2 test cases with test steps
+        * verifies the stored rows, the test steps and the full text search
+          table
+        * upserts a test case again and deletes the other
+        * verifies that the old rows were replaced and removed
+        """
+        store = SqliteWorkItemStore(os.path.join(self.tmp_dir, "mirror.db"))
+        fields = ["work_item_id", "title"]
+        store.upsert("proj1", "testcase",
+                     FakeWorkItem("PROJ-1", self._suds_wi("PROJ-1"),
+                                  [["step 1", "result 1"],
+                                   ["step 2", "result 2"]]), fields)
+        store.upsert("proj1", "testcase",
+                     FakeWorkItem("PROJ-2", self._suds_wi("PROJ-2")), fields)
+        store.commit()
+        self.assertEqual(store.get_uris("proj1", "testcase"),
+                         set([URI % "PROJ-1", URI % "PROJ-2"]))
+        self.assertEqual(store.get_test_steps(URI % "PROJ-1"),
+                         [["step 1", "result 1"], ["step 2", "result 2"]])
+        self.assertEqual(len(store.conn.execute(
+            "SELECT uri FROM work_items_fts WHERE work_items_fts MATCH ?",
+            ("description",)).fetchall()), 2)
+        self.assertEqual(store.conn.execute(
+            "SELECT uri FROM work_items_fts WHERE work_items_fts MATCH ?",
+            ('"title PROJ-2"',)).fetchall(), [(URI % "PROJ-2",)])
+        data = json.loads(store.conn.execute(
+            "SELECT data FROM work_items WHERE uri=?",
+            (URI % "PROJ-2",)).fetchone()[0])
+        self.assertEqual(
+            json_to_suds(data, self.client.factory).description.content,
+            "description of PROJ-2")
+        store.upsert("proj1", "testcase",
+                     FakeWorkItem("PROJ-1", self._suds_wi("PROJ-1"),
+                                  [["new step", "new result"]]), fields)
+        store.delete(URI % "PROJ-2")
+        store.commit()
+        self.assertEqual(store.get_uris("proj1", "testcase"),
+                         set([URI % "PROJ-1"]))
+        self.assertEqual(store.get_test_steps(URI % "PROJ-1"),
+                         [["new step", "new result"]])
+        self.assertEqual(store.get_test_steps(URI % "PROJ-2"), [])
+        store.close()
+
+    def test_003_store_state(self):
+        """This test does the following:
+        * sets the sync state of the store
+        * verifies that it is kept after the database is opened again
+        """
+        path = os.path.join(self.tmp_dir, "mirror.db")
+        store = SqliteWorkItemStore(path)
+        self.assertIsNone(store.get_watermark("proj1", "testcase"))
+        store.set_watermark("proj1", "testcase", "20200101T000000")
+        store.set_reconciled("proj1", "testcase", 10.0)
+        store.commit()
+        store.close()
+        store = SqliteWorkItemStore(path)
+        self.assertEqual(store.get_watermark("proj1", "testcase"),
+                         "20200101T000000")
+        self.assertEqual(store.get_reconciled("proj1", "testcase"), 10.0)
+        store.close()
+
+    def test_004_offline_query(self):
+        """This test does the following:
+        * syncs a test case with a custom field into the store, which saves
+          the WSDL and the custom field types
+        * opens the store again without a session
+        * verifies that the query returns the specific work item with its
+          custom field, rebuilt by the saved WSDL and custom field types
+        """
+        _WorkItem = import_work_item()._WorkItem
+        enums = BasePolarion._cache["enums"]
+        prev_types = enums.get("workitem-type")
+        prev_cfts = _WorkItem.__dict__["get_defined_custom_field_types"]
+        enums["workitem-type"] = {None: [Factory.object(
+            "EnumOption", {"id": "testcase", "name": "Test Case"})]}
+        _WorkItem.get_defined_custom_field_types = classmethod(
+            lambda cls, project_id, wi_type: [
+                FakeCustomFieldType("caseLevel", "xsd:string")])
+        BasePolarion._thread_sessions.session = FakeSession(
+            _url_for_name=lambda name: self.wsdl_url)
+        try:
+            suds_wi = self._suds_wi("PROJ-1")
+            suds_wi.title = "title PROJ-1"
+            suds_wi.project = self.client.factory.create("tns:Project")
+            suds_wi.project.id = "proj2"
+            suds_wi.type = self.client.factory.create("tns:EnumOptionId")
+            suds_wi.type.id = "testcase"
+            custom = self.client.factory.create("tns:Custom")
+            custom.key = "caseLevel"
+            custom.value = "component"
+            suds_wi.customFields = self.client.factory.create(
+                "tns:ArrayOfCustom")
+            suds_wi.customFields.Custom = [custom]
+            path = os.path.join(self.tmp_dir, "mirror.db")
+            store = SqliteWorkItemStore(path)
+            # the test steps are covered by test_002
+            store.TEST_STEP_TYPES = []
+            store.upsert_many("proj2", "testcase",
+                              [FakeWorkItem("PROJ-1", suds_wi)], [])
+            store.commit()
+            store.close()
+        finally:
+            _WorkItem.get_defined_custom_field_types = prev_cfts
+            BasePolarion._thread_sessions.session = None
+            if prev_types is None:
+                enums.pop("workitem-type", None)
+            else:
+                enums["workitem-type"] = prev_types
+        store = SqliteWorkItemStore(path)
+        self.assertIsNone(BasePolarion._session)
+        wis = store.query("work_item_id=?", ("PROJ-1",))
+        self.assertEqual(len(wis), 1)
+        self.assertEqual(wis[0].__class__.__name__, "TestCase")
+        self.assertEqual(wis[0].uri, URI % "PROJ-1")
+        self.assertEqual(wis[0].project_id, "proj2")
+        self.assertEqual(wis[0].title, "title PROJ-1")
+        self.assertEqual(wis[0].type, "testcase")
+        self.assertEqual(wis[0].case_level, "component")
+        self.assertIsNone(wis[0].status)
+        self.assertIsNone(BasePolarion._session)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -0,0 +1,81 @@
+import unittest2
+from suds.sudsobject import Factory
+from pylero.base_polarion import BasePolarion
+from unit_tests.fakes import FakeClient, FakeCustomFieldType
+from unit_tests.fakes import FakeSession, import_work_item, uri
+
+
+class FakeService(object):
+    """query function that records the fields, instead of calling the
+    server"""
+
+    def __init__(self):
+        self.calls = []
+
+    def queryWorkItems(self, query, sort, fields):
+        self.calls.append((query, sort, fields))
+        project_id = query.split("project.id:")[1]
+        return [Factory.object("WorkItem", {
+            "id": "PROJ-1",
+            "_uri": uri("WorkItem", "PROJ-1", project_id),
+            "type": Factory.object("EnumOptionId", {"id": "testcase"}),
+            "project": Factory.object("Project", {"id": project_id})})]
+
+
+class WorkItemSchemaTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        work_item = import_work_item()
+        self.cls = [cls for cls in work_item._SpecificWorkItem.__subclasses__()
+                    if cls._wi_type == "testcase"][0]
+        self.schemas = dict(
+            (project_id, work_item.WorkItemSchema(
+                project_id, "testcase", self.cls._base_suds_map, cfts))
+            for project_id, cfts in [
+                ("proj1", [FakeCustomFieldType("caseLevel", "xsd:string")]),
+                ("proj2", [FakeCustomFieldType(
+                    "caseLevel", "ns2:EnumOptionId", "level")])])
+        self.prev_schemas = dict(self.cls._schemas)
+        for project_id, schema in self.schemas.items():
+            self.cls._schemas[(project_id, "testcase")] = schema
+        self.client = FakeClient(FakeService())
+        BasePolarion._thread_sessions.session = FakeSession(
+            tracker_client=self.client)
+
+    def tearDown(self):
+        BasePolarion._thread_sessions.session = None
+        self.cls._schemas.clear()
+        self.cls._schemas.update(self.prev_schemas)
+
+    def test_001_project_fields(self):
+        """This test does the following:
+        * queries the test cases of 2 projects that have a custom field with
+          the same name and different types
+        * verifies that the results have the map of the schema of their
+          project and that the class map has no custom field
+        * verifies that the planned_in field of the schema maps was fixed
+          when they were built and isn't changed by the objects
+        """
+        from pylero.plan import Plan
+        results = dict(
+            (project_id, self.cls.query("", fields=["case_level"],
+                                        project_id=project_id))
+            for project_id in self.schemas)
+        self.assertEqual(
+            [call[2] for call in self.client.service.calls],
+            [["customFields.caseLevel", "id"]] * 2)
+        for project_id, schema in self.schemas.items():
+            wi = results[project_id][0]
+            self.assertEqual(wi.project_id, project_id)
+            self.assertIs(wi._cls_suds_map, schema.suds_map)
+            self.assertIs(schema.suds_map["planned_in"]["cls"], Plan)
+        self.assertNotIn("cls", self.schemas["proj1"].suds_map["case_level"])
+        self.assertEqual(
+            self.schemas["proj2"].suds_map["case_level"]["enum_id"], "level")
+        self.assertNotIn("case_level", self.cls._cls_suds_map)
+        self.assertNotIn("cls", self.cls._base_suds_map["planned_in"])
+
+
+if __name__ == "__main__":
+    unittest2.main()
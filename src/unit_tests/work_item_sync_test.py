@@ -0,0 +1,154 @@
+import unittest2
+import datetime
+import os
+import shutil
+import tempfile
+from pylero.work_item_sync import JsonWorkItemStore
+from pylero.work_item_sync import WorkItemStore
+from pylero.work_item_sync import WorkItemSync
+
+URI = "subterra:data-service:objects:/default/proj1${WorkItem}%s"
+
+
+class _Tz(datetime.tzinfo):
+    """fixed offset timezone"""
+
+    def __init__(self, hours):
+        self._offset = datetime.timedelta(hours=hours)
+
+    def utcoffset(self, dt):
+        return self._offset
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+
+class FakeWorkItem(object):
+    def __init__(self, wi_id, updated):
+        self.uri = URI % wi_id
+        self.work_item_id = wi_id
+        self.title = "title %s" % wi_id
+        self.updated = updated
+
+
+class FakeWorkItemCls(object):
+    """Work item class that records its queries, instead of querying the
+    server"""
+
+    def __init__(self, work_items):
+        self.work_items = work_items
+        self.queries = []
+
+    def query(self, query, fields=None, sort=None, project_id=None,
+              query_uris=False):
+        self.queries.append(query)
+        if query_uris:
+            return [wi.uri for wi in self.work_items]
+        return list(self.work_items)
+
+
+class FakeSync(WorkItemSync):
+    def __init__(self, store, wi_cls, **kwargs):
+        super(FakeSync, self).__init__(store, "testcase", "proj1",
+                                       ["work_item_id", "title"], **kwargs)
+        self.wi_cls = wi_cls
+
+    def _query_cls(self, wi_type):
+        return self.wi_cls
+
+
+class WorkItemSyncTest(unittest2.TestCase):
+    """These tests do not use the server"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "store.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_001_store_abstract(self):
+        """This test does the following:
+        * verifies that a store without the work item methods can't be
+          created
+        * verifies the default sync state methods of a store
+        """
+        with self.assertRaises(TypeError):
+            WorkItemStore()
+        store = JsonWorkItemStore(self.path)
+        self.assertIsNone(store.get_watermark("proj1", "testcase"))
+        store.set_watermark("proj1", "testcase", "20200101T000000")
+        store.set_reconciled("proj1", "testcase", 10.0)
+        self.assertEqual(store.get_watermark("proj1", "testcase"),
+                         "20200101T000000")
+        self.assertEqual(store.get_reconciled("proj1", "testcase"), 10.0)
+        self.assertIsNone(store.get_reconciled("proj1", "requirement"))
+
+    def test_002_watermark_utc(self):
+        """This test does the following:
+        * verifies that the watermark has a granularity of a second
+        * verifies that aware times are converted to UTC
+        """
+        self.assertEqual(
+            WorkItemSync._watermark(datetime.datetime(2020, 1, 2, 3, 4, 5)),
+            "20200102T030405")
+        self.assertEqual(
+            WorkItemSync._watermark(
+                datetime.datetime(2020, 1, 2, 1, 4, 5, tzinfo=_Tz(3))),
+            "20200101T220405")
+
+    def test_003_sync(self):
+        """This test does the following:
+        * syncs 2 work items into a new store and commits it
+        * verifies that the first pass has no watermark in the query
+        * reloads the store and verifies the items and the UTC watermark
+        * syncs again and verifies that the query starts at the watermark
+        """
+        wi_cls = FakeWorkItemCls([
+            FakeWorkItem("PROJ-1", datetime.datetime(
+                2020, 1, 2, 10, 0, 0, tzinfo=_Tz(2))),
+            FakeWorkItem("PROJ-2", datetime.datetime(
+                2020, 1, 2, 9, 30, 0, tzinfo=_Tz(-1)))])
+        sync = FakeSync(JsonWorkItemStore(self.path), wi_cls)
+        self.assertEqual(sync.sync(), {"testcase": {"updated": 2,
+                                                    "deleted": 0}})
+        self.assertEqual(wi_cls.queries, [""])
+        store = JsonWorkItemStore(self.path)
+        self.assertEqual(store.get_uris("proj1", "testcase"),
+                         set([URI % "PROJ-1", URI % "PROJ-2"]))
+        self.assertEqual(store.items[URI % "PROJ-1"]["fields"],
+                         {"work_item_id": "PROJ-1", "title": "title PROJ-1",
+                          "updated": "2020-01-02T10:00:00+02:00"})
+        self.assertEqual(store.get_watermark("proj1", "testcase"),
+                         "20200102T103000")
+        sync = FakeSync(store, wi_cls, query="status:approved")
+        sync.sync()
+        self.assertEqual(wi_cls.queries[-1],
+                         "(status:approved) AND "
+                         "updated:[20200102T103000 TO *]")
+
+    def test_004_reconcile(self):
+        """This test does the following:
+        * syncs 2 work items
+        * removes one of them from the server
+        * verifies that it is kept without a deletion check, and deleted
+          with one
+        """
+        wi_cls = FakeWorkItemCls([
+            FakeWorkItem("PROJ-1", datetime.datetime(2020, 1, 1)),
+            FakeWorkItem("PROJ-2", datetime.datetime(2020, 1, 1))])
+        store = JsonWorkItemStore(self.path)
+        sync = FakeSync(store, wi_cls)
+        sync.sync()
+        wi_cls.work_items.pop()
+        self.assertEqual(sync.sync_type("testcase", reconcile=False),
+                         {"updated": 1, "deleted": 0})
+        self.assertEqual(len(store.get_uris("proj1", "testcase")), 2)
+        self.assertEqual(sync.sync_type("testcase", reconcile=True),
+                         {"updated": 1, "deleted": 1})
+        self.assertEqual(store.get_uris("proj1", "testcase"),
+                         set([URI % "PROJ-1"]))
+
+
+if __name__ == "__main__":
+    unittest2.main()
@@ -5,9 +5,10 @@ Created on Apr 15, 2015
 '''
 import unittest2
 import os
-from pylero.work_item import TestCase, Requirement
+from pylero.work_item import TestCase, Requirement, _WorkItem
 from pylero.exceptions import PyleroLibException
 from pylero.test_step import TestStep
+from pylero.traceability import TraceabilityGraph, TraceabilityMatrix
 
 DEFAULT_PROJ = TestCase.default_project
 HYPERLINK = "http://www.google.com"
@@ -43,7 +44,10 @@ class WorkItemTest(unittest2.TestCase):
         results = TestCase.query(
             "project.id:%s AND title:regression" % (DEFAULT_PROJ))
         tc = results[0]
-        self.assertIsNone(tc.title)
+        # title was not requested, it is loaded when it is accessed
+        self.assertNotIn("title", tc._loaded_fields)
+        self.assertIsNotNone(tc.title)
+        self.assertIn("title", tc._loaded_fields)
         results2 = TestCase.query(
             "project.id:%s AND title:regression" % (DEFAULT_PROJ),
             fields=["work_item_id", "title"])
@@ -262,6 +266,140 @@ class WorkItemTest(unittest2.TestCase):
         tc = results[0]
         self.assertIsNotNone(tc.author)
 
+    def test_021_query_fault_in(self):
+        """This test does the following:
+        * queries work items without requesting the status field
+        * accesses the status of one of them
+        * verifies that the status was loaded for all of the results
+        """
+        results = _WorkItem.query(
+            "project.id:%s AND id:(%s %s)" %
+            (DEFAULT_PROJ, self.work_item_id, self.work_item_id_2))
+        self.assertEqual(len(results), 2)
+        for wi in results:
+            self.assertIsNone(getattr(wi._suds_object, "status", None))
+        self.assertIsNotNone(results[0].status)
+        for wi in results:
+            self.assertIsNotNone(getattr(wi._suds_object, "status", None))
+        self.assertIn("status", results[1]._loaded_fields)
+
+    def test_022_create_many(self):
+        """This test does the following:
+        * verifies that create_many raises an exception if an item is missing
+          a required field
+        * creates 3 requirements in 2 batches
+        * verifies that the uris and ids are returned in the order of the
+          items
+        """
+        items = [{"title": "regression many %d" % i,
+                  "desc": "regression many",
+                  "reqtype": "functional",
+                  "severity": "should_have"} for i in range(3)]
+        with self.assertRaises(PyleroLibException):
+            Requirement.create_many(items + [{"title": "missing fields",
+                                              "desc": "missing fields"}])
+        results = Requirement.create_many(items, batch_size=2)
+        self.assertEqual(len(results), 3)
+        for item, (uri, work_item_id) in zip(items, results):
+            req = Requirement(project_id=DEFAULT_PROJ,
+                              work_item_id=work_item_id)
+            self.assertEqual(req.uri, uri)
+            self.assertEqual(req.title, item["title"])
+
+    def test_023_update_many(self):
+        """This test does the following:
+        * updates the title of a test case and clears a required field of
+          it with update_many
+        * verifies that the result of each item is reported
+        * verifies that only the changed field was updated
+        """
+        results = TestCase.update_many(
+            [(self.work_item_uri, {"title": "regression update many"}),
+             (self.work_item_uri, {"caseimportance": None})])
+        self.assertTrue(results[0]["updated"])
+        self.assertFalse(results[1]["updated"])
+        self.assertIsNotNone(results[1]["error"])
+        tc = TestCase(uri=self.work_item_uri)
+        self.assertEqual(tc.title, "regression update many")
+        self.assertEqual(tc.caseimportance, "high")
+
+    def test_024_schema(self):
+        """This test does the following:
+        * gets the schema of test cases twice
+        * verifies that it is built once and has the required custom fields
+        * verifies that test case objects share the map of the schema
+        """
+        schema = TestCase.get_schema(DEFAULT_PROJ)
+        self.assertIs(schema, TestCase.get_schema(DEFAULT_PROJ))
+        self.assertIn("caseimportance", schema.required_fields)
+        tc = TestCase(project_id=DEFAULT_PROJ,
+                      work_item_id=self.work_item_id)
+        tc2 = TestCase(project_id=DEFAULT_PROJ,
+                       work_item_id=self.work_item_id)
+        self.assertIs(tc._cls_suds_map, schema.suds_map)
+        self.assertIs(tc2._cls_suds_map, schema.suds_map)
+
+    def test_025_traceability_graph(self):
+        """This test does the following:
+        * links the test case to the requirement
+        * walks the graph from the test case
+        * verifies that the requirement was reached with the link role
+        * verifies that the walk is limited by max_depth
+        """
+        tc = TestCase(project_id=DEFAULT_PROJ,
+                      work_item_id=self.work_item_id)
+        tc.add_linked_item(self.work_item_id_2, "verifies")
+        graph = TraceabilityGraph(derived=False)
+        trace = graph.walk([self.work_item_id])
+        self.assertIn((self.work_item_uri_2, "verifies", False),
+                      trace["edges"][self.work_item_uri])
+        self.assertEqual(trace["depth"][self.work_item_uri_2], 1)
+        self.assertEqual(trace["nodes"][self.work_item_uri_2].work_item_id,
+                         self.work_item_id_2)
+        trace = graph.walk([self.work_item_id], max_depth=0)
+        self.assertEqual(list(trace["nodes"]), [self.work_item_uri])
+        self.assertEqual(trace["edges"][self.work_item_uri], [])
+        tc.remove_linked_item(self.work_item_id_2, "verifies")
+
+    def test_026_traceability_matrix(self):
+        """This test does the following:
+        * links the test case to the requirement
+        * builds the matrix of the requirement without results
+        * verifies that the row of the test case is generated
+        """
+        tc = TestCase(project_id=DEFAULT_PROJ,
+                      work_item_id=self.work_item_id)
+        tc.add_linked_item(self.work_item_id_2, "verifies")
+        matrix = TraceabilityMatrix(
+            requirement_query="id:%s" % self.work_item_id_2,
+            test_case_query="id:%s" % self.work_item_id, run_query=None)
+        rows = list(matrix.rows())
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["requirement_id"], self.work_item_id_2)
+        self.assertEqual(rows[0]["test_case_id"], self.work_item_id)
+        self.assertIsNone(rows[0]["result"])
+        tc.remove_linked_item(self.work_item_id_2, "verifies")
+
+    def test_027_test_steps_cache(self):
+        """This test does the following:
+        * gets the test steps of the test case with get_test_steps_many
+        * verifies that the object keeps them
+        * sets new test steps and verifies that they are retrieved again
+        """
+        tc = TestCase(project_id=DEFAULT_PROJ,
+                      work_item_id=self.work_item_id)
+        steps = TestCase.get_test_steps_many([tc, self.work_item_uri_2])
+        self.assertEqual(len(steps), 2)
+        self.assertIsNotNone(tc._test_steps_cache)
+        self.assertIs(tc.get_test_steps()._suds_object,
+                      steps[self.work_item_uri]._suds_object)
+        ts = TestStep()
+        ts.values = ["Test cache", "Result cache"]
+        tc.set_test_steps([ts])
+        self.assertIsNone(tc._test_steps_cache)
+        self.assertEqual(tc.get_test_steps().steps[0].values[0].content,
+                         "Test cache")
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']